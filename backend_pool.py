@@ -0,0 +1,173 @@
+import collections
+import os
+
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+import stack_ide
+from req import Req
+from log import Log
+from utility import expected_cabalfile, is_stack_project, SESSION_FILE
+
+# Assumed size of a backend whose memory use we can't measure
+ESTIMATED_BACKEND_MB = 1024
+
+# How many recently used projects we remember
+MAX_RECENT_PROJECTS = 10
+
+
+class BackendPool:
+    """
+    Keeps stack-ide backends warm for recently used projects, so a new window
+    on one of them gets a session that is already started and compiled.
+
+    Spares come from windows that were closed and, at startup, from the most
+    recently used projects. They are keyed by project path and evicted least
+    recently used first, when there are more than `size` of them or they use
+    more than `memory_budget` MB.
+    """
+
+    size = 0
+    memory_budget = 2048
+    spares = collections.OrderedDict() # Map from project path to backend, oldest first
+
+    @classmethod
+    def configure(cls, settings):
+        cls.size = settings.warm_pool_size
+        cls.memory_budget = settings.warm_pool_memory_mb
+        cls.evict()
+
+    @classmethod
+    def take(cls, project_path):
+        """
+        Hands out the spare backend for the project, if there is one.
+        """
+        backend = cls.spares.pop(project_path, None)
+        if backend is not None:
+            Log.normal("Using warm stack-ide backend for", project_path)
+        return backend
+
+    @classmethod
+    def park(cls, instance):
+        """
+        Keeps the backend of an instance whose window went away, instead of
+        shutting it down. Returns False if the pool is disabled.
+        """
+        if cls.size <= 0:
+            return False
+        backend = instance.release_backend()
+        if backend is None:
+            return False
+        cls._add(instance.project_path, backend)
+        return True
+
+    @classmethod
+    def prestart(cls, settings, exclude=()):
+        """
+        Starts spares for the most recently used projects that have no window yet.
+        """
+        if cls.size <= 0:
+            return
+        stack_ide.reset_env(settings.add_to_PATH)
+        for project_path in cls.recent_projects()[:cls.size]:
+            if project_path in exclude or project_path in cls.spares:
+                continue
+            if not (is_stack_project(project_path) and os.path.isfile(expected_cabalfile(project_path))):
+                continue
+            sublime.set_timeout_async(lambda project_path=project_path: cls._warm_up(project_path, settings), 0)
+
+    @classmethod
+    def touch(cls, project_path):
+        """
+        Records the project as the most recently used one.
+        """
+        session = sublime.load_settings(SESSION_FILE)
+        recent = [path for path in cls.recent_projects() if path != project_path]
+        session.set("recent_projects", ([project_path] + recent)[:MAX_RECENT_PROJECTS])
+        sublime.save_settings(SESSION_FILE)
+
+    @classmethod
+    def recent_projects(cls):
+        return list(sublime.load_settings(SESSION_FILE).get("recent_projects", []))
+
+    @classmethod
+    def evict(cls):
+        """
+        Shuts down the least recently used spares until we are within budget.
+        """
+        while cls.spares and (len(cls.spares) > cls.size or cls.memory_usage() > cls.memory_budget):
+            (project_path, backend) = cls.spares.popitem(last=False)
+            Log.normal("Evicting warm stack-ide backend for", project_path)
+            shutdown(backend)
+
+    @classmethod
+    def clear(cls, detach=False):
+        """
+        Shuts down (or, for daemon sessions with detach, lets go of) every spare.
+        """
+        for backend in cls.spares.values():
+            if detach and isinstance(backend, stack_ide.SocketBackend):
+                backend.close()
+            else:
+                shutdown(backend)
+        cls.spares.clear()
+
+    @classmethod
+    def memory_usage(cls):
+        """
+        Total resident memory of the spares in MB.
+        """
+        total = 0
+        for backend in cls.spares.values():
+            usage = process_memory_mb(backend.pid) if backend.pid else None
+            total += ESTIMATED_BACKEND_MB if usage is None else usage
+        return total
+
+    @classmethod
+    def _add(cls, project_path, backend):
+        previous = cls.spares.pop(project_path, None)
+        if previous is not None:
+            shutdown(previous)
+        backend.handler = spare_handler(project_path)
+        backend.drop_handler = None
+        cls.spares[project_path] = backend
+        cls.evict()
+
+    @classmethod
+    def _warm_up(cls, project_path, settings):
+        (_, package) = os.path.split(project_path)
+        Log.normal("Starting warm stack-ide backend for", project_path)
+        try:
+            backend = stack_ide.stack_ide_start(project_path, package, spare_handler(project_path), None, settings.daemon_socket)
+            targets = stack_ide.stack_ide_loadtargets(project_path, package)
+        except Exception as e:
+            Log.warning("Couldn't start warm stack-ide backend for", project_path, ":", e)
+            return
+        backend.send_request(Req.update_session_includes(targets))
+        sublime.set_timeout(lambda: cls._add(project_path, backend), 0)
+
+
+def spare_handler(project_path):
+    return lambda data: Log.debug("Warm backend for", project_path, "got:", data)
+
+
+def shutdown(backend):
+    backend.send_request(Req.get_shutdown())
+
+
+def process_memory_mb(pid):
+    """
+    Resident memory of a process and its descendants in MB, or None where
+    /proc isn't available. (`stack ide start` itself is small, the memory
+    is in the stack-ide/GHC process it starts.)
+    """
+    try:
+        with open("/proc/{}/status".format(pid)) as status:
+            rss_kb = next((int(line.split()[1]) for line in status if line.startswith("VmRSS:")), 0)
+        with open("/proc/{}/task/{}/children".format(pid, pid)) as children:
+            child_pids = children.read().split()
+    except (OSError, ValueError):
+        return None
+    return rss_kb / 1024 + sum(process_memory_mb(child) or 0 for child in child_pids)
@@ -0,0 +1,59 @@
+import collections
+
+
+class CompletionCache:
+    """
+    Remembers autocompletion replies per file and prefix, so that typing on
+    (from "fo" to "foo" to "fold") is answered by filtering an earlier reply
+    instead of asking stack-ide again: every completion of "foo" is also one
+    of "fo".
+
+    Holds the `capacity` most recently used prefixes, across files.
+    Cleared whenever the session recompiles, since a module's exports
+    change what its importers can see.
+    """
+
+    capacity = 64
+
+    def __init__(self):
+        self._entries = collections.OrderedDict() # Map from (file path, prefix) to [(IdProp, IdScope)], oldest first
+        self.hits = 0
+        self.refinements = 0
+
+    def lookup(self, path, prefix):
+        """
+        Returns the completions for prefix in the file, or None if stack-ide has to be asked.
+        """
+        key = (path, prefix)
+        completions = self._entries.get(key)
+        if completions is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return completions
+
+        # Look for the longest cached prefix this one extends. A dot starts a
+        # qualified name, which stack-ide resolves differently, so we don't refine across one.
+        for length in range(len(prefix) - 1, -1, -1):
+            if prefix[length] == '.':
+                return None
+            cached = self._entries.get((path, prefix[:length]))
+            if cached is not None:
+                name_prefix = prefix.rpartition('.')[2]
+                completions = [completion for completion in cached if completion[0].name.startswith(name_prefix)]
+                self.store(path, prefix, completions)
+                self.refinements += 1
+                return completions
+        return None
+
+    def store(self, path, prefix, completions):
+        key = (path, prefix)
+        self._entries[key] = completions
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,49 @@
+import heapq
+
+from identifier_index import module_name_candidates
+
+
+class CompletionRanker:
+    """
+    Picks the completions worth showing, so we don't format thousands of
+    them per keystroke for short prefixes.
+
+    Identifiers defined in the file's own module score highest, then those
+    from the project's other modules, then those from other packages.
+    Names matching the prefix's case get a bonus, and every character of a
+    name costs a little, so shorter names come first among equals.
+    Only the `limit` best are kept (all of them if limit is 0).
+    """
+
+    default_weights = {"local": 100, "project": 50, "exact_case": 20, "length": 1}
+    limit = 100
+    weights = dict(default_weights)
+
+    @classmethod
+    def top(cls, completions, prefix, filepath, project_packages):
+        """
+        The best completions for prefix in the file, best first.
+        """
+        if not cls.limit:
+            return list(completions)
+        local_modules = module_name_candidates(filepath)
+        score = scorer(prefix, local_modules, set(project_packages), cls.weights)
+        return heapq.nlargest(cls.limit, completions, key=score)
+
+
+def scorer(prefix, local_modules, project_packages, weights):
+    local = weights.get("local", 0)
+    project = weights.get("project", 0)
+    exact_case = weights.get("exact_case", 0)
+    length = weights.get("length", 0)
+
+    def score(completion):
+        prop = completion[0]
+        value = -length * len(prop.name)
+        if prop.package in project_packages:
+            value += local if prop.module in local_modules else project
+        if prop.name.startswith(prefix):
+            value += exact_case
+        return value
+
+    return score
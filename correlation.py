@@ -0,0 +1,135 @@
+import itertools
+import random
+import threading
+import time
+
+# Tells apart the seq ids of each load of the plugin
+PLUGIN_LOAD = "{:08x}".format(random.getrandbits(32))
+
+class PendingRequest:
+    """
+    A request awaiting its reply. A handler of None means the reply
+    is still expected but should be ignored (e.g. it was superseded).
+    """
+
+    def __init__(self, handler, timeout, on_timeout):
+        self.handler = handler
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.on_timeout = on_timeout
+
+
+class CorrelationTable:
+    """
+    Maps the seq ids of requests to their response handlers.
+
+    Handlers are registered on the UI thread and looked up on the stdout
+    reader thread, so all access goes through a lock. Each entry has a
+    deadline, counted from when its request is sent (see start()); entries
+    whose reply never arrives are removed by reap().
+
+    Seq ids are a counter behind a prefix unique to the table: a number
+    counting the tables made since the plugin was loaded, and a random one
+    for that load. A stack-ide backend can outlive the table (handed on by
+    the BackendPool, or a daemon session reattached to after a plugin
+    reload), and the replies it still owes the old table must not match
+    requests of the new one.
+    """
+
+    default_timeout = 120.0
+    tables = itertools.count(1)
+
+    def __init__(self):
+        # stack-ide echoes seq ids back verbatim, we use a counter rather than uuids
+        self._prefix = "{}.{}-".format(PLUGIN_LOAD, next(CorrelationTable.tables))
+        self._seq_ids = itertools.count(1)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.timed_out = 0
+        self.orphaned = 0
+
+    def register(self, handler, timeout=None, on_timeout=None):
+        """
+        Stores a handler and returns the seq id to send along with its request.
+        """
+        with self._lock:
+            seq_id = self._prefix + str(next(self._seq_ids))
+            self._entries[seq_id] = PendingRequest(handler, timeout or CorrelationTable.default_timeout, on_timeout)
+        return seq_id
+
+    def start(self, seq_id):
+        """
+        Restarts the deadline of a request as it is sent, after waiting in a
+        queue. Returns False if the request is no longer expected (e.g. it
+        was reaped while queued), and so shouldn't be sent.
+        """
+        with self._lock:
+            entry = self._entries.get(seq_id)
+            if entry is not None:
+                entry.deadline = time.monotonic() + entry.timeout
+        return entry is not None
+
+    def pop(self, seq_id):
+        """
+        Removes and returns the entry for a reply, or None
+        (counted as orphaned) if we weren't expecting it.
+        """
+        with self._lock:
+            entry = self._entries.pop(seq_id, None)
+            if entry is None:
+                self.orphaned += 1
+        return entry
+
+    def cancel(self, seq_id):
+        """
+        Keeps expecting the reply, but drops its handler.
+        """
+        with self._lock:
+            entry = self._entries.get(seq_id)
+            if entry is not None:
+                entry.handler = None
+
+    def discard(self, seq_id):
+        """
+        Forgets a request whose reply will never come (e.g. it was never sent).
+        """
+        with self._lock:
+            self._entries.pop(seq_id, None)
+
+    def reap(self, now=None):
+        """
+        Removes entries past their deadline and calls their timeout callbacks.
+        Returns the seq ids that timed out.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [(seq_id, entry) for seq_id, entry in self._entries.items() if entry.deadline <= now]
+            for seq_id, entry in expired:
+                del self._entries[seq_id]
+            self.timed_out += len(expired)
+
+        for seq_id, entry in expired:
+            if entry.on_timeout is not None:
+                entry.on_timeout(seq_id)
+        return [seq_id for seq_id, entry in expired]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def outstanding(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """
+        Counters for spotting leaks over long sessions.
+        """
+        with self._lock:
+            return {"outstanding": len(self._entries),
+                    "timed_out": self.timed_out,
+                    "orphaned": self.orphaned}
+
+    def __contains__(self, seq_id):
+        with self._lock:
+            return seq_id in self._entries
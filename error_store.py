@@ -0,0 +1,43 @@
+class ErrorStore:
+    """
+    The errors and warnings of a window, by file, as of the last
+    source-errors report. Each new report is compared with the previous
+    one, so that only the views (and the panel) whose errors changed need
+    repainting. Error counts and per-file queries are answered from here.
+    """
+
+    def __init__(self):
+        self.errors = [] # The last report, in stack-ide's order
+        self._files = {} # Map from file path (None for errors without a span) to its tuple of errors
+
+    def update(self, errors):
+        """
+        Takes in a new report, returning the paths whose errors changed
+        (None standing for the errors that have no file).
+        """
+        files = {}
+        for error in errors:
+            files.setdefault(error.span.filePath if error.span else None, []).append(error)
+        files = {path: tuple(file_errors) for (path, file_errors) in files.items()}
+
+        changed = set(path for path in set(files) | set(self._files)
+                      if files.get(path) != self._files.get(path))
+        self.errors = errors
+        self._files = files
+        return changed
+
+    def paths(self):
+        """
+        The files that have errors or warnings.
+        """
+        return [path for path in self._files if path is not None]
+
+    def for_file(self, path):
+        return self._files.get(path, ())
+
+    def count(self, kind, path=None):
+        """
+        The number of errors of the given kind, in one file or in all of them.
+        """
+        errors = self.errors if path is None else self.for_file(path)
+        return sum(1 for error in errors if error.kind == kind)
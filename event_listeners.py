@@ -6,16 +6,19 @@ except ImportError:
 import sys, os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from utility import is_haskell_view, relative_view_file_name, span_from_view_selection
+from utility import is_haskell_view, relative_view_file_name, span_from_view_selection, token_span_at
 from req import Req
 from win import Win
 from stack_ide_manager import StackIDEManager, send_request
-from response import parse_autocompletions
+from response import parse_autocompletions, parse_exp_types
+from completion_ranking import CompletionRanker
+from line_index import LineIndex
 
 class StackIDESaveListener(sublime_plugin.EventListener):
     """
     Ask stack-ide to recompile the saved source file,
     then request a report of source errors.
+    Bursts of saves are merged by StackIDE.save_files.
     """
     def on_post_save(self, view):
 
@@ -25,13 +28,36 @@ class StackIDESaveListener(sublime_plugin.EventListener):
         if not StackIDEManager.is_running(view.window()):
             return
 
-        StackIDEManager.for_window(view.window()).update_files([relative_view_file_name(view)])
+        StackIDEManager.for_window(view.window()).save_files([relative_view_file_name(view)])
+
+class StackIDEErrorLoadListener(sublime_plugin.EventListener):
+    """
+    Highlights the errors of a file that was not loaded yet when they were
+    reported, once its view is.
+    """
+    def on_load(self, view):
+        window = view.window()
+        if not view.file_name() or not StackIDEManager.is_running(window):
+            return
+        Win(window).highlight_errors([relative_view_file_name(view)])
 
 class StackIDETypeAtCursorHandler(sublime_plugin.EventListener):
     """
     Ask stack-ide for the type at the cursor each
     time it changes position.
+
+    Only the latest request per view gets its reply displayed. If quiet_period
+    is set, requests wait until the cursor has stayed put for that many ms.
+    Positions within an expression whose types we already know are
+    answered from the instance's TypeCache.
     """
+
+    quiet_period = 0
+
+    def __init__(self):
+        super(StackIDETypeAtCursorHandler, self).__init__()
+        self.cursor_moves = {} # Map from view id to number of pending cursor moves
+
     def on_selection_modified(self, view):
 
         if not is_haskell_view(view):
@@ -46,19 +72,69 @@ class StackIDETypeAtCursorHandler(sublime_plugin.EventListener):
         if view.file_name():
             # Uncomment to see the scope at the cursor:
             # Log.debug(view.scope_name(view.sel()[0].begin()))
-            request = Req.get_exp_types(span_from_view_selection(view))
-            send_request(window, request, Win(window).highlight_type)
+            if StackIDETypeAtCursorHandler.quiet_period > 0:
+                moves = self.cursor_moves.get(view.id(), 0) + 1
+                self.cursor_moves[view.id()] = moves
+                sublime.set_timeout(lambda: self._request_when_quiet(view, moves), StackIDETypeAtCursorHandler.quiet_period)
+            else:
+                self.request_type(view)
+
+    def _request_when_quiet(self, view, moves):
+        """
+        Only sends the request if the cursor hasn't moved again since.
+        """
+        if self.cursor_moves.get(view.id()) == moves:
+            del self.cursor_moves[view.id()]
+            self.request_type(view)
+
+    def on_modified(self, view):
+        if not is_haskell_view(view) or not view.file_name():
+            return
+        window = view.window()
+        if StackIDEManager.is_running(window):
+            instance = StackIDEManager.for_window(window)
+            instance.types.invalidate(relative_view_file_name(view))
+            instance.span_infos.recompiled([relative_view_file_name(view)])
+
+    def on_close(self, view):
+        LineIndex.forget(view.id())
+
+    def request_type(self, view):
+        window = view.window()
+        if not StackIDEManager.is_running(window):
+            return
+        instance = StackIDEManager.for_window(window)
+        span = span_from_view_selection(view)
+        types = instance.types.lookup(span)
+        if types is not None:
+            instance.cancel_superseded(("type_at_cursor", view.id()))
+            Win(window).show_types(types)
+            return
+        change_count = view.change_count()
+        token = token_span_at(view, view.sel()[0].begin())
+        request = Req.get_exp_types(span)
+        send_request(window, request, lambda exp_types: self._handle_types(view, instance, token, change_count, exp_types),
+                     ("type_at_cursor", view.id()))
+
+    def _handle_types(self, view, instance, token, change_count, exp_types):
+        types = list(parse_exp_types(exp_types))
+        # The reply is still shown if the view changed meanwhile, but not kept
+        if view.change_count() == change_count:
+            instance.types.store(token, types)
+        Win(view.window()).show_types(types)
 
 
 class StackIDEAutocompleteHandler(sublime_plugin.EventListener):
     """
     Dispatches autocompletion requests to stack-ide.
+    Prefixes that extend an earlier one are answered from the instance's CompletionCache.
+    Otherwise its IdentifierIndex gives a first answer, updated once stack-ide replies.
+    Only the completions CompletionRanker ranks best are formatted and offered.
     """
     def __init__(self):
         super(StackIDEAutocompleteHandler, self).__init__()
-        self.returned_completions = []
-        self.view = None
-        self.refreshing = False
+        self.returned_completions = {} # Map from view id to its latest completions
+        self.refreshing = set() # Ids of views whose completion list we are refreshing
 
     def on_query_completions(self, view, prefix, locations):
 
@@ -71,14 +147,28 @@ class StackIDEAutocompleteHandler(sublime_plugin.EventListener):
         # Check if this completion query is due to our refreshing the completions list
         # after receiving a response from stack-ide, and if so, don't send
         # another request for completions.
-        if not self.refreshing:
-            self.view = view
-            request = Req.get_autocompletion(filepath=relative_view_file_name(view),prefix=prefix)
-            send_request(window, request, self._handle_response)
+        filepath = relative_view_file_name(view)
+        instance = StackIDEManager.for_window(window)
+        if not view.id() in self.refreshing:
+            completions = instance.completions.lookup(filepath, prefix)
+            if completions is not None:
+                self.returned_completions[view.id()] = completions
+            else:
+                indexed = instance.identifiers.lookup(filepath, prefix)
+                if indexed is not None:
+                    self.returned_completions[view.id()] = indexed
+                request = Req.get_autocompletion(filepath=filepath,prefix=prefix)
+                send_request(window, request, lambda response: self._handle_response(view, instance, filepath, prefix, response))
 
         # Clear the flag to allow future completion queries
-        self.refreshing = False
-        return list(self.format_completion(*completion) for completion in self.returned_completions)
+        self.refreshing.discard(view.id())
+        completions = CompletionRanker.top(self.returned_completions.get(view.id(), []), prefix, filepath,
+                                           ("main", instance.project_name))
+        return list(self.format_completion(*completion) for completion in completions)
+
+    def on_close(self, view):
+        self.returned_completions.pop(view.id(), None)
+        self.refreshing.discard(view.id())
 
 
     def format_completion(self, prop, scope):
@@ -87,15 +177,18 @@ class StackIDEAutocompleteHandler(sublime_plugin.EventListener):
                                     scope.importedFrom.module if scope else ''),
                  prop.name]
 
-    def _handle_response(self, response):
-        self.returned_completions = list(parse_autocompletions(response))
-        self.view.run_command('hide_auto_complete')
-        sublime.set_timeout(self.run_auto_complete, 0)
+    def _handle_response(self, view, instance, filepath, prefix, response):
+        completions = list(parse_autocompletions(response))
+        instance.completions.store(filepath, prefix, completions)
+        instance.identifiers.update(filepath, prefix, completions)
+        self.returned_completions[view.id()] = completions
+        view.run_command('hide_auto_complete')
+        sublime.set_timeout(lambda: self.run_auto_complete(view), 0)
 
 
-    def run_auto_complete(self):
-        self.refreshing = True
-        self.view.run_command("auto_complete", {
+    def run_auto_complete(self, view):
+        self.refreshing.add(view.id())
+        view.run_command("auto_complete", {
             'disable_auto_insert': True,
             # 'api_completions_only': True,
             'next_completion_if_showing': False,
@@ -0,0 +1,82 @@
+import bisect
+import os
+
+
+class IdentifierIndex:
+    """
+    Every identifier in scope in each loaded module, so completions can be
+    offered straight away, even while stack-ide is busy recompiling.
+
+    Each file's identifiers are kept sorted by name, so the completions for
+    a prefix are a slice found by bisection. A file's entry is replaced
+    wholesale when it is refreshed after a recompile, and the slice for a
+    prefix is replaced whenever a fresher autocompletion reply comes in.
+    """
+
+    def __init__(self):
+        self._names = {} # Map from file path to sorted identifier names
+        self._entries = {} # Map from file path to [(IdProp, IdScope)], parallel to its names
+        self.stale = set() # Files whose entries need refreshing once they are compiled
+
+    def lookup(self, path, prefix):
+        """
+        Returns the indexed completions for prefix in the file, or None if it isn't indexed.
+        """
+        names = self._names.get(path)
+        if names is None or '.' in prefix:
+            return None
+        (start, end) = prefix_range(names, prefix)
+        return self._entries[path][start:end]
+
+    def replace(self, path, completions):
+        """
+        Sets all identifiers in scope in the file, from an autocompletion reply for the empty prefix.
+        """
+        completions = sorted(completions, key=lambda completion: completion[0].name)
+        self._names[path] = [prop.name for (prop, scope) in completions]
+        self._entries[path] = completions
+        self.stale.discard(path)
+
+    def update(self, path, prefix, completions):
+        """
+        Replaces the identifiers matching prefix in the file with a fresher reply for it.
+        Names in the reply not starting with prefix (e.g. qualified ones) are left
+        out, as they would break the order the lookups bisect.
+        """
+        names = self._names.get(path)
+        if names is None or '.' in prefix:
+            return
+        completions = sorted((completion for completion in completions if completion[0].name.startswith(prefix)),
+                             key=lambda completion: completion[0].name)
+        (start, end) = prefix_range(names, prefix)
+        names[start:end] = [prop.name for (prop, scope) in completions]
+        self._entries[path][start:end] = completions
+
+    def mark_stale(self, paths):
+        self.stale.update(paths)
+
+    def stale_loaded(self, loaded_modules):
+        """
+        The stale files whose modules are among those stack-ide has loaded.
+        """
+        loaded_modules = set(loaded_modules)
+        return [path for path in self.stale if module_name_candidates(path) & loaded_modules]
+
+    def __len__(self):
+        return sum(len(names) for names in self._names.values())
+
+
+def prefix_range(names, prefix):
+    """
+    The range of sorted names that start with prefix.
+    """
+    return (bisect.bisect_left(names, prefix), bisect.bisect_left(names, prefix + '\U0010ffff'))
+
+
+def module_name_candidates(path):
+    """
+    The module names a source file could define, e.g. {"Lib", "Data.Lib", "src.Data.Lib"}
+    for src/Data/Lib.hs, since we don't know which directories are source roots.
+    """
+    parts = os.path.splitext(os.path.normpath(path))[0].split(os.sep)
+    return set('.'.join(parts[start:]) for start in range(len(parts)))
@@ -0,0 +1,70 @@
+import os
+
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+from req import Req
+from utility import SESSION_FILE
+
+
+class IncludeTargets:
+    """
+    The modules a project's session compiles. stack-ide can only be sent
+    the whole list, so it is sent when it changed since it was last sent,
+    and otherwise the session is updated without it.
+
+    The list is saved per project (for the recently used ones), so that the
+    next session starts from it and only sends it once. Once stack lists the
+    project's targets, the saved ones it doesn't list are dropped, unless
+    they were saved in this session.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self.targets = set(target for target in self.saved()
+                           if os.path.isfile(os.path.join(project_path, target)))
+        self.sent = None # The targets stack-ide last got, None if it got none yet
+        self.added = set() # The targets added in this session
+
+    def saved(self):
+        return sublime.load_settings(SESSION_FILE).get("include_targets", {}).get(self.project_path, [])
+
+    def add(self, filepaths):
+        self.targets.update(filepaths)
+        self.added.update(filepaths)
+
+    def reconcile(self, listed):
+        """
+        Makes the targets those stack lists plus those added in this session,
+        so a bad target saved earlier (say, a second module with a main) goes.
+        Returns whether they changed.
+        """
+        targets = set(listed) | self.added
+        changed = targets != self.targets
+        self.targets = targets
+        return changed
+
+    def clear(self):
+        self.targets = set()
+        self.added = set()
+
+    def update_request(self):
+        """
+        The request to recompile the session, with the targets if they changed.
+        """
+        if self.targets == self.sent:
+            return Req.update_session()
+        self.sent = set(self.targets)
+        self.save()
+        return Req.update_session_includes(sorted(self.targets))
+
+    def save(self):
+        session = sublime.load_settings(SESSION_FILE)
+        recent = set(session.get("recent_projects", [])) | set([self.project_path])
+        saved = dict((project_path, targets) for (project_path, targets) in session.get("include_targets", {}).items()
+                     if project_path in recent)
+        saved[self.project_path] = sorted(self.targets)
+        session.set("include_targets", saved)
+        sublime.save_settings(SESSION_FILE)
@@ -0,0 +1,129 @@
+import collections
+import os
+import sys
+import threading
+
+try:
+    import fcntl
+    import selectors
+except ImportError:
+    # Windows has no fcntl, and Python 3.3 (Sublime Text 3) no selectors
+    fcntl = selectors = None
+
+from log import Log
+
+class IOLoop:
+    """
+    A single thread that reads the output of every stack-ide backend.
+
+    Readers are registered with a non-blocking read function and a callback.
+    The callback runs on the loop thread with each chunk read, and once with
+    b'' when the stream hits EOF (or fails), after which it is unregistered.
+    That is how we notice a process has exited, without polling it.
+
+    Windows can't select() on pipes, and Python 3.3 has no selectors, so
+    there backends keep their own reader threads instead (see `supported`).
+    """
+
+    supported = os.name != 'nt' and selectors is not None
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = IOLoop()
+            return cls._shared
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._pending = collections.deque() # Registrations waiting to be picked up by the loop thread
+        self._lock = threading.Lock()
+        (self._wakeup_read, self._wakeup_write) = os.pipe()
+        set_non_blocking(self._wakeup_read)
+        set_non_blocking(self._wakeup_write)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add_reader(self, fileobj, read, callback):
+        """
+        Starts watching fileobj. read() is called when it is readable and
+        should return the available bytes without blocking.
+        """
+        with self._lock:
+            self._pending.append((fileobj, read, callback))
+        self._wake_up()
+
+    def reader_count(self):
+        return len(self._selector.get_map()) - 1
+
+    def run(self):
+        while True:
+            # One bad stream mustn't stop the output of every backend
+            try:
+                for key, events in self._selector.select():
+                    if key.fileobj == self._wakeup_read:
+                        self._register_pending()
+                    else:
+                        self._read(key)
+            except Exception:
+                Log.error("Stack-IDE IO loop iteration failed: ", sys.exc_info())
+
+    def _wake_up(self):
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except BlockingIOError:
+            # Already more than enough wake-ups pending
+            pass
+
+    def _register_pending(self):
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            (pending, self._pending) = (self._pending, collections.deque())
+        for (fileobj, read, callback) in pending:
+            try:
+                self._selector.register(fileobj, selectors.EVENT_READ, (read, callback))
+            except (ValueError, KeyError):
+                # Closed already, or registered twice
+                Log.warning("Stack-IDE stream couldn't be watched: ", sys.exc_info())
+                self._end(callback)
+
+    def _end(self, callback):
+        try:
+            callback(b'')
+        except Exception:
+            Log.error("Stack-IDE stream callback failed: ", sys.exc_info())
+
+    def _read(self, key):
+        (read, callback) = key.data
+        try:
+            chunk = read()
+        except (BlockingIOError, InterruptedError):
+            return
+        except (OSError, ValueError):
+            Log.warning("Stack-IDE stream ending due to exception: ", sys.exc_info())
+            chunk = b''
+
+        if not chunk:
+            self._selector.unregister(key.fileobj)
+
+        try:
+            callback(chunk)
+        except Exception:
+            Log.error("Stack-IDE stream callback failed: ", sys.exc_info())
+
+
+def set_non_blocking(fd):
+    """
+    Makes reads from (and writes to) a file descriptor return straight away.
+    (os.set_blocking only came with Python 3.5.)
+    """
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
@@ -0,0 +1,65 @@
+import bisect
+
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+
+class LineIndex:
+    """
+    Where each line of a view starts, so that spans (1-based lines and
+    columns) and points convert with plain arithmetic rather than a
+    text_point or rowcol call into Sublime each. It is built from the
+    view's text once per change count, and kept until the view is closed.
+    """
+
+    views = {} # Map from view id to its LineIndex
+
+    def __init__(self, text, change_count):
+        self.change_count = change_count
+        self.size = len(text)
+        self.starts = [0]
+        end = text.find("\n")
+        while end >= 0:
+            self.starts.append(end + 1)
+            end = text.find("\n", end + 1)
+
+    @classmethod
+    def for_view(cls, view):
+        change_count = view.change_count()
+        index = cls.views.get(view.id())
+        if index is None or index.change_count != change_count:
+            index = cls.views[view.id()] = LineIndex(view.substr(sublime.Region(0, view.size())), change_count)
+        return index
+
+    @classmethod
+    def forget(cls, view_id):
+        cls.views.pop(view_id, None)
+
+    def text_point(self, row, col):
+        """
+        The point at a 0-based row and column, kept within the row.
+        """
+        if row >= len(self.starts):
+            return self.size
+        row = max(row, 0)
+        line_end = self.starts[row + 1] - 1 if row + 1 < len(self.starts) else self.size
+        return min(self.starts[row] + max(col, 0), line_end)
+
+    def rowcol(self, point):
+        """
+        The 0-based (row, column) of a point.
+        """
+        row = bisect.bisect_right(self.starts, point) - 1
+        return (row, point - self.starts[row])
+
+    def region(self, span):
+        """
+        Maps a SourceSpan to a Region.
+        """
+        return sublime.Region(self.text_point(span.fromLine - 1, span.fromColumn - 1),
+                              self.text_point(span.toLine - 1, span.toColumn - 1))
+
+    def regions(self, spans):
+        return [self.region(span) for span in spans]
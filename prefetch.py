@@ -0,0 +1,112 @@
+import collections
+import re
+
+try:
+    import sublime
+except ImportError:
+    from test.stubs import sublime
+
+from req import Req
+from response import parse_exp_types, parse_span_info_response
+from scheduler import SPECULATIVE
+from utility import span_from_view_region, token_span_at
+
+IDENTIFIER = re.compile(r"[A-Za-z_][\w']*")
+
+HASKELL_KEYWORDS = frozenset([
+    "case", "class", "data", "default", "deriving", "do", "else", "foreign", "if", "import",
+    "in", "infix", "infixl", "infixr", "instance", "let", "module", "newtype", "of", "then",
+    "type", "where", "qualified", "as", "hiding", "forall"])
+
+
+class Prefetcher:
+    """
+    Fetches the types and span info of the identifiers in a view's visible
+    region in the background, after its module compiled cleanly, so that
+    moving the cursor onto them (or asking for their info) is answered from
+    the TypeCache and SpanInfoCache.
+
+    Requests go out one at a time as speculative work, at most
+    `max_requests` per pass and `delay` ms apart. A pass stops when the view
+    is edited, and starts over for the new region when the view is scrolled.
+    """
+
+    max_requests = 0 # Set from the prefetch_types setting; 0 disables prefetching
+    delay = 50
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.jobs = {} # Map from view id to its running PrefetchJob
+
+    def start(self, view):
+        self.cancel(view.id())
+        if Prefetcher.max_requests <= 0:
+            return
+        region = view.visible_region()
+        job = PrefetchJob(view, region, view.change_count(),
+                          identifier_positions(view, region, Prefetcher.max_requests))
+        self.jobs[view.id()] = job
+        self._next(job)
+
+    def cancel(self, view_id):
+        if self.jobs.pop(view_id, None) is not None:
+            self.instance.cancel_superseded(("prefetch", view_id))
+
+    def clear(self):
+        for view_id in list(self.jobs):
+            self.cancel(view_id)
+
+    def _next(self, job):
+        view = job.view
+        if self.jobs.get(view.id()) is not job:
+            return
+        if view.change_count() != job.change_count:
+            self.cancel(view.id())
+            return
+        if view.visible_region() != job.region:
+            self.start(view)
+            return
+
+        while job.positions:
+            (position, kind) = job.positions.popleft()
+            span = span_from_view_region(view, sublime.Region(position, position))
+            if kind == "types" and self.instance.types.lookup(span) is None:
+                request = Req.get_exp_types(span)
+            elif kind == "span_info" and self.instance.span_infos.lookup(span) is None:
+                request = Req.get_exp_info(span)
+            else:
+                continue
+            generation = self.instance.span_infos.generation(span["spanFilePath"])
+            self.instance.send_request(request,
+                                       lambda contents: self._handle_response(job, position, kind, span, generation, contents),
+                                       ("prefetch", view.id()), priority=SPECULATIVE)
+            return
+        del self.jobs[view.id()]
+
+    def _handle_response(self, job, position, kind, span, generation, contents):
+        if job.view.change_count() == job.change_count:
+            if kind == "types":
+                self.instance.types.store(token_span_at(job.view, position), list(parse_exp_types(contents)))
+            else:
+                self.instance.span_infos.store(span, list(parse_span_info_response(contents)), generation)
+        sublime.set_timeout(lambda: self._next(job), Prefetcher.delay)
+
+
+PrefetchJob = collections.namedtuple('PrefetchJob', ['view', 'region', 'change_count', 'positions'])
+
+
+def identifier_positions(view, region, limit):
+    """
+    Where the first `limit` identifiers in the region start, skipping
+    keywords, comments and strings. Each is listed for both kinds of info.
+    """
+    positions = []
+    offset = region.begin()
+    for match in IDENTIFIER.finditer(view.substr(region)):
+        if len(positions) >= limit:
+            break
+        position = offset + match.start()
+        if match.group() in HASKELL_KEYWORDS or view.match_selector(position, "comment, string"):
+            continue
+        positions.append(position)
+    return collections.deque((position, kind) for position in positions for kind in ("types", "span_info"))
@@ -0,0 +1,52 @@
+class RegionManager:
+    """
+    Remembers what each view of a window shows under our region and status
+    keys, so that add_regions, erase_regions and set_status are only called
+    when that changes.
+    """
+
+    def __init__(self):
+        self._views = {} # Map from view id to (view, {key: the regions or status shown})
+
+    def add_regions(self, view, key, regions, scope, icon, flags):
+        if self._swap(view, ("regions", key), regions, []):
+            if regions:
+                view.add_regions(key, regions, scope, icon, flags)
+            else:
+                view.erase_regions(key)
+
+    def set_status(self, view, key, value):
+        if self._swap(view, ("status", key), value, ""):
+            view.set_status(key, value)
+
+    def shows(self, view, key):
+        """
+        Whether we have set the regions of the key in the view, even if to none.
+        """
+        entry = self._views.get(view.id())
+        return entry is not None and ("regions", key) in entry[1]
+
+    def clear(self, key):
+        """
+        Erases the regions and status of the key in the views that show any.
+        """
+        for (view_id, (view, shown)) in list(self._views.items()):
+            if not view.is_valid():
+                del self._views[view_id]
+                continue
+            if shown.get(("regions", key)):
+                self.add_regions(view, key, [], "", "", 0)
+            if shown.get(("status", key)):
+                self.set_status(view, key, "")
+
+    def _swap(self, view, shown_key, value, empty):
+        """
+        Records the value shown, returning whether it differs from the last one.
+        A view we have not touched yet is taken to show nothing.
+        """
+        entry = self._views.get(view.id())
+        if entry is None:
+            entry = self._views[view.id()] = (view, {})
+        previous = entry[1].get(shown_key, empty)
+        entry[1][shown_key] = value
+        return previous != value
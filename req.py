@@ -26,6 +26,10 @@ class Req:
     def get_exp_info(exp_span):
         return { "tag": "RequestGetSpanInfo", "contents": exp_span}
 
+    @staticmethod
+    def get_loaded_modules():
+        return {"tag": "RequestGetLoadedModules", "contents": []}
+
     @staticmethod
     def get_shutdown():
         return {"tag":"RequestShutdownSession", "contents":[]}
@@ -1,3 +1,5 @@
+import sys
+
 #############################################
 # PARSING
 #
@@ -21,6 +23,13 @@ def parse_autocompletions(contents):
             parse_idscope(item.get('idScope'))) for item in contents)
 
 
+def parse_loaded_modules(contents):
+    """
+    Converts ResponseGetLoadedModules content into a list of module names
+    """
+    return [intern(module) for module in contents]
+
+
 def parse_update_session(contents):
     """
     Converts a ResponseUpdateSession message to a single status string
@@ -80,8 +89,9 @@ def parse_idprop(values):
     """
     Converts idProp content into an IdProp object.
     """
-    return IdProp(values.get('idDefinedIn').get('moduleName'),
-                    values.get('idDefinedIn').get('modulePackage').get('packageName'),
+    definedIn = values.get('idDefinedIn')
+    return IdProp(intern(definedIn.get('modulePackage').get('packageName')),
+                    intern(definedIn.get('moduleName')),
                     values.get('idType'),
                     values.get('idName'),
                     parse_either_span(values.get('idDefSpan')))
@@ -92,8 +102,8 @@ def parse_idscope(values):
     Converts idScope content into an IdScope object (containing only an IdImportedFrom)
     """
     importedFrom = values.get('idImportedFrom')
-    return IdScope(IdImportedFrom(importedFrom.get('moduleName'),
-                                  importedFrom.get('modulePackage').get('packageName'))) if importedFrom else None
+    return IdScope(IdImportedFrom(intern(importedFrom.get('moduleName')),
+                                  intern(importedFrom.get('modulePackage').get('packageName')))) if importedFrom else None
 
 
 def parse_either_span(json):
@@ -110,19 +120,28 @@ def parse_source_span(json):
     """
     Converts json into a SourceSpan
     """
-    paths = ['spanFilePath', 'spanFromLine', 'spanFromColumn', 'spanToLine', 'spanToColumn']
-    fields = get_paths(paths, json)
-    return SourceSpan(*fields) if fields else None
+    if not json:
+        return None
+    return SourceSpan(intern(json.get('spanFilePath')),
+                      json.get('spanFromLine'),
+                      json.get('spanFromColumn'),
+                      json.get('spanToLine'),
+                      json.get('spanToColumn'))
 
 
-def get_paths(paths, values):
+def intern(value):
     """
-    Converts a list of keypaths into an array of values from a dict
+    Interns file paths, module and package names, which repeat a lot
+    within (and across) responses, so that each is only kept once.
     """
-    return list(values.get(path) for path in paths)
+    return sys.intern(value) if isinstance(value, str) else value
 
 
+# The types below are created by the thousand for large responses,
+# so they use __slots__ rather than a __dict__ per instance.
+
 class SourceError():
+    __slots__ = ('kind', 'msg', 'span')
 
     def __init__(self, kind, message, span):
         self.kind = kind
@@ -140,8 +159,16 @@ class SourceError():
         else:
             return self.msg
 
+    def __eq__(self, other):
+        return (isinstance(other, SourceError) and self.kind == other.kind
+                and self.msg == other.msg and self.span == other.span)
+
+    def __hash__(self):
+        return hash((self.kind, self.msg, self.span))
+
 
 class SourceSpan():
+    __slots__ = ('filePath', 'fromLine', 'fromColumn', 'toLine', 'toColumn')
 
     def __init__(self, filePath, fromLine, fromColumn, toLine, toColumn):
         self.filePath = filePath
@@ -150,14 +177,25 @@ class SourceSpan():
         self.toLine = toLine
         self.toColumn = toColumn
 
+    def _key(self):
+        return (self.filePath, self.fromLine, self.fromColumn, self.toLine, self.toColumn)
+
+    def __eq__(self, other):
+        return isinstance(other, SourceSpan) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
 
 class IdScope():
+    __slots__ = ('importedFrom',)
 
     def __init__(self, importedFrom):
         self.importedFrom = importedFrom
 
 
 class IdImportedFrom():
+    __slots__ = ('module', 'package')
 
     def __init__(self, module, package):
         self.module = module
@@ -165,6 +203,7 @@ class IdImportedFrom():
 
 
 class IdProp():
+    __slots__ = ('package', 'module', 'type', 'name', 'defSpan')
 
     def __init__(self, package, module, type, name, defSpan):
         self.package = package
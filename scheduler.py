@@ -0,0 +1,130 @@
+import collections
+import threading
+
+# Priority classes, highest first. Speculative work (index refreshes,
+# prefetching) is never classified by tag, only asked for explicitly, so
+# that it can't hold up the updates and error reports of saves.
+INTERACTIVE = 0
+NAVIGATION  = 1
+BACKGROUND  = 2
+SPECULATIVE = 3
+
+PRIORITY_NAMES = ["interactive", "navigation", "background", "speculative"]
+
+REQUEST_PRIORITIES = {
+    "RequestGetAutocompletion": INTERACTIVE,
+    "RequestGetExpTypes": INTERACTIVE,
+    "RequestGetSpanInfo": INTERACTIVE,
+    "RequestUpdateSession": BACKGROUND,
+    "RequestGetSourceErrors": BACKGROUND
+}
+
+def priority_of(request):
+    """
+    Classifies a request by its tag. Anything we don't know about
+    (e.g. requests sent with send_stack_ide_request) counts as navigation.
+    """
+    return REQUEST_PRIORITIES.get(request.get("tag"), NAVIGATION)
+
+
+class RequestScheduler:
+    """
+    Decides the order in which requests are passed on to the backend.
+
+    Each priority class has its own FIFO queue and a cap on how many of its
+    requests may be awaiting a reply at once. Whenever a slot frees up, the
+    highest priority class with queued work goes first, so keystroke-driven
+    requests skip ahead of queued background work.
+
+    Requests without a seq get no reply we could wait for, so they never
+    occupy a slot; they only keep their place in their class's queue.
+    Speculative work has a class of its own, below background, so a save's
+    seq-less update never queues behind it.
+    """
+
+    default_limits = {INTERACTIVE: 2, NAVIGATION: 1, BACKGROUND: 1, SPECULATIVE: 1}
+
+    def __init__(self, send, limits=None):
+        self._send = send
+        self._limits = dict(RequestScheduler.default_limits)
+        self._limits.update(limits or {})
+        self._queues = [collections.deque() for _ in PRIORITY_NAMES]
+        self._in_flight = {} # Map from seq to priority class
+        self._lock = threading.RLock()
+
+    def submit(self, request, priority=None):
+        """
+        Queues a request and sends whatever may go out now.
+        """
+        if priority is None:
+            priority = priority_of(request)
+        with self._lock:
+            self._queues[priority].append(request)
+            self._dispatch()
+
+    def complete(self, seq_id):
+        """
+        Frees the slot of a request once its reply (or lack thereof) is known.
+        """
+        with self._lock:
+            if self._in_flight.pop(seq_id, None) is not None:
+                self._dispatch()
+
+    def cancel(self, seq_id):
+        """
+        Removes a request that has not been sent yet.
+        Returns False if it is already on its way.
+        """
+        with self._lock:
+            for queue in self._queues:
+                for request in queue:
+                    if request.get("seq") == seq_id:
+                        queue.remove(request)
+                        return True
+        return False
+
+    def clear(self):
+        """
+        Forgets all queued and in-flight requests.
+        """
+        with self._lock:
+            for queue in self._queues:
+                queue.clear()
+            self._in_flight.clear()
+
+    def queue_depths(self):
+        """
+        Number of queued requests per priority class, by name.
+        """
+        with self._lock:
+            return {name: len(queue) for name, queue in zip(PRIORITY_NAMES, self._queues)}
+
+    def in_flight(self):
+        """
+        Number of requests awaiting a reply per priority class, by name.
+        """
+        with self._lock:
+            priorities = list(self._in_flight.values())
+            return {name: priorities.count(priority) for priority, name in enumerate(PRIORITY_NAMES)}
+
+    def _dispatch(self):
+        # Sending may synchronously produce a reply (and so a nested dispatch),
+        # so pick one request at a time.
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            self._send(request)
+
+    def _next_request(self):
+        in_flight = list(self._in_flight.values())
+        for priority, queue in enumerate(self._queues):
+            if not queue:
+                continue
+            seq_id = queue[0].get("seq")
+            if seq_id is None:
+                return queue.popleft()
+            if in_flight.count(priority) < self._limits[priority]:
+                self._in_flight[seq_id] = priority
+                return queue.popleft()
+        return None
@@ -1,6 +1,19 @@
 class Settings:
 
-    def __init__(self, verbosity, add_to_PATH, show_popup):
+    def __init__(self, verbosity, add_to_PATH, show_popup, type_at_cursor_delay=0, daemon_socket="",
+                 warm_pool_size=0, warm_pool_memory_mb=2048, completion_limit=100, completion_weights=None,
+                 prefetch_types=40, error_panel_limit=200,
+                 error_tab_limit=10, save_coalesce_delay=100):
         self.verbosity = verbosity
         self.add_to_PATH = add_to_PATH
         self.show_popup = show_popup
+        self.type_at_cursor_delay = type_at_cursor_delay
+        self.daemon_socket = daemon_socket
+        self.warm_pool_size = warm_pool_size
+        self.warm_pool_memory_mb = warm_pool_memory_mb
+        self.completion_limit = completion_limit
+        self.completion_weights = completion_weights or {}
+        self.prefetch_types = prefetch_types
+        self.error_panel_limit = error_panel_limit
+        self.error_tab_limit = error_tab_limit
+        self.save_coalesce_delay = save_coalesce_delay
@@ -0,0 +1,90 @@
+from type_cache import SpanIndex, contains, span_start, span_end
+
+
+class SpanInfoCache:
+    """
+    Remembers span-info replies (what an identifier is and where it is
+    defined), shared by goto-definition and the info popup.
+
+    A reply describes the identifier under the requested span, so it is
+    indexed per file by that identifier's span. Every file has a compile
+    generation, bumped when it is recompiled or edited; its entries go
+    then, as do those of files using its definitions, found through a
+    reverse map from definition sites to use sites. Replies to requests
+    made before the bump are not kept.
+    """
+
+    def __init__(self):
+        self._files = {} # Map from file path to the SpanIndex of its replies
+        self._generations = {} # Map from file path to its compile generation
+        self._uses = {} # Map from definition site (path, line, column) to its use sites {(path, start, end)}
+        self._definitions = {} # Map from file path to the definition sites its entries use
+        self.hits = 0
+
+    def generation(self, path):
+        return self._generations.get(path, 0)
+
+    def lookup(self, span):
+        """
+        Returns the [((IdProp, IdScope), SourceSpan)] for a request span, or None if stack-ide has to be asked.
+        """
+        index = self._files.get(span.get("spanFilePath"))
+        if index is None:
+            return None
+        infos = index.lookup(span_start(span), span_end(span))
+        if infos is not None:
+            self.hits += 1
+        return infos
+
+    def store(self, span, infos, generation):
+        """
+        Remembers the infos parsed from the reply to a request span, made
+        when the file had the given compile generation.
+        """
+        path = span.get("spanFilePath")
+        if not infos or infos[0][1] is None or generation != self.generation(path):
+            return
+        ((props, scope), use_span) = infos[0]
+        start = (use_span.fromLine, use_span.fromColumn)
+        end = (use_span.toLine, use_span.toColumn)
+        if not contains(start, end, span_start(span), span_end(span)):
+            return
+        self._files.setdefault(path, SpanIndex()).add(start, end, infos)
+
+        definition = props.defSpan
+        if definition is not None:
+            site = (definition.filePath, definition.fromLine, definition.fromColumn)
+            self._uses.setdefault(site, set()).add((path, start, end))
+            self._definitions.setdefault(path, set()).add(site)
+
+    def uses_of(self, path, line, column):
+        """
+        The known use sites [(path, start, end)] of the definition at path:line:column.
+        """
+        return sorted(self._uses.get((path, line, column), ()))
+
+    def recompiled(self, paths):
+        """
+        Drops the entries of recompiled (or edited) files, and of the files using their definitions.
+        """
+        paths = set(paths)
+        stale = set(paths)
+        for site, uses in self._uses.items():
+            if site[0] in paths:
+                stale.update(use[0] for use in uses)
+        for path in stale:
+            self._generations[path] = self.generation(path) + 1
+            self._evict(path)
+
+    def clear(self):
+        self.recompiled(list(self._files))
+
+    def _evict(self, path):
+        self._files.pop(path, None)
+        for site in self._definitions.pop(path, ()):
+            uses = self._uses.get(site)
+            if uses is None:
+                continue
+            uses.difference_update([use for use in uses if use[0] == path])
+            if not uses:
+                del self._uses[site]
@@ -4,17 +4,30 @@ except ImportError:
     from test.stubs import sublime
 
 import subprocess, os
+import socket
 import sys
 import threading
 import json
-import uuid
+import collections
+import re
+import time
+import traceback
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from utility import first_folder, complain
+from utility import first_folder, complain, relative_view_file_name, is_haskell_view
 from req import Req
 from log import Log
 from win import Win
+from scheduler import RequestScheduler, SPECULATIVE
+from correlation import CorrelationTable
+from io_loop import IOLoop, set_non_blocking
+from completion_cache import CompletionCache
+from identifier_index import IdentifierIndex
+from type_cache import TypeCache
+from span_info_cache import SpanInfoCache
+from prefetch import Prefetcher
+from include_targets import IncludeTargets
 import response as res
 
 # Make sure Popen hides the console on Windows.
@@ -25,76 +38,288 @@ if os.name == 'nt':
     CREATE_NO_WINDOW = 0x08000000
 
 class StackIDE:
+    """
+    A stack-ide session for a project, shared by every window that has
+    the project open.
+    """
 
+    # Seconds of main thread time to spend on handling responses per tick
+    inbox_budget = 0.010
 
-    def __init__(self, window, settings, backend=None):
-        self.window = window
+    # Milliseconds during which saves are merged into one recompile; set from
+    # the save_coalesce_delay setting, 0 recompiles on every save
+    save_delay = 0
+
+    # Seconds after which saves stop waiting for a compile whose errors never came
+    compile_wait = 60
+
+    # Seconds to wait for the errors of a compile, which only come once it is
+    # done; a cold start on a large project takes far longer than other replies
+    compile_timeout = 3600
 
-        self.conts = {} # Map from uuid to response handler
+    def __init__(self, window, settings, backend=None):
+        self.windows = {window.id(): window} # Map from window id to the windows using this instance
+
+        self.conts = CorrelationTable() # Map from seq id to response handler
+        self.superseded = {} # Map from supersession key to the seq id of its latest request
+        self.inbox = collections.deque() # Response handlers waiting to run on the main thread
+        self._inbox_lock = threading.Lock()
+        self._inbox_scheduled = False
+        self._progress = None # Latest session progress message not shown yet
+        self.completions = CompletionCache()
+        self.identifiers = IdentifierIndex()
+        self.types = TypeCache()
+        self.span_infos = SpanInfoCache()
+        self.prefetcher = Prefetcher(self)
         self.is_alive  = True
         self.is_active = False
         self.process   = None
         self.project_path = first_folder(window)
+        self.project_root = os.path.realpath(self.project_path)
         (project_in, project_name) = os.path.split(self.project_path)
         self.project_name = project_name
 
         reset_env(settings.add_to_PATH)
 
         if backend is None:
-            self._backend = stack_ide_start(self.project_path, self.project_name, self.handle_response)
-        else: # for testing
+            self._backend = stack_ide_start(self.project_path, self.project_name, self.handle_response, self.handle_dropped, settings.daemon_socket)
+        else: # for testing, or a warm backend from the BackendPool
             self._backend = backend
             self._backend.handler = self.handle_response
+            self._backend.drop_handler = self.handle_dropped
 
+        self.scheduler = RequestScheduler(self._dispatch)
         self.is_active = True
-        self.include_targets = set()
+        self.include_targets = IncludeTargets(self.project_path)
+        self._pending_saves = [] # Saved files waiting for the coalescing window to close
+        self._flush_scheduled = False
+        self._compiling_since = None # When the update we await the errors of was sent
+        self._compile_seq = None # The seq id of the request for those errors
+        self._refreshing = collections.deque() # Modules whose identifiers are still to be re-indexed
+        self._logged_stats = None # The request counters last logged
 
         # TODO: could check packages here to fix the 'project_dir must equal packagename issue'
 
         sublime.set_timeout_async(self.load_initial_targets, 0)
 
 
-    def send_request(self, request, response_handler = None):
+    def send_request(self, request, response_handler = None, supersede = None, timeout = None, priority = None):
         """
-        Associates requests with handlers and passes them on to the process.
+        Associates requests with handlers and passes them on to the process,
+        via the scheduler so interactive requests go before background ones.
+        The priority class defaults to the one for the request's tag.
+
+        Requests sharing a supersede key are latest-wins: sending a new one
+        cancels the handler of the previous one if its reply is still pending.
+        Handlers whose reply doesn't arrive within timeout seconds are dropped.
+        Returns the seq id of a request with a handler.
         """
+        seq_id = None
         if self._backend:
             if response_handler is not None:
-                seq_id = str(uuid.uuid4())
-                self.conts[seq_id] = response_handler
+                seq_id = self.conts.register(response_handler, timeout, self._handle_timeout)
                 request = request.copy()
                 request['seq'] = seq_id
 
-            self._backend.send_request(request)
+                if supersede is not None:
+                    self.cancel_superseded(supersede)
+                    self.superseded[supersede] = seq_id
+
+            self.scheduler.submit(request, priority)
         else:
             Log.error("Couldn't send request, no process!", request)
+        return seq_id
+
 
+    def cancel_superseded(self, supersede):
+        """
+        Cancels the handler of the latest request with the supersede key,
+        e.g. because it was answered locally instead. If it is still queued
+        (by the scheduler or the backend) it isn't sent at all.
+        """
+        previous_seq_id = self.superseded.pop(supersede, None)
+        if previous_seq_id is not None:
+            if self.scheduler.cancel(previous_seq_id):
+                self.conts.discard(previous_seq_id)
+            elif self._backend is not None and self._backend.withdraw(previous_seq_id):
+                self.scheduler.complete(previous_seq_id)
+                self.conts.discard(previous_seq_id)
+            else:
+                self.conts.cancel(previous_seq_id)
 
     def load_initial_targets(self):
         """
-        Get the initial list of files to check
+        Get the initial list of files to check. The targets saved by the last
+        session are sent right away; stack's list replaces them once it comes,
+        and only gets sent if they differ.
         """
+        saved_targets = list(self.include_targets.targets)
+        if saved_targets:
+            sublime.set_timeout(lambda: self.recompile(saved_targets), 0)
         initial_targets = stack_ide_loadtargets(self.project_path, self.project_name)
-        sublime.set_timeout(lambda: self.update_files(initial_targets), 0)
+        sublime.set_timeout(lambda: self._reconcile_targets(initial_targets), 0)
 
+    def _reconcile_targets(self, initial_targets):
+        if self.include_targets.reconcile(initial_targets) or self.include_targets.sent is None:
+            self.recompile(initial_targets)
 
-    def update_new_include_targets(self, filepaths):
-        for filepath in filepaths:
-            self.include_targets.add(filepath)
-        return list(self.include_targets)
+    def clear_targets(self):
+        """
+        Forgets the targets saved by earlier sessions and added by saves,
+        going back to the ones stack lists for the project.
+        """
+        self.include_targets.clear()
+        sublime.set_timeout_async(self.load_initial_targets, 0)
+
+
+    def save_files(self, filenames):
+        """
+        Recompiles saved files. Saves landing within save_delay ms of the first
+        one are merged into a single update, which also waits for the compile
+        in progress to report its errors.
+        """
+        if StackIDE.save_delay <= 0:
+            self.update_files(filenames)
+            return
+        for filename in filenames:
+            if filename not in self._pending_saves:
+                self._pending_saves.append(filename)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            sublime.set_timeout(self._flush_saves, StackIDE.save_delay)
+
+    def _flush_saves(self):
+        self._flush_scheduled = False
+        if not self._pending_saves or not self.is_active:
+            return
+        if self._compiling_since is not None and time.time() - self._compiling_since < StackIDE.compile_wait:
+            return # _handle_compiled sends them
+        (filenames, self._pending_saves) = (self._pending_saves, [])
+        self.update_files(filenames)
 
     def update_files(self, filenames):
-        new_include_targets = self.update_new_include_targets(filenames)
-        self.send_request(Req.update_session_includes(new_include_targets))
-        self.send_request(Req.get_source_errors(), Win(self.window).handle_source_errors)
+        self.include_targets.add(filenames)
+        self.recompile(filenames)
+
+    def recompile(self, filenames):
+        """
+        Recompiles the session (with its targets, if they changed), the files having changed.
+        """
+        self.completions.clear()
+        self.types.clear()
+        self.span_infos.recompiled(filenames)
+        self.prefetcher.clear()
+        self.identifiers.mark_stale(filenames)
+        self._compiling_since = time.time()
+        self.send_request(self.include_targets.update_request())
+        self._compile_seq = self.send_request(Req.get_source_errors(), self._handle_compiled,
+                                              timeout=StackIDE.compile_timeout)
+
+    def _handle_compiled(self, source_errors):
+        self.handle_source_errors(source_errors)
+        self._compile_finished()
+
+    def _compile_lost(self, seq_id):
+        # Timeouts and drops are noticed off the main thread, and by the
+        # time this runs a newer compile may be the one we are waiting for
+        if seq_id == self._compile_seq:
+            self._compile_finished()
+
+    def _compile_finished(self):
+        """
+        Stops waiting for the errors of the compile in progress (they came,
+        or never will) and sends the saves postponed meanwhile.
+        """
+        self._compiling_since = None
+        self._compile_seq = None
+        if self._pending_saves and not self._flush_scheduled:
+            self._flush_saves()
+
+    def refresh_identifiers(self):
+        """
+        Re-indexes the identifiers in scope in every recompiled module, as speculative
+        work, one module at a time so the queue never fills up with refreshes.
+        """
+        if self.identifiers.stale:
+            self.send_request(Req.get_loaded_modules(), self._handle_loaded_modules, priority=SPECULATIVE)
+
+    def _handle_loaded_modules(self, contents):
+        self._refreshing = collections.deque(self.identifiers.stale_loaded(res.parse_loaded_modules(contents)))
+        self._refresh_next(self._refreshing)
+
+    def _refresh_next(self, refreshing):
+        # A later compile may have started over with a new list of modules
+        if refreshing is not self._refreshing or not refreshing:
+            return
+        path = refreshing.popleft()
+        self.send_request(Req.get_autocompletion(path, ""),
+                          lambda completions: self._handle_refreshed(refreshing, path, completions),
+                          priority=SPECULATIVE)
+
+    def _handle_refreshed(self, refreshing, path, completions):
+        self.identifiers.replace(path, list(res.parse_autocompletions(completions)))
+        self._refresh_next(refreshing)
+
+    def handle_source_errors(self, source_errors):
+        """
+        Shows the errors in every window on the project, then prefetches
+        types for the active views of modules that compiled cleanly.
+        """
+        for window in list(self.windows.values()):
+            Win(window).handle_source_errors(source_errors)
+
+        if Prefetcher.max_requests > 0:
+            for window in list(self.windows.values()):
+                view = window.active_view()
+                if (view and view.file_name() and is_haskell_view(view) and
+                    Win(window).error_store().count('KindError', relative_view_file_name(view)) == 0):
+                    self.prefetcher.start(view)
+
+    def attach_window(self, window):
+        self.windows[window.id()] = window
+
+    def detach_window(self, window_id):
+        """
+        Forgets a closed window, returning the number of windows still attached.
+        """
+        self.windows.pop(window_id, None)
+        return len(self.windows)
 
     def end(self):
         """
-        Ask stack-ide to shut down.
+        Ask stack-ide to shut down, skipping anything still queued.
         """
-        self.send_request(Req.get_shutdown())
+        if self._backend:
+            self.scheduler.clear()
+            self._backend.send_request(Req.get_shutdown())
+        self.conts.clear()
         self.die()
 
+    def detach(self):
+        """
+        Let go of the backend without shutting down stack-ide,
+        if it is owned by the daemon. Otherwise the same as end().
+        """
+        if isinstance(self._backend, SocketBackend):
+            self.scheduler.clear()
+            self._backend.close()
+            self.conts.clear()
+            self.die()
+        else:
+            self.end()
+
+    def release_backend(self):
+        """
+        Hands the backend over to someone else (e.g. the BackendPool) without
+        shutting it down, leaving this instance dead.
+        """
+        backend = self._backend
+        self.scheduler.clear()
+        self.conts.clear()
+        self._backend = None
+        self.die()
+        return backend
+
     def die(self):
         """
         Mark the instance as no longer alive
@@ -113,6 +338,7 @@ class StackIDE:
         seq_id   = data.get("seq")
 
         if seq_id is not None:
+            self.scheduler.complete(seq_id)
             self._send_to_handler(contents, seq_id)
 
         elif tag == "ResponseWelcome":
@@ -130,17 +356,112 @@ class StackIDE:
         else:
             Log.normal("Unhandled response: ", data)
 
+    def handle_dropped(self, request):
+        """
+        Forgets the handler of a request the backend decided not to send.
+        """
+        seq_id = request.get("seq")
+        if seq_id is not None:
+            self.scheduler.complete(seq_id)
+            self.conts.discard(seq_id)
+            if seq_id == self._compile_seq:
+                sublime.set_timeout(lambda: self._compile_lost(seq_id), 0)
+
+    def reap_requests(self):
+        """
+        Drops handlers whose replies are overdue, and logs the request counters
+        when they changed. Called periodically by the watchdog.
+        """
+        self.conts.reap()
+        stats = self.stats()
+        if stats != self._logged_stats:
+            Log.debug("Stack-IDE requests for", self.project_path, ":", stats)
+            self._logged_stats = stats
+
+    def stats(self):
+        """
+        Counters for spotting leaks and overload over long sessions: replies
+        awaited, timed out and orphaned, requests queued and in flight per
+        priority class, and requests the backend merged or dropped.
+        """
+        stats = self.conts.stats()
+        stats["queued"] = self.scheduler.queue_depths()
+        stats["in_flight"] = self.scheduler.in_flight()
+        if self._backend is not None:
+            stats["merged"] = self._backend.merged_requests
+            stats["dropped"] = self._backend.dropped_requests
+        return stats
+
+    def _dispatch(self, request):
+        """
+        Sends a request the scheduler let out, starting its reply's deadline.
+        """
+        seq_id = request.get("seq")
+        if seq_id is not None and not self.conts.start(seq_id):
+            # It timed out while still queued, nobody is waiting for it
+            self.scheduler.complete(seq_id)
+            return
+        self._backend.send_request(request)
+
+    def _handle_timeout(self, seq_id):
+        Log.warning("No reply from stack-ide for seq", seq_id, ", giving up on it")
+        if not self.scheduler.cancel(seq_id):
+            self.scheduler.complete(seq_id)
+        if seq_id == self._compile_seq:
+            sublime.set_timeout(lambda: self._compile_lost(seq_id), 0)
+
     def _send_to_handler(self, contents, seq_id):
         """
         Looks up a previously registered handler for the incoming response
         """
-        handler = self.conts.get(seq_id)
-        del self.conts[seq_id]
-        if handler is not None:
-            if contents is not None:
-                sublime.set_timeout(lambda:handler(contents), 0)
-        else:
+        entry = self.conts.pop(seq_id)
+        if entry is None:
             Log.warning("Handler not found for seq", seq_id)
+        elif entry.handler is None:
+            Log.debug("Ignoring superseded response for seq", seq_id)
+        elif contents is not None:
+            handler = entry.handler
+            self._post(lambda:handler(contents))
+
+    def _post(self, fn):
+        """
+        Queues work for the main thread, where it is run in batches.
+        """
+        with self._inbox_lock:
+            if fn is not None:
+                self.inbox.append(fn)
+            if self._inbox_scheduled:
+                return
+            self._inbox_scheduled = True
+        sublime.set_timeout(self._drain_inbox, 0)
+
+    def _drain_inbox(self):
+        """
+        Runs queued handlers until the tick's time budget is used up, leaving
+        the rest for the next tick. Only the latest progress message is shown.
+        """
+        deadline = time.perf_counter() + StackIDE.inbox_budget
+        with self._inbox_lock:
+            (progress, self._progress) = (self._progress, None)
+        if progress:
+            sublime.status_message(progress)
+
+        handled = 0
+        while True:
+            with self._inbox_lock:
+                if not self.inbox and self._progress is None:
+                    self._inbox_scheduled = False
+                    return
+                if not self.inbox or (handled and time.perf_counter() >= deadline):
+                    break
+                fn = self.inbox.popleft()
+            try:
+                fn()
+            except Exception:
+                Log.error("Failed to handle response:\n", traceback.format_exc())
+            handled += 1
+
+        sublime.set_timeout(self._drain_inbox, 0)
 
 
     def _handle_welcome(self, welcome):
@@ -165,7 +486,11 @@ class StackIDE:
         """
         msg = res.parse_update_session(update_session)
         if msg:
-            sublime.status_message(msg)
+            with self._inbox_lock:
+                self._progress = msg
+            self._post(None)
+        if update_session.get('tag') == "UpdateStatusDone":
+            self._post(self.refresh_identifiers)
 
 
     def __del__(self):
@@ -210,11 +535,21 @@ def stack_ide_loadtargets(project_path, package):
     return outs.splitlines()
 
 
-def stack_ide_start(project_path, package, response_handler):
+def stack_ide_start(project_path, package, response_handler, drop_handler=None, daemon_socket=None):
     """
     Start up a stack-ide subprocess for the window, and a thread to consume its stdout.
+    If daemon_socket is set, attach to a session of the stack-ide daemon instead.
     """
 
+    if daemon_socket and not hasattr(socket, 'AF_UNIX'):
+        # e.g. on Windows, which has no Unix domain sockets
+        Log.warning("Can't connect to stack-ide daemon on this platform, starting stack-ide directly")
+    elif daemon_socket:
+        try:
+            return stack_ide_connect(daemon_socket, project_path, package, response_handler, drop_handler)
+        except OSError as e:
+            Log.warning("Couldn't connect to stack-ide daemon at", daemon_socket, ", starting stack-ide directly:", e)
+
     Log.debug("Calling stack ide start with PATH:", env['PATH'] if env else os.environ['PATH'])
 
     process = subprocess.Popen(["stack", "ide", "start", package],
@@ -223,82 +558,392 @@ def stack_ide_start(project_path, package, response_handler):
         creationflags=CREATE_NO_WINDOW
         )
 
-    return JsonProcessBackend(process, response_handler)
+    return JsonProcessBackend(process, response_handler, drop_handler)
 
 
-class JsonProcessBackend:
+def stack_ide_connect(daemon_socket, project_path, package, response_handler, drop_handler=None):
     """
-    Handles process communication with JSON.
+    Attach to the daemon's stack-ide session for the project (see stack_ide_daemon.py),
+    which starts one if there is none yet.
     """
-    def __init__(self, process, response_handler):
-        self._process = process
-        self._response_handler = response_handler
-        self.stdoutThread = threading.Thread(target=self.read_stdout)
-        self.stdoutThread.start()
-        self.stderrThread = threading.Thread(target=self.read_stderr)
-        self.stderrThread.start()
+
+    Log.debug("Connecting to stack-ide daemon at", daemon_socket)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(daemon_socket)
+        hello = {"project_path": project_path,
+                 "package": package,
+                 "path": env['PATH'] if env else os.environ['PATH']}
+        sock.sendall(bytes(json.dumps(hello) + "\n", 'UTF-8'))
+    except OSError:
+        sock.close()
+        raise
+
+    return SocketBackend(sock, response_handler, drop_handler)
+
+
+# Requests whose answers are only useful while the cursor/prefix they were made
+# for is still current. When the outbound queue backs up, queued copies of these
+# are superseded by newer ones instead of being written to stack-ide.
+INTERACTIVE_REQUESTS = frozenset([
+    "RequestGetExpTypes",
+    "RequestGetSpanInfo",
+    "RequestGetAutocompletion"
+])
+
+
+class JsonBackend:
+    """
+    Handles communication with stack-ide as newline-delimited JSON.
+
+    Requests are queued and written by a dedicated writer thread, so
+    a full pipe (e.g. while GHC is busy) never blocks the caller. A queued
+    request that got superseded meanwhile is withdrawn before it is written.
+    Responses are read by the shared IOLoop (or, where that isn't
+    supported, a reader thread per backend).
+
+    Subclasses provide the byte streams through _write, _reader,
+    _read_available and _read_chunk.
+    """
+
+    max_queued_requests = 64
+
+    def __init__(self, response_handler, drop_handler=None):
+        self.handler = response_handler
+        self.drop_handler = drop_handler
+        self.merged_requests = 0
+        self.dropped_requests = 0
+        self.decoder = JsonStreamDecoder()
+        self._encoder = json.JSONEncoder()
+        self._outbox = collections.deque()
+        self._outbox_cv = threading.Condition()
+        self._writing = False
+        self._closed = False
+        self.reader_done = threading.Event()
+
+    @property
+    def pid(self):
+        """
+        The stack-ide process id, if it is our child.
+        """
+        return None
+
+    def start(self):
+        self.writerThread = threading.Thread(target=self.write_requests, daemon=True)
+        self.writerThread.start()
+        if IOLoop.supported:
+            IOLoop.shared().add_reader(self._reader(), self._read_available, self.handle_output)
+        else:
+            self.readerThread = threading.Thread(target=self.read_responses)
+            self.readerThread.start()
 
     def send_request(self, request):
+        """
+        Queues a request for the writer thread. Never blocks: when the queue is
+        full, stale interactive requests are dropped instead.
+        """
+        dropped = []
+        with self._outbox_cv:
+            if self._closed:
+                Log.warning("stack-ide is not running, dropping request:", request)
+                dropped.append(request)
+            else:
+                if len(self._outbox) >= self.max_queued_requests:
+                    stale = next((queued for queued in self._outbox if queued.get('tag') in INTERACTIVE_REQUESTS), None)
+                    if stale is not None:
+                        self._outbox.remove(stale)
+                        dropped.append(stale)
+                        self.dropped_requests += 1
+                    elif request.get('tag') in INTERACTIVE_REQUESTS:
+                        # Nothing stale to make room with, so this one goes.
+                        dropped.append(request)
+                        self.dropped_requests += 1
+                        request = None
+
+                if request is not None:
+                    self._outbox.append(request)
+                    self._outbox_cv.notify()
+
+        for request in dropped:
+            Log.debug("Dropping request: ", request)
+            if self.drop_handler:
+                self.drop_handler(request)
+
+    def withdraw(self, seq_id):
+        """
+        Takes back a queued request that a later one superseded.
+        Returns False if it has been written already.
+        """
+        with self._outbox_cv:
+            for queued in self._outbox:
+                if queued.get('seq') == seq_id:
+                    self._outbox.remove(queued)
+                    self.merged_requests += 1
+                    return True
+        return False
+
+    def write_requests(self):
+        """
+        Writes queued requests to stack-ide, one write and flush per batch.
+        """
+        while True:
+            with self._outbox_cv:
+                while not self._outbox and not self._closed:
+                    self._outbox_cv.wait()
+                if self._closed:
+                    return
+                batch = list(self._outbox)
+                self._outbox.clear()
+                self._writing = True
 
-        try:
-            Log.debug("Sending request: ", request)
-            encodedString = json.JSONEncoder().encode(request) + "\n"
-            self._process.stdin.write(bytes(encodedString, 'UTF-8'))
-            self._process.stdin.flush()
-        except BrokenPipeError as e:
-            Log.error("stack-ide unexpectedly died:",e)
-
-            # self.die()
-                # Ideally we would like to die(), so that, if the error is transient,
-                # we attempt to reconnect on the next check_windows() call. The problem
-                # is that the stack-ide (ide-backend, actually) is not cleaning up those
-                # session.* directories and they would keep accumulating, one per second!
-                # So instead we do:
-            self.is_active = False
+            try:
+                for request in batch:
+                    Log.debug("Sending request: ", request)
+                encoded = "".join(self._encoder.encode(request) + "\n" for request in batch)
+                self._write(bytes(encoded, 'UTF-8'))
+            except (OSError, ValueError, AttributeError) as e:
+                Log.error("stack-ide unexpectedly died:",e)
+
+                # self.die()
+                    # Ideally we would like to die(), so that, if the error is transient,
+                    # we attempt to reconnect on the next check_windows() call. The problem
+                    # is that the stack-ide (ide-backend, actually) is not cleaning up those
+                    # session.* directories and they would keep accumulating, one per second!
+                    # So instead we do:
+                self.is_active = False
+                self.close()
+            finally:
+                with self._outbox_cv:
+                    self._writing = False
+                    self._outbox_cv.notify_all()
 
+    def drain(self, timeout=None):
+        """
+        Waits until every queued request has been written.
+        Returns False if the timeout expired first.
+        """
+        with self._outbox_cv:
+            return self._outbox_cv.wait_for(lambda: self._closed or not (self._outbox or self._writing), timeout)
 
-    def read_stderr(self):
+    def close(self):
         """
-        Reads any errors from the stack-ide process.
+        Stops the writer thread, discarding any requests still queued.
         """
-        while self._process.poll() is None:
+        with self._outbox_cv:
+            self._closed = True
+            self._outbox.clear()
+            self._outbox_cv.notify_all()
 
+    def handle_output(self, chunk):
+        """
+        Decodes JSON responses from stack-ide and dispatch them to
+        various main thread handlers. An empty chunk means the output has ended.
+        """
+        if not chunk:
+            self.close()
+            Log.debug("Stack-IDE stdout process ended. Decoded {:.0f} bytes/sec, skipped {} malformed frames.".format(
+                self.decoder.throughput(), self.decoder.malformed_frames))
+            self.reader_done.set()
+            return
+
+        for data in self.decoder.feed(chunk):
+            try:
+                self.handler(data)
+            except Exception:
+                Log.error("Failed to handle response: ", data, '\n', traceback.format_exc())
+
+    def read_responses(self):
+        """
+        Reads stack-ide's output on a thread of its own,
+        for platforms the IOLoop doesn't support.
+        """
+        while True:
             try:
-                error = self._process.stderr.readline().decode('UTF-8')
-                if len(error) > 0:
-                    Log.warning("Stack-IDE error: ", error)
-            except:
-                Log.error("Stack-IDE stderr process ending due to exception: ", sys.exc_info())
+                chunk = self._read_chunk()
+            except (OSError, ValueError, AttributeError):
+                Log.warning("Stack-IDE stdout process ending due to exception: ", sys.exc_info())
+                self.close()
+                self._abort()
+                self.reader_done.set()
                 return
 
-        Log.debug("Stack-IDE stderr process ended.")
+            self.handle_output(chunk)
+            if not chunk:
+                return
+
+
+class JsonProcessBackend(JsonBackend):
+    """
+    Handles process communication with JSON.
+    """
+
+    def __init__(self, process, response_handler, drop_handler=None):
+        super(JsonProcessBackend, self).__init__(response_handler, drop_handler)
+        self._process = process
+        self._stdout_fd = process.stdout.fileno()
+        self._stderr_fd = process.stderr.fileno()
+        self._stderr_buffer = bytearray()
+        self.errors_done = threading.Event()
+        self.start()
+        if IOLoop.supported:
+            set_non_blocking(self._stderr_fd)
+            IOLoop.shared().add_reader(process.stderr, lambda: os.read(self._stderr_fd, 4096), self.handle_errors)
+        else:
+            self.stderrThread = threading.Thread(target=self.read_stderr)
+            self.stderrThread.start()
+
+    @property
+    def pid(self):
+        return self._process.pid if self._process else None
+
+    def _write(self, data):
+        self._process.stdin.write(data)
+        self._process.stdin.flush()
+
+    def _reader(self):
+        set_non_blocking(self._stdout_fd)
+        return self._process.stdout
 
-    def read_stdout(self):
+    def _read_available(self):
+        return os.read(self._stdout_fd, JsonStreamDecoder.chunk_size)
+
+    def _read_chunk(self):
+        return self._process.stdout.read1(JsonStreamDecoder.chunk_size)
+
+    def _abort(self):
+        if self._process:
+            self._process.terminate()
+            self._process = None
+
+    def handle_errors(self, chunk):
         """
-        Reads JSON responses from stack-ide and dispatch them to
-        various main thread handlers.
+        Logs stack-ide's stderr output line by line.
+        An empty chunk means the process has closed it.
         """
-        while self._process.poll() is None:
-            try:
-                raw = self._process.stdout.readline().decode('UTF-8')
-                if not raw:
-                    return
+        buffer = self._stderr_buffer
+        buffer.extend(chunk)
+        end = len(buffer) if not chunk else buffer.rfind(b'\n') + 1
+        for error in buffer[:end].decode('UTF-8', errors='replace').splitlines():
+            Log.warning("Stack-IDE error: ", error)
+        del buffer[:end]
 
-                data = None
-                try:
-                    data = json.loads(raw)
-                except:
-                    Log.debug("Got a non-JSON response: ", raw)
-                    continue
+        if not chunk:
+            Log.debug("Stack-IDE stderr process ended.")
+            self.errors_done.set()
 
-                #todo: try catch ?
-                self._response_handler(data)
+    def read_stderr(self):
+        """
+        Reads any errors from the stack-ide process,
+        for platforms the IOLoop doesn't support.
+        """
+        try:
+            for error in iter(self._process.stderr.readline, b''):
+                Log.warning("Stack-IDE error: ", error.decode('UTF-8', errors='replace'))
+        except:
+            Log.error("Stack-IDE stderr process ending due to exception: ", sys.exc_info())
+        else:
+            Log.debug("Stack-IDE stderr process ended.")
+        self.errors_done.set()
 
-            except:
-                Log.warning("Stack-IDE stdout process ending due to exception: ", sys.exc_info())
-                self._process.terminate()
-                self._process = None
-                return
 
-        Log.info("Stack-IDE stdout process ended.")
+class SocketBackend(JsonBackend):
+    """
+    Talks to a stack-ide session owned by the daemon, over a Unix domain socket.
+    Closing the connection leaves the session (and its compiled state) running.
+    """
+
+    def __init__(self, sock, response_handler, drop_handler=None):
+        super(SocketBackend, self).__init__(response_handler, drop_handler)
+        self._socket = sock
+        self.start()
+
+    def _write(self, data):
+        self._socket.sendall(data)
+
+    def _reader(self):
+        return self._socket
+
+    def _read_available(self):
+        return self._socket.recv(JsonStreamDecoder.chunk_size, socket.MSG_DONTWAIT)
+
+    def _read_chunk(self):
+        return self._socket.recv(JsonStreamDecoder.chunk_size)
+
+    def handle_output(self, chunk):
+        if not chunk:
+            self._socket.close()
+        super(SocketBackend, self).handle_output(chunk)
+
+    def _abort(self):
+        self._socket.close()
+
+    def close(self):
+        """
+        Detaches from the session.
+        """
+        super(SocketBackend, self).close()
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+class JsonStreamDecoder:
+    """
+    Incrementally decodes the newline-delimited JSON messages stack-ide writes
+    to its stdout, from arbitrarily sized chunks of raw bytes.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = bytearray()
+        self.decoded_bytes = 0
+        self.decode_seconds = 0.0
+        self.malformed_frames = 0
+
+    def feed(self, chunk):
+        """
+        Buffers a chunk and returns the messages completed by it.
+        Frames that are not valid JSON are logged and skipped.
+        """
+        started = time.perf_counter()
+        buffer = self._buffer
+        buffer.extend(chunk)
+
+        # Only decode up to the last complete frame; the rest stays buffered.
+        end = buffer.rfind(b'\n') + 1
+        if not end:
+            return []
+        text = buffer[:end].decode('UTF-8', errors='replace')
+        del buffer[:end]
+
+        messages = []
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(text, pos).end()
+            if pos == len(text):
+                break
+            try:
+                (message, pos) = self._decoder.raw_decode(text, pos)
+                messages.append(message)
+            except ValueError:
+                newline = text.find('\n', pos)
+                Log.debug("Got a non-JSON response: ", text[pos:newline])
+                self.malformed_frames += 1
+                pos = newline + 1
+
+        self.decoded_bytes += end
+        self.decode_seconds += time.perf_counter() - started
+        return messages
+
+    def throughput(self):
+        """
+        Decoding throughput so far, in bytes/sec.
+        """
+        return self.decoded_bytes / self.decode_seconds if self.decode_seconds else 0.0
 
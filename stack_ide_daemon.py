@@ -0,0 +1,200 @@
+"""
+A standalone daemon that owns stack-ide processes, so that their sessions
+(and the compiled state that goes with them) survive plugin reloads and
+settings changes. It runs outside of Sublime Text:
+
+    python3 stack_ide_daemon.py [socket_path]
+
+Then set "daemon_socket" in SublimeStackIDE.sublime-settings to the same path.
+
+Clients connect over a Unix domain socket and send one JSON line naming the
+project, e.g. {"project_path": "/src/foo", "package": "foo", "path": "..."}.
+From then on the connection is a transparent pipe to that project's
+stack-ide process. A session is started for the first client of a project
+and stays up when clients disconnect, until stack-ide itself exits
+(e.g. after a RequestShutdownSession).
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".stack-ide-sublime.sock")
+
+STACK_IDE_START = ["stack", "ide", "start"]
+
+
+class Session:
+    """
+    A stack-ide process, and the client currently attached to it.
+    """
+
+    def __init__(self, project_path, package, path, on_exit, command=STACK_IDE_START):
+        env = os.environ.copy()
+        if path:
+            env["PATH"] = path
+        self.process = subprocess.Popen(command + [package],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=project_path, env=env)
+        self.client = None
+        self._on_exit = on_exit
+        self._lock = threading.Lock()
+        threading.Thread(target=self.pump_stdout, daemon=True).start()
+        threading.Thread(target=self.pump_stderr, daemon=True).start()
+
+    def attach(self, client):
+        """
+        Makes client the receiver of stack-ide's output. Only one client is
+        attached at a time; a previous one is disconnected.
+        """
+        with self._lock:
+            (previous, self.client) = (self.client, client)
+        if previous is not None:
+            close_quietly(previous)
+
+    def detach(self, client):
+        with self._lock:
+            if self.client is client:
+                self.client = None
+
+    def send(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def pump_stdout(self):
+        """
+        Forwards whole lines of output to the attached client, if any.
+        Output produced while nobody is attached is dropped.
+        """
+        for line in iter(self.process.stdout.readline, b''):
+            with self._lock:
+                if self.client is not None:
+                    try:
+                        self.client.sendall(line)
+                    except OSError:
+                        self.client = None
+
+        self.process.stdout.close()
+        self.process.wait()
+        with self._lock:
+            (client, self.client) = (self.client, None)
+        if client is not None:
+            close_quietly(client)
+        self._on_exit(self)
+
+    def pump_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            sys.stderr.buffer.write(line)
+            sys.stderr.flush()
+        self.process.stderr.close()
+
+
+class Daemon:
+    """
+    Accepts client connections and hands each one to its project's session.
+    """
+
+    def __init__(self, socket_path, command=STACK_IDE_START):
+        self.socket_path = socket_path
+        self.command = command
+        self.sessions = {} # Map from (project_path, package) to Session
+        self._lock = threading.Lock()
+        self._server = None
+
+    def listen(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError("A daemon is already listening on " + self.socket_path)
+            except ConnectionRefusedError:
+                # Left behind by a daemon that didn't shut down cleanly
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(16)
+
+    def serve_forever(self):
+        while True:
+            try:
+                (client, _) = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle_client, args=(client,), daemon=True).start()
+
+    def shutdown(self):
+        """
+        Stops accepting clients. Sessions keep running until stack-ide exits.
+        """
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            os.unlink(self.socket_path)
+
+    def handle_client(self, client):
+        reader = client.makefile('rb')
+        session = None
+        try:
+            hello = json.loads(reader.readline().decode('UTF-8'))
+            session = self.session_for(hello.get("project_path"), hello.get("package"), hello.get("path"))
+            session.attach(client)
+            while True:
+                data = reader.read1(65536)
+                if not data:
+                    break
+                session.send(data)
+        except (OSError, ValueError) as e:
+            log("Client disconnected:", e)
+        finally:
+            if session is not None:
+                session.detach(client)
+            reader.close()
+            close_quietly(client)
+
+    def session_for(self, project_path, package, path):
+        with self._lock:
+            key = (project_path, package)
+            session = self.sessions.get(key)
+            if session is None or session.process.poll() is not None:
+                log("Starting stack-ide for", package, "in", project_path)
+                session = Session(project_path, package, path, self._forget, self.command)
+                self.sessions[key] = session
+            else:
+                log("Reattaching to stack-ide for", package, "in", project_path)
+            return session
+
+    def _forget(self, session):
+        with self._lock:
+            for key, known in list(self.sessions.items()):
+                if known is session:
+                    log("stack-ide for", key[1], "exited")
+                    del self.sessions[key]
+
+
+def close_quietly(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+
+def log(*msg):
+    print('[stack-ide-daemon]', *msg, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    daemon = Daemon(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET)
+    daemon.listen()
+    log("Listening on", daemon.socket_path)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
@@ -5,20 +5,22 @@ import os
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from stack_ide import StackIDE
+from backend_pool import BackendPool
 from log import Log
+from win import Win
 from utility import first_folder,expected_cabalfile,has_cabal_file, is_stack_project, complain, reset_complaints
 try:
     import sublime
 except ImportError:
     from test.stubs import sublime
 
-def send_request(window, request, on_response = None):
+def send_request(window, request, on_response = None, supersede = None):
     """
     Sends the given request to the (view's) window's stack-ide instance,
     optionally handling its response
     """
     if StackIDEManager.is_running(window):
-        StackIDEManager.for_window(window).send_request(request, on_response)
+        StackIDEManager.for_window(window).send_request(request, on_response, supersede)
 
 def configure_instance(window, settings):
 
@@ -51,7 +53,8 @@ def configure_instance(window, settings):
         try:
             # If everything looks OK, launch a StackIDE instance
             Log.normal("Initializing window", window.id())
-            instance = StackIDE(window, settings)
+            instance = StackIDE(window, settings, BackendPool.take(folder))
+            BackendPool.touch(folder)
         except FileNotFoundError as e:
             instance = NoStackIDE("instance init failed -- stack not found")
             Log.error(e)
@@ -81,8 +84,9 @@ class StackIDEManager:
     def check_windows(cls):
         """
         Compares the current windows with the list of instances:
-          - new windows are assigned a process of stack-ide each
-          - stale processes are stopped
+          - new windows share the instance of another window on the same
+            project, or are assigned a process of stack-ide of their own
+          - processes no window uses any more are stopped
 
         NB. This is the only method that updates ide_backend_instances,
         so as long as it is not called concurrently, there will be no
@@ -94,8 +98,10 @@ class StackIDEManager:
         # Kill stale instances, keep live ones
         for win_id,instance in StackIDEManager.ide_backend_instances.items():
             if win_id not in current_windows:
+                Win.forget(win_id)
                 # This is a window that is now closed, we may need to kill its process
-                if instance.is_active:
+                # (unless other windows on the same project still use it)
+                if instance.is_active and instance.detach_window(win_id) == 0 and not BackendPool.park(instance):
                     Log.normal("Stopping stale process for window", win_id)
                     instance.end()
             else:
@@ -114,7 +120,36 @@ class StackIDEManager:
         # Thw windows remaining in current_windows are new, so they have no instance.
         # We try to create one for them
         for window in current_windows.values():
-            StackIDEManager.ide_backend_instances[window.id()] = configure_instance(window, cls.settings)
+            instance = StackIDEManager.shared_instance_for(window)
+            if instance is None:
+                instance = configure_instance(window, cls.settings)
+            StackIDEManager.ide_backend_instances[window.id()] = instance
+
+    @classmethod
+    def shared_instance_for(cls, window):
+        """
+        Attaches the window to a running instance for the same project root, if any.
+        """
+        folder = first_folder(window)
+        if not folder:
+            return None
+        project_root = os.path.realpath(folder)
+        for instance in StackIDEManager.ide_backend_instances.values():
+            if instance.is_active and instance.project_root == project_root:
+                Log.normal("Window", window.id(), "shares the stack-ide instance for", project_root)
+                instance.attach_window(window)
+                return instance
+        return None
+
+
+    @classmethod
+    def reap_requests(cls):
+        """
+        Lets every running instance drop handlers whose replies are overdue.
+        """
+        for instance in set(StackIDEManager.ide_backend_instances.values()):
+            if instance.is_active:
+                instance.reap_requests()
 
 
     @classmethod
@@ -133,24 +168,38 @@ class StackIDEManager:
         return instance
 
     @classmethod
-    def kill_all(cls):
+    def kill_all(cls, detach=False):
         # Log.normal("Killing all stack-ide-sublime instances:", {k:str(v) for k, v in StackIDEManager.ide_backend_instances.items()})
-        for instance in StackIDEManager.ide_backend_instances.values():
-            print("yo")
-            instance.end()
+        for instance in set(StackIDEManager.ide_backend_instances.values()):
+            if detach:
+                instance.detach()
+            else:
+                instance.end()
 
     @classmethod
-    def reset(cls):
+    def reset(cls, detach=False):
         """
         Kill all instances, and forget about previous notifications.
+        With detach, sessions owned by the stack-ide daemon are left running.
         """
         Log.normal("Resetting StackIDE")
-        StackIDEManager.kill_all()
+        StackIDEManager.kill_all(detach)
+        BackendPool.clear(detach)
         reset_complaints()
 
     @classmethod
     def configure(cls, settings):
         cls.settings = settings
+        BackendPool.configure(settings)
+
+    @classmethod
+    def prestart_spares(cls):
+        """
+        Warms up backends for recently used projects that have no window yet.
+        """
+        active_projects = set(instance.project_path for instance in StackIDEManager.ide_backend_instances.values()
+                              if instance.is_active)
+        BackendPool.prestart(cls.settings, active_projects)
 
 
 class NoStackIDE:
@@ -167,5 +216,8 @@ class NoStackIDE:
     def end(self):
         self.is_alive = False
 
+    def detach(self):
+        self.end()
+
     def __str__(self):
         return 'NoStackIDE(' + self.reason + ')'
@@ -0,0 +1,436 @@
+"""
+Benchmarks for response parsing and the UI handlers, run against the
+sublime stubs with synthetic payloads:
+
+    python -m test.benchmarks [--repeat N] [--scale F] [--only NAME]
+                              [--output results.json] [--baseline old.json]
+
+Results are written as JSON (to stdout unless --output is given). With
+--baseline, each benchmark also gets its ratio to the same benchmark in an
+earlier result file, and the exit status is 1 if any got slower than
+--threshold times its baseline.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import response as res
+from win import Win
+from event_listeners import StackIDEAutocompleteHandler
+from completion_ranking import CompletionRanker
+from utility import view_regions_from_spans
+
+
+#############################
+# Synthetic payloads
+#############################
+
+MODULES = ['Data.List', 'Data.Maybe', 'Control.Monad', 'Prelude', 'Data.Map.Strict', 'Lib']
+PACKAGES = ['base', 'containers', 'main']
+
+
+def span_payload(index, file_path='src/Lib.hs'):
+    return {'spanFilePath': file_path, 'spanFromLine': index + 1, 'spanFromColumn': 1,
+            'spanToLine': index + 1, 'spanToColumn': 10}
+
+
+def module_payload(index):
+    return {'moduleName': MODULES[index % len(MODULES)],
+            'modulePackage': {'packageName': PACKAGES[index % len(PACKAGES)], 'packageKey': 'base', 'packageVersion': '4.8.1.0'}}
+
+
+def source_errors_payload(count, files=50):
+    kinds = ['KindError', 'KindWarning']
+    return [{'errorKind': kinds[index % 2],
+             'errorMsg': "Couldn't match expected type ‘Integer’ with actual type ‘[Char]’\nIn the expression: f {}".format(index),
+             'errorSpan': {'tag': 'ProperSpan', 'contents': span_payload(index // files, 'src/Module{}.hs'.format(index % files))}}
+            for index in range(count)]
+
+
+def exp_types_payload(depth):
+    """
+    The types of every expression enclosing the cursor, innermost first,
+    each wrapping the previous one.
+    """
+    types = []
+    type = 'Int'
+    for level in range(depth):
+        type = 'Maybe ({}) -> Either String [{}]'.format(type, level) if level % 2 else '({}, IO ())'.format(type)
+        types.append([type, {'spanFilePath': 'src/Lib.hs', 'spanFromLine': depth - level, 'spanFromColumn': 1,
+                             'spanToLine': depth + level, 'spanToColumn': 80}])
+    return types
+
+
+def completions_payload(count):
+    return [{'idProp': {'idSpace': 'VarName',
+                        'idDefinedIn': module_payload(index),
+                        'idType': 'a -> [a] -> Int{}'.format(index),
+                        'idName': 'name{}'.format(index),
+                        'idDefSpan': {'tag': 'ProperSpan', 'contents': span_payload(index)}},
+             'idScope': {'tag': 'Imported', 'idImportedFrom': module_payload(index + 1), 'idImportQual': ''}}
+            for index in range(count)]
+
+
+#############################
+# The response model before slots and interning
+#############################
+
+class LegacySpan():
+
+    def __init__(self, filePath, fromLine, fromColumn, toLine, toColumn):
+        self.filePath = filePath
+        self.fromLine = fromLine
+        self.fromColumn = fromColumn
+        self.toLine = toLine
+        self.toColumn = toColumn
+
+
+class LegacyIdProp():
+
+    def __init__(self, package, module, type, name, defSpan):
+        self.package = package
+        self.module = module
+        self.type = type
+        self.name = name
+        self.defSpan = defSpan
+
+
+class LegacyIdScope():
+
+    def __init__(self, importedFrom):
+        self.importedFrom = importedFrom
+
+
+class LegacyIdImportedFrom():
+
+    def __init__(self, module, package):
+        self.module = module
+        self.package = package
+
+
+def legacy_parse_source_span(json):
+    paths = ['spanFilePath', 'spanFromLine', 'spanFromColumn', 'spanToLine', 'spanToColumn']
+    fields = list(json.get(path) for path in paths)
+    return LegacySpan(*fields) if fields else None
+
+
+def legacy_parse_autocompletions(contents):
+    for item in contents:
+        values = item.get('idProp')
+        defSpan = values.get('idDefSpan')
+        prop = LegacyIdProp(values.get('idDefinedIn').get('moduleName'),
+                            values.get('idDefinedIn').get('modulePackage').get('packageName'),
+                            values.get('idType'),
+                            values.get('idName'),
+                            legacy_parse_source_span(defSpan.get('contents')) if defSpan.get('tag') == 'ProperSpan' else None)
+        importedFrom = item.get('idScope').get('idImportedFrom')
+        scope = LegacyIdScope(LegacyIdImportedFrom(importedFrom.get('moduleName'),
+                                                   importedFrom.get('modulePackage').get('packageName'))) if importedFrom else None
+        yield (prop, scope)
+
+
+#############################
+# Measuring
+#############################
+
+BENCH_VIEW_TEXT = ("x" * 79 + "\n") * 2000
+
+
+class BenchView():
+    """
+    A cheap stand-in for sublime.View, so the timings are of our code rather than of mocks.
+    """
+
+    def __init__(self, view_id, file_name=None):
+        self._id = view_id
+        self._file_name = file_name
+        self._settings = {}
+        self.regions = {}
+        self.status = {}
+        self.text = ""
+
+    def id(self):
+        return self._id
+
+    def file_name(self):
+        return self._file_name
+
+    def change_count(self):
+        return 0
+
+    def is_loading(self):
+        return False
+
+    def size(self):
+        return len(BENCH_VIEW_TEXT)
+
+    def substr(self, region):
+        return BENCH_VIEW_TEXT[region.begin():region.end()]
+
+    def add_regions(self, key, regions, *args):
+        self.regions[key] = regions
+
+    def erase_regions(self, key):
+        self.regions.pop(key, None)
+
+    def set_status(self, key, value):
+        self.status[key] = value
+
+    def show_popup(self, content):
+        pass
+
+    def settings(self):
+        return self
+
+    def set(self, key, value):
+        self._settings[key] = value
+
+    def set_read_only(self, read_only):
+        pass
+
+    def is_valid(self):
+        return True
+
+    def run_command(self, command, args=None):
+        if command == "replace_error_panel":
+            self.text = args["text"]
+
+
+class BenchWindow():
+    """
+    A stand-in for sublime.Window, with every file the payloads mention already open.
+    """
+
+    count = 0
+
+    def __init__(self, folder='/projects/bench'):
+        BenchWindow.count += 1
+        self._id = -BenchWindow.count
+        self._folder = folder
+        self._views = {}
+        self.panel = BenchView(-1)
+
+    def id(self):
+        return self._id
+
+    def folders(self):
+        return [self._folder]
+
+    def find_open_file(self, full_path):
+        view = self._views.get(full_path)
+        if view is None:
+            view = self._views[full_path] = BenchView(len(self._views), full_path)
+        return view
+
+    def open_file(self, full_path, flags=0):
+        return self.find_open_file(full_path)
+
+    def views(self):
+        return list(self._views.values())
+
+    def active_view(self):
+        return self.find_open_file(self._folder + '/src/Lib.hs')
+
+    def create_output_panel(self, name):
+        return self.panel
+
+    def run_command(self, command, args=None):
+        pass
+
+
+#############################
+# Benchmarks
+#############################
+
+# Each benchmark is a name, a payload size, and a setup function that
+# takes the size and returns the function to time.
+
+def bench_parse_source_errors(count):
+    contents = source_errors_payload(count)
+    return lambda: list(res.parse_source_errors(contents))
+
+
+def bench_parse_autocompletions(count):
+    contents = completions_payload(count)
+    return lambda: list(res.parse_autocompletions(contents))
+
+
+def bench_parse_exp_types(depth):
+    contents = exp_types_payload(depth)
+    return lambda: list(res.parse_exp_types(contents))
+
+
+def bench_highlight_type(depth):
+    contents = exp_types_payload(depth)
+    win = Win(BenchWindow())
+    return lambda: win.highlight_type(contents)
+
+
+def bench_handle_source_errors(count):
+    contents = source_errors_payload(count)
+    win = Win(BenchWindow())
+    return lambda: win.handle_source_errors(contents)
+
+
+def bench_handle_changed_errors(count):
+    """
+    Alternates between two reports that differ in one file, as when saving one module.
+    """
+    reports = [source_errors_payload(count), source_errors_payload(count)]
+    reports[1][0] = dict(reports[1][0], errorMsg='Not in scope: ‘f’')
+    win = Win(BenchWindow())
+    win.handle_source_errors(reports[1])
+    return lambda: [win.handle_source_errors(report) for report in reports]
+
+
+def bench_highlight_errors(count):
+    win = Win(BenchWindow())
+    win.error_store().update(list(res.parse_source_errors(source_errors_payload(count))))
+    paths = win.error_store().paths()
+    return lambda: win.highlight_errors(paths)
+
+
+def bench_regions_from_spans(count):
+    spans = [res.parse_source_span(span_payload(index % 2000)) for index in range(count)]
+    view = BenchView(0, '/projects/bench/src/Lib.hs')
+    return lambda: view_regions_from_spans(view, spans)
+
+
+def bench_format_completion(count):
+    completions = list(res.parse_autocompletions(completions_payload(count)))
+    handler = StackIDEAutocompleteHandler()
+    return lambda: [handler.format_completion(*completion) for completion in completions]
+
+
+def bench_rank_completions(count):
+    completions = list(res.parse_autocompletions(completions_payload(count)))
+    return lambda: CompletionRanker.top(completions, 'name', 'src/Lib.hs', ['main'])
+
+
+BENCHMARKS = [
+    ('parse_source_errors', 10000, bench_parse_source_errors),
+    ('parse_autocompletions', 20000, bench_parse_autocompletions),
+    ('parse_exp_types', 500, bench_parse_exp_types),
+    ('highlight_type', 500, bench_highlight_type),
+    ('handle_source_errors', 10000, bench_handle_source_errors),
+    ('handle_changed_errors', 10000, bench_handle_changed_errors),
+    ('highlight_errors', 10000, bench_highlight_errors),
+    ('regions_from_spans', 10000, bench_regions_from_spans),
+    ('format_completion', 20000, bench_format_completion),
+    ('rank_completions', 20000, bench_rank_completions),
+]
+
+
+def run_benchmark(name, size, setup, repeat=5):
+    fn = setup(size)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {'name': name,
+            'items': size,
+            'repeat': repeat,
+            'best_seconds': best,
+            'mean_seconds': sum(timings) / len(timings),
+            'items_per_second': size / best if best else None}
+
+
+def run(repeat=5, scale=1.0, only=None):
+    """
+    Runs the benchmarks (those named in only, if given) with their payload
+    sizes multiplied by scale.
+    """
+    results = [run_benchmark(name, max(1, int(size * scale)), setup, repeat)
+               for (name, size, setup) in BENCHMARKS if not only or name in only]
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'benchmarks': results}
+
+
+def compare(results, baseline, threshold=1.2):
+    """
+    Adds each benchmark's ratio to its baseline timing, and returns the
+    names of those slower than threshold times the baseline.
+    """
+    previous = dict((result['name'], result) for result in baseline.get('benchmarks', []))
+    regressions = []
+    for result in results['benchmarks']:
+        before = previous.get(result['name'])
+        if not before or before['items'] != result['items'] or not before['best_seconds']:
+            continue
+        result['baseline_ratio'] = result['best_seconds'] / before['best_seconds']
+        if result['baseline_ratio'] > threshold:
+            regressions.append(result['name'])
+    results['regressions'] = regressions
+    return regressions
+
+
+#############################
+# Measuring memory
+#############################
+
+def measure(fn, *args):
+    """
+    Runs fn(*args) and returns (seconds, bytes still allocated while its result is alive).
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    (retained, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return (seconds, retained)
+
+
+def compare_response_models(count=5000):
+    """
+    Decodes and parses the same completion reply with the current and the
+    legacy model. Only the parsed objects outlive the decoded JSON, so the
+    retained memory is what a handler holding on to them costs.
+    """
+    encoded = json.dumps(completions_payload(count))
+    results = {}
+    for (name, parse) in [('legacy', legacy_parse_autocompletions), ('current', res.parse_autocompletions)]:
+        (seconds, retained) = measure(lambda: list(parse(json.loads(encoded))))
+        results[name] = {'items': count, 'seconds': seconds, 'items_per_second': count / seconds, 'bytes': retained}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks response parsing and the UI handlers.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per benchmark, the best one counts")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies every payload size")
+    parser.add_argument('--only', action='append', help="only run this benchmark (can be repeated)")
+    parser.add_argument('--output', help="write the results to this file instead of stdout")
+    parser.add_argument('--baseline', help="results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.scale, args.only)
+    if not args.only:
+        results['response_models'] = compare_response_models(max(1, int(5000 * args.scale)))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
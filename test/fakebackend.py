@@ -16,6 +16,8 @@ class FakeBackend():
 
     def __init__(self, responses={}):
         self.responses = responses
+        self.merged_requests = 0
+        self.dropped_requests = 0
         if self.responses is None:
             raise Exception('stopthat!')
 
@@ -24,6 +26,10 @@ class FakeBackend():
         if self.handler:
             self.return_test_data(req)
 
+    def withdraw(self, seq_id):
+        # replies go out as soon as requests come in, so nothing is ever queued
+        return False
+
     def return_test_data(self, req):
 
         tag = req.get('tag')
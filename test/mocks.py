@@ -15,20 +15,27 @@ def mock_window(paths=[]):
     window.id = Mock(return_value=1234)
     return window
 
-def mock_view(file_path, window):
+def mock_view(file_path, window, text=None):
+    """
+    A view of the file, holding its contents on disk unless given a text.
+    """
     view = MagicMock()
     view.file_name = Mock(return_value=os.path.join(window.folders()[0], file_path))
+    if text is None:
+        text = open(view.file_name()).read() if os.path.isfile(view.file_name()) else ""
+    view.size = Mock(return_value=len(text))
+    view.substr = Mock(side_effect=lambda region: text[region.begin():region.end()])
+    view.change_count = Mock(return_value=0)
+    view.is_loading = Mock(return_value=False)
     view.match_selector = Mock(return_value=True)
     window.active_view = Mock(return_value=view)
     window.find_open_file = Mock(return_value=view)
     window.views = Mock(return_value=[view])
     view.window = Mock(return_value=window)
     region = MagicMock()
-    region.begin = Mock(return_value=4)
-    region.end = Mock(return_value=4)
+    region.begin = Mock(return_value=0)
+    region.end = Mock(return_value=0)
     view.sel = Mock(return_value=[region])
-    view.rowcol = Mock(return_value=(0, 0))
-    view.text_point = Mock(return_value=4)
     return view
 
 def setup_fake_backend(window, responses={}):
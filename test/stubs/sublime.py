@@ -20,6 +20,9 @@ def set_timeout(fn, delay):
 def load_settings(name):
     return Settings()
 
+def save_settings(name):
+    pass
+
 class Settings():
 
     def add_on_change(self, key, func):
@@ -28,6 +31,9 @@ class Settings():
     def get(self, key, default):
         return default
 
+    def set(self, key, value):
+        pass
+
 
 class FakeWindow():
 
@@ -83,3 +89,6 @@ class Region():
 
     def end(self):
         return self._end
+
+    def __eq__(self, other):
+        return (self._begin, self._end) == (other.begin(), other.end())
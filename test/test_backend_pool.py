@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import stack_ide
+from backend_pool import BackendPool
+from stack_ide_manager import configure_instance
+from .mocks import mock_window, cur_dir
+from .data import test_settings
+from req import Req
+
+
+def parked_instance(path):
+    backend = MagicMock()
+    backend.pid = None
+    instance = stack_ide.StackIDE(mock_window([path]), test_settings, backend)
+    BackendPool.park(instance)
+    return (instance, backend)
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=['app/Main.hs', 'src/Lib.hs'])
+class BackendPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        BackendPool.size = 2
+        BackendPool.memory_budget = 4096
+
+    def tearDown(self):
+        BackendPool.size = 0
+        BackendPool.spares.clear()
+
+    def test_disabled_by_default(self, loadtargets_mock):
+        BackendPool.size = 0
+        instance = stack_ide.StackIDE(mock_window(['/projects/a']), test_settings, MagicMock())
+        self.assertFalse(BackendPool.park(instance))
+        self.assertTrue(instance.is_alive)
+
+    def test_parks_and_hands_out_backends(self, loadtargets_mock):
+        (instance, backend) = parked_instance('/projects/a')
+
+        self.assertFalse(instance.is_alive)
+        self.assertNotEqual(instance.handle_response, backend.handler)
+        self.assertNotIn(((Req.get_shutdown(),), {}), backend.send_request.call_args_list)
+
+        self.assertIs(backend, BackendPool.take('/projects/a'))
+        self.assertIsNone(BackendPool.take('/projects/a'))
+
+    def test_taken_backend_gets_fresh_seq_ids(self, loadtargets_mock):
+        (_, backend) = parked_instance('/projects/a')
+        owed = [args[0]['seq'] for (args, _) in backend.send_request.call_args_list if 'seq' in args[0]]
+        instance = stack_ide.StackIDE(mock_window(['/projects/a']), test_settings, BackendPool.take('/projects/a'))
+        for _ in owed:
+            instance.send_request(Req.get_exp_types({}), Mock())
+        sent = [args[0]['seq'] for (args, _) in backend.send_request.call_args_list if 'seq' in args[0]]
+        self.assertTrue(owed)
+        self.assertEqual(len(sent), len(set(sent)))
+
+    def test_evicts_least_recently_used(self, loadtargets_mock):
+        (_, oldest) = parked_instance('/projects/a')
+        (_, older) = parked_instance('/projects/b')
+        (_, newest) = parked_instance('/projects/c')
+
+        oldest.send_request.assert_called_with(Req.get_shutdown())
+        self.assertEqual(['/projects/b', '/projects/c'], list(BackendPool.spares.keys()))
+
+    @patch('backend_pool.ESTIMATED_BACKEND_MB', 3000)
+    def test_evicts_over_memory_budget(self, loadtargets_mock):
+        parked_instance('/projects/a')
+        parked_instance('/projects/b')
+        self.assertEqual(['/projects/b'], list(BackendPool.spares.keys()))
+
+    def test_new_window_gets_warm_backend(self, loadtargets_mock):
+        project = cur_dir + '/projects/helloworld'
+        (_, backend) = parked_instance(project)
+
+        with patch('stack_ide.stack_ide_start') as start_mock:
+            instance = configure_instance(mock_window([project]), test_settings)
+
+        start_mock.assert_not_called()
+        self.assertIs(backend, instance._backend)
+        self.assertEqual(instance.handle_response, backend.handler)
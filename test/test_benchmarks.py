@@ -0,0 +1,30 @@
+import unittest
+from . import benchmarks
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_runs_every_benchmark(self):
+        results = benchmarks.run(repeat=1, scale=0.001)
+        self.assertEqual([name for (name, _, _) in benchmarks.BENCHMARKS],
+                         [result['name'] for result in results['benchmarks']])
+        for result in results['benchmarks']:
+            self.assertGreaterEqual(result['items'], 1)
+            self.assertGreaterEqual(result['best_seconds'], 0)
+
+    def test_handle_source_errors_fills_panel_and_views(self):
+        window = benchmarks.BenchWindow()
+        benchmarks.Win(window).handle_source_errors(benchmarks.source_errors_payload(100, files=10))
+        self.assertEqual(100, window.panel.text.count("\n\n"))
+        self.assertEqual(10, len(window.views()))
+        self.assertTrue(any(view.regions["errors"] for view in window.views()))
+
+    def test_compare_flags_regressions(self):
+        baseline = {'benchmarks': [{'name': 'a', 'items': 10, 'best_seconds': 1.0},
+                                   {'name': 'b', 'items': 10, 'best_seconds': 1.0}]}
+        results = {'benchmarks': [{'name': 'a', 'items': 10, 'best_seconds': 1.1},
+                                  {'name': 'b', 'items': 10, 'best_seconds': 2.0},
+                                  {'name': 'c', 'items': 10, 'best_seconds': 1.0}]}
+        self.assertEqual(['b'], benchmarks.compare(results, baseline))
+        self.assertAlmostEqual(1.1, results['benchmarks'][0]['baseline_ratio'])
+        self.assertNotIn('baseline_ratio', results['benchmarks'][2])
@@ -1,10 +1,11 @@
 import unittest
-from unittest.mock import MagicMock, Mock, ANY
+from unittest.mock import MagicMock, Mock
 import stack_ide as stackide
-from .mocks import cur_dir, default_mock_window, setup_fake_backend
-from text_commands import ClearErrorPanelCommand, UpdateErrorPanelCommand, ShowHsTypeAtCursorCommand, ShowHsInfoAtCursorCommand, CopyHsTypeAtCursorCommand, GotoDefinitionAtCursorCommand
+from .mocks import cur_dir, default_mock_window, mock_view, setup_fake_backend
+from text_commands import ReplaceErrorPanelCommand, ShowHsTypeAtCursorCommand, ShowHsInfoAtCursorCommand, ShowHsUsesAtCursorCommand, CopyHsTypeAtCursorCommand, GotoDefinitionAtCursorCommand
 from .stubs import sublime
 from .data import type_info, someFunc_span_info, putStrLn_span_info
+from response import parse_span_info_response
 
 
 class CommandTests(unittest.TestCase):
@@ -12,18 +13,13 @@ class CommandTests(unittest.TestCase):
     def setUp(self):
         stackide.stack_ide_loadtargets = Mock(return_value=['app/Main.hs', 'src/Lib.hs'])
 
-    def test_can_clear_panel(self):
-        cmd = ClearErrorPanelCommand()
+    def test_can_replace_panel(self):
+        cmd = ReplaceErrorPanelCommand()
         cmd.view = MagicMock()
-        cmd.run(None)
-        cmd.view.erase.assert_called_with(ANY, ANY)
-
-    def test_can_update_panel(self):
-        cmd = UpdateErrorPanelCommand()
-        cmd.view = MagicMock()
-        cmd.view.size = Mock(return_value=0)
-        cmd.run(None, 'message')
-        cmd.view.insert.assert_called_with(ANY, 0, "message\n\n")
+        cmd.view.size = Mock(return_value=14)
+        cmd.view.substr = Mock(return_value="first\n\nsecond")
+        cmd.run(None, "first\n\nthird\n\n")
+        cmd.view.replace.assert_called_once_with(None, sublime.Region(7, 14), "third\n\n")
 
     def test_can_show_type_at_cursor(self):
 
@@ -82,12 +78,64 @@ class CommandTests(unittest.TestCase):
 
         window.open_file.assert_called_with(cur_dir + "/projects/helloworld/src/Lib.hs:9:1", sublime.ENCODED_POSITION)
 
+    def test_span_info_is_shared_between_commands(self):
+        (window, view) = default_mock_window()
+        backend = setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        backend.return_test_data = Mock(wraps=backend.return_test_data)
+        # the cursor on someFunc, at 7:30
+        view = mock_view('src/Main.hs', window, "\n" * 6 + " " * 29 + "someFunc\n")
+        view.sel()[0].begin.return_value = view.sel()[0].end.return_value = 6 + 29
+
+        show_info = ShowHsInfoAtCursorCommand()
+        show_info.view = view
+        show_info.run(None)
+        goto = GotoDefinitionAtCursorCommand()
+        goto.view = view
+        goto.run(None)
+
+        window.open_file.assert_called_with(cur_dir + "/projects/helloworld/src/Lib.hs:9:1", sublime.ENCODED_POSITION)
+        span_info_requests = [args for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == 'RequestGetSpanInfo']
+        self.assertEqual(1, len(span_info_requests))
+
+    def test_show_known_uses(self):
+        (window, view) = default_mock_window()
+        setup_fake_backend(window, {'RequestGetSpanInfo': someFunc_span_info})
+        # the cursor on a use of someFunc, at 7:30
+        view = mock_view('src/Main.hs', window, "\n" * 6 + " " * 29 + "someFunc\n")
+        view.sel()[0].begin.return_value = view.sel()[0].end.return_value = 6 + 29
+
+        cmd = ShowHsUsesAtCursorCommand()
+        cmd.view = view
+        cmd.run(None)
+
+        (locations, on_done) = window.show_quick_panel.call_args[0]
+        self.assertEqual(["src/Main.hs:7:27"], locations)
+        on_done(0)
+        window.open_file.assert_called_with(cur_dir + "/projects/helloworld/src/Main.hs:7:27", sublime.ENCODED_POSITION)
+
     def test_goto_definition_of_module(self):
 
         cmd = GotoDefinitionAtCursorCommand()
         (window, view) = default_mock_window()
         cmd.view = view
 
-        cmd._handle_response(putStrLn_span_info.get('contents'))
+        cmd._handle_infos(list(parse_span_info_response(putStrLn_span_info.get('contents'))))
 
         self.assertEqual("Cannot navigate to putStrLn, it is imported from Prelude", sublime.current_status)
+
+    def test_info_of_wired_in_identifier(self):
+        # e.g. (:), which has neither a definition site nor an import
+        (window, view) = default_mock_window()
+        contents = putStrLn_span_info.get('contents')
+        wired_in = [[dict(info, contents=dict(info['contents'], idScope={'tag': 'WiredIn'})), span] for (info, span) in contents]
+        infos = list(parse_span_info_response(wired_in))
+
+        show_info = ShowHsInfoAtCursorCommand()
+        show_info.view = view
+        show_info._handle_infos(infos)
+        view.show_popup.assert_called_with("putStrLn :: String -> IO ()  ")
+
+        goto = GotoDefinitionAtCursorCommand()
+        goto.view = view
+        goto._handle_infos(infos)
+        self.assertEqual("putStrLn not found!", sublime.current_status)
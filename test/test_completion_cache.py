@@ -0,0 +1,45 @@
+import unittest
+from completion_cache import CompletionCache
+import response as res
+from .data import many_completions
+
+
+def names(completions):
+    return [prop.name for (prop, scope) in completions]
+
+
+class CompletionCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = CompletionCache()
+        self.completions = list(res.parse_autocompletions(many_completions.get('contents')))
+
+    def test_misses_unknown_prefixes(self):
+        self.assertIsNone(self.cache.lookup('src/Main.hs', '*'))
+
+    def test_refines_longer_prefixes(self):
+        self.cache.store('src/Main.hs', '', self.completions)
+        self.assertEqual(['*', '**', '*>'], names(self.cache.lookup('src/Main.hs', '*')))
+        self.assertEqual(['**'], names(self.cache.lookup('src/Main.hs', '**')))
+        self.assertEqual(2, self.cache.refinements)
+
+        # the refined answer is cached too
+        self.assertEqual(['*', '**', '*>'], names(self.cache.lookup('src/Main.hs', '*')))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_keeps_files_apart(self):
+        self.cache.store('src/Main.hs', '', self.completions)
+        self.assertIsNone(self.cache.lookup('src/Lib.hs', '*'))
+
+    def test_does_not_refine_across_qualifiers(self):
+        self.cache.store('src/Main.hs', 'M', self.completions)
+        self.assertIsNone(self.cache.lookup('src/Main.hs', 'M.f'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.capacity = 2
+        self.cache.store('src/Main.hs', 'a', [])
+        self.cache.store('src/Main.hs', 'b', [])
+        self.cache.lookup('src/Main.hs', 'a')
+        self.cache.store('src/Main.hs', 'c', [])
+        self.assertIsNone(self.cache.lookup('src/Main.hs', 'b'))
+        self.assertEqual([], self.cache.lookup('src/Main.hs', 'a'))
@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import patch
+from completion_ranking import CompletionRanker
+from response import IdProp
+
+
+def completion(name, module, package):
+    return (IdProp(package, module, None, name, None), None)
+
+
+def names(completions):
+    return [prop.name for (prop, scope) in completions]
+
+
+class CompletionRankerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.completions = [
+            completion('mapM_', 'Data.Foldable', 'base'),
+            completion('map', 'GHC.Base', 'base'),
+            completion('mapper', 'Lib', 'main'),
+            completion('mapLocal', 'Main', 'main'),
+            completion('Map', 'Data.Map', 'containers'),
+        ]
+
+    def rank(self, prefix='map'):
+        return names(CompletionRanker.top(self.completions, prefix, 'app/Main.hs', ['main', 'helloworld']))
+
+    def test_ranks_local_then_project_then_packages(self):
+        self.assertEqual(['mapLocal', 'mapper', 'map', 'mapM_', 'Map'], self.rank())
+
+    def test_keeps_top_n(self):
+        with patch.object(CompletionRanker, 'limit', 2):
+            self.assertEqual(['mapLocal', 'mapper'], self.rank())
+
+    def test_no_limit(self):
+        with patch.object(CompletionRanker, 'limit', 0):
+            self.assertEqual(5, len(self.rank()))
+
+    def test_weights_are_configurable(self):
+        weights = dict(CompletionRanker.default_weights, local=0, project=0, length=10)
+        with patch.object(CompletionRanker, 'weights', weights):
+            self.assertEqual(['map', 'mapM_', 'Map', 'mapper', 'mapLocal'], self.rank())
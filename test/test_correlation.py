@@ -0,0 +1,67 @@
+import time
+import unittest
+from unittest.mock import Mock, patch
+from correlation import CorrelationTable
+
+
+class CorrelationTableTests(unittest.TestCase):
+
+    def test_seq_ids_are_unique(self):
+        table = CorrelationTable()
+        first = table.register(Mock())
+        second = table.register(Mock())
+        self.assertNotEqual(first, second)
+        self.assertEqual(2, table.outstanding())
+
+    def test_seq_ids_differ_between_tables(self):
+        # e.g. before and after a plugin reload, attached to the same daemon session
+        (old, new) = (CorrelationTable(), CorrelationTable())
+        owed = old.register(Mock())
+        self.assertNotIn(owed, new)
+        self.assertNotEqual(owed, new.register(Mock()))
+
+    def test_pop_returns_handler_once(self):
+        table = CorrelationTable()
+        handler = Mock()
+        seq_id = table.register(handler)
+
+        self.assertEqual(handler, table.pop(seq_id).handler)
+        self.assertIsNone(table.pop(seq_id))
+        self.assertEqual({"outstanding": 0, "timed_out": 0, "orphaned": 1}, table.stats())
+
+    def test_cancelled_entries_are_still_expected(self):
+        table = CorrelationTable()
+        seq_id = table.register(Mock())
+        table.cancel(seq_id)
+
+        self.assertIn(seq_id, table)
+        self.assertIsNone(table.pop(seq_id).handler)
+        self.assertEqual(0, table.orphaned)
+
+    def test_reaps_overdue_entries(self):
+        table = CorrelationTable()
+        on_timeout = Mock()
+        overdue = table.register(Mock(), 1, on_timeout)
+        pending = table.register(Mock(), 60, on_timeout)
+
+        self.assertEqual([], table.reap())
+        self.assertEqual([overdue], table.reap(time_in(30)))
+
+        on_timeout.assert_called_once_with(overdue)
+        self.assertNotIn(overdue, table)
+        self.assertIn(pending, table)
+        self.assertEqual({"outstanding": 1, "timed_out": 1, "orphaned": 0}, table.stats())
+
+    @patch('time.monotonic', Mock(return_value=0))
+    def test_deadline_starts_when_sent(self):
+        table = CorrelationTable()
+        queued = table.register(Mock(), 10)
+        with patch('time.monotonic', Mock(return_value=8)):
+            self.assertTrue(table.start(queued))
+        self.assertEqual([], table.reap(15))
+        self.assertEqual([queued], table.reap(18))
+        self.assertFalse(table.start(queued))
+
+
+def time_in(seconds):
+    return time.monotonic() + seconds
@@ -0,0 +1,80 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+import stack_ide
+from stack_ide_daemon import Daemon
+from req import Req
+
+# Stands in for `stack ide start`: echoes every request back as its response.
+ECHO = [sys.executable, "-c", "import sys\nfor line in sys.stdin:\n    sys.stdout.write(line)\n    sys.stdout.flush()\n"]
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "needs Unix domain sockets")
+class DaemonTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "daemon.sock")
+        self.daemon = Daemon(self.socket_path, ECHO)
+        self.daemon.listen()
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        for session in list(self.daemon.sessions.values()):
+            session.process.stdin.close()
+            session.process.wait(5)
+        self.tmpdir.cleanup()
+
+    def connect(self, handler):
+        return stack_ide.stack_ide_connect(self.socket_path, self.tmpdir.name, "helloworld", handler)
+
+    def test_session_survives_reconnect(self):
+        handler = Mock()
+        backend = self.connect(handler)
+        backend.send_request(Req.get_source_errors())
+        wait_for(lambda: handler.called)
+        handler.assert_called_with(Req.get_source_errors())
+
+        process = self.daemon.sessions[(self.tmpdir.name, "helloworld")].process
+        backend.close()
+        self.assertTrue(backend.reader_done.wait(5))
+
+        handler = Mock()
+        backend = self.connect(handler)
+        backend.send_request(Req.update_session())
+        wait_for(lambda: handler.called)
+        handler.assert_called_with(Req.update_session())
+
+        self.assertEqual(1, len(self.daemon.sessions))
+        self.assertIs(process, self.daemon.sessions[(self.tmpdir.name, "helloworld")].process)
+        backend.close()
+        self.assertTrue(backend.reader_done.wait(5))
+
+    def test_falls_back_without_daemon(self):
+        self.daemon.shutdown()
+        stack_ide.reset_env([])
+        with patch('subprocess.Popen', side_effect=FileNotFoundError()):
+            with self.assertRaises(FileNotFoundError):
+                stack_ide.stack_ide_start(self.tmpdir.name, "helloworld", Mock(), None, self.socket_path)
+
+    def test_falls_back_without_unix_sockets(self):
+        stack_ide.reset_env([])
+        with patch('stack_ide.socket', Mock(spec=[])), patch('stack_ide.stack_ide_connect') as connect:
+            with patch('subprocess.Popen', side_effect=FileNotFoundError()):
+                with self.assertRaises(FileNotFoundError):
+                    stack_ide.stack_ide_start(self.tmpdir.name, "helloworld", Mock(), None, self.socket_path)
+        connect.assert_not_called()
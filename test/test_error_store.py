@@ -0,0 +1,39 @@
+import unittest
+from error_store import ErrorStore
+from response import SourceError, SourceSpan
+
+
+def error(path, line, kind='KindError', message='<message>'):
+    return SourceError(kind, message, SourceSpan(path, line, 1, line, 5) if path else None)
+
+
+class ErrorStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ErrorStore()
+        self.report = [error('src/Main.hs', 1), error('src/Lib.hs', 2, 'KindWarning'),
+                       error('src/Main.hs', 3, 'KindWarning'), error(None, 0)]
+        self.assertEqual(set(['src/Main.hs', 'src/Lib.hs', None]), self.store.update(self.report))
+
+    def test_groups_errors_by_file(self):
+        self.assertEqual(['src/Main.hs', 'src/Lib.hs'], self.store.paths())
+        self.assertEqual((self.report[0], self.report[2]), self.store.for_file('src/Main.hs'))
+        self.assertEqual((), self.store.for_file('src/Other.hs'))
+
+    def test_counts_errors(self):
+        self.assertEqual(2, self.store.count('KindError'))
+        self.assertEqual(1, self.store.count('KindError', 'src/Main.hs'))
+        self.assertEqual(1, self.store.count('KindWarning', 'src/Lib.hs'))
+        self.assertEqual(0, self.store.count('KindError', 'src/Lib.hs'))
+
+    def test_same_report_changes_nothing(self):
+        report = [error('src/Main.hs', 1), error('src/Lib.hs', 2, 'KindWarning'),
+                  error('src/Main.hs', 3, 'KindWarning'), error(None, 0)]
+        self.assertEqual(set(), self.store.update(report))
+
+    def test_reports_changed_files(self):
+        report = [error('src/Main.hs', 1), error('src/Main.hs', 3, 'KindWarning', '<other message>'),
+                  error(None, 0), error('src/Other.hs', 4)]
+        self.assertEqual(set(['src/Main.hs', 'src/Lib.hs', 'src/Other.hs']), self.store.update(report))
+        self.assertEqual(set(['src/Main.hs', 'src/Other.hs', None]), self.store.update([]))
+        self.assertEqual([], self.store.paths())
@@ -0,0 +1,51 @@
+import unittest
+from identifier_index import IdentifierIndex, module_name_candidates
+import response as res
+from .data import many_completions
+
+
+def names(completions):
+    return [prop.name for (prop, scope) in completions]
+
+
+class IdentifierIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = IdentifierIndex()
+        self.completions = list(res.parse_autocompletions(many_completions.get('contents')))
+
+    def test_unindexed_files(self):
+        self.assertIsNone(self.index.lookup('src/Main.hs', '*'))
+
+    def test_looks_up_prefixes(self):
+        self.index.replace('src/Main.hs', reversed(self.completions))
+        self.assertEqual(['*', '**', '*>'], names(self.index.lookup('src/Main.hs', '*')))
+        self.assertEqual(8, len(self.index.lookup('src/Main.hs', '')))
+        self.assertEqual([], self.index.lookup('src/Main.hs', 'x'))
+        self.assertIsNone(self.index.lookup('src/Main.hs', 'Data.L'))
+
+    def test_updates_prefix_in_place(self):
+        self.index.replace('src/Main.hs', self.completions)
+        starstar = self.completions[5]
+        self.index.update('src/Main.hs', '*', [starstar])
+        self.assertEqual(['**'], names(self.index.lookup('src/Main.hs', '*')))
+        self.assertEqual(6, len(self.index))
+
+    def test_update_keeps_names_sorted(self):
+        self.index.replace('src/Main.hs', self.completions)
+        starstar = self.completions[5]
+        others = [completion for completion in self.completions if not completion[0].name.startswith('*')]
+        self.index.update('src/Main.hs', '*', [starstar] + others)
+        self.assertEqual(['**'], names(self.index.lookup('src/Main.hs', '*')))
+        self.assertEqual(6, len(self.index))
+        all_names = names(self.index.lookup('src/Main.hs', ''))
+        self.assertEqual(sorted(all_names), all_names)
+
+    def test_refreshes_stale_loaded_modules(self):
+        self.index.mark_stale(['src/Data/Lib.hs', 'app/Main.hs'])
+        self.assertEqual(['src/Data/Lib.hs'], self.index.stale_loaded(['Data.Lib']))
+        self.index.replace('src/Data/Lib.hs', [])
+        self.assertEqual({'app/Main.hs'}, self.index.stale)
+
+    def test_module_name_candidates(self):
+        self.assertEqual({'Lib', 'Data.Lib', 'src.Data.Lib'}, module_name_candidates('src/Data/Lib.hs'))
@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from include_targets import IncludeTargets
+from req import Req
+from .mocks import cur_dir
+from .stubs import sublime
+
+PROJECT = cur_dir + '/projects/helloworld'
+
+
+class IncludeTargetsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.session.get = lambda key, default: {
+            "recent_projects": [PROJECT, "/projects/recent"],
+            "include_targets": {PROJECT: ["src/Main.hs", "src/Deleted.hs"],
+                                "/projects/recent": ["src/A.hs"],
+                                "/projects/forgotten": ["src/B.hs"]}}.get(key, default)
+        patcher = patch.object(sublime, 'load_settings', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.targets = IncludeTargets(PROJECT)
+
+    def test_starts_from_saved_targets_that_exist(self):
+        self.assertEqual(set(["src/Main.hs"]), self.targets.targets)
+
+    def test_reconciles_with_listed_targets(self):
+        self.targets.add(["src/New.hs"])
+        self.assertTrue(self.targets.reconcile(["src/Lib.hs"]))
+        self.assertEqual(set(["src/Lib.hs", "src/New.hs"]), self.targets.targets)
+        self.assertFalse(self.targets.reconcile(["src/Lib.hs"]))
+        self.targets.clear()
+        self.assertTrue(self.targets.reconcile(["src/Lib.hs"]))
+        self.assertEqual(set(["src/Lib.hs"]), self.targets.targets)
+
+    def test_sends_targets_when_changed(self):
+        self.assertEqual(Req.update_session_includes(["src/Main.hs"]), self.targets.update_request())
+        self.assertEqual(Req.update_session(), self.targets.update_request())
+
+        self.targets.add(["src/Main.hs"])
+        self.assertEqual(Req.update_session(), self.targets.update_request())
+
+        self.targets.add(["src/Lib.hs"])
+        self.assertEqual(Req.update_session_includes(["src/Lib.hs", "src/Main.hs"]), self.targets.update_request())
+
+    def test_saves_targets_of_recent_projects(self):
+        self.targets.add(["src/Lib.hs"])
+        self.targets.update_request()
+        self.session.set.assert_called_with("include_targets", {PROJECT: ["src/Lib.hs", "src/Main.hs"],
+                                                                "/projects/recent": ["src/A.hs"]})
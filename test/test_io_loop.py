@@ -0,0 +1,71 @@
+import os
+import threading
+import unittest
+from unittest.mock import Mock
+import stack_ide
+from io_loop import IOLoop, set_non_blocking
+from .test_stackide import fake_process
+
+
+@unittest.skipUnless(IOLoop.supported, "IOLoop needs select() on pipes")
+class IOLoopTests(unittest.TestCase):
+
+    def test_reads_until_eof(self):
+        loop = IOLoop()
+        (read_fd, write_fd) = os.pipe()
+        set_non_blocking(read_fd)
+        chunks = []
+        done = threading.Event()
+
+        def callback(chunk):
+            chunks.append(chunk)
+            if not chunk:
+                done.set()
+
+        loop.add_reader(read_fd, lambda: os.read(read_fd, 1024), callback)
+        os.write(write_fd, b'hello')
+        os.close(write_fd)
+        self.assertTrue(done.wait(5))
+        os.close(read_fd)
+
+        self.assertEqual(b'hello', b''.join(chunks))
+        self.assertEqual(b'', chunks[-1])
+        self.assertEqual(0, loop.reader_count())
+
+    def test_bad_streams_end_without_stopping_the_loop(self):
+        loop = IOLoop()
+        ended = threading.Event()
+        loop.add_reader(-1, Mock(), lambda chunk: ended.set() if chunk == b'' else None)
+        self.assertTrue(ended.wait(5))
+
+        (read_fd, write_fd) = os.pipe()
+        set_non_blocking(read_fd)
+        done = threading.Event()
+        loop.add_reader(read_fd, lambda: os.read(read_fd, 1024), lambda chunk: None if chunk else done.set())
+        os.close(write_fd)
+        self.assertTrue(done.wait(5))
+        os.close(read_fd)
+        self.assertTrue(loop.thread.is_alive())
+
+    def test_backends_share_one_thread(self):
+        threads_before = threading.active_count()
+        processes = [fake_process() for _ in range(4)]
+        handlers = [Mock() for _ in processes]
+        backends = [stack_ide.JsonProcessBackend(process, handler) for (process, handler) in zip(processes, handlers)]
+
+        # one writer thread each, the reading happens on the shared loop
+        self.assertLessEqual(threading.active_count() - threads_before, len(backends) + 1)
+
+        for (index, process) in enumerate(processes):
+            process.stdout_write.write('{{"tag": "ResponseLog", "contents": "{}"}}\n'.format(index).encode('UTF-8'))
+            process.stdout_write.close()
+            process.stderr_write.close()
+        for backend in backends:
+            self.assertTrue(backend.reader_done.wait(5))
+            self.assertTrue(backend.errors_done.wait(5))
+            backend.close()
+        for (index, handler) in enumerate(handlers):
+            handler.assert_called_once_with({"tag": "ResponseLog", "contents": str(index)})
+        for process in processes:
+            process.stdout.close()
+            process.stderr.close()
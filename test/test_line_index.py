@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+from line_index import LineIndex
+from response import SourceSpan
+
+TEXT = "module Main where\n\nmain :: IO ()\nmain = putStrLn \"hi\""
+
+
+def text_view(text, change_count=1):
+    view = MagicMock()
+    view.id = Mock(return_value=1)
+    view.size = Mock(return_value=len(text))
+    view.substr = Mock(side_effect=lambda region: text[region.begin():region.end()])
+    view.change_count = Mock(return_value=change_count)
+    return view
+
+
+class LineIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        LineIndex.views.clear()
+        self.index = LineIndex(TEXT, 1)
+
+    def test_maps_rows_and_columns_to_points(self):
+        self.assertEqual(0, self.index.text_point(0, 0))
+        self.assertEqual(7, self.index.text_point(0, 7))
+        self.assertEqual(18, self.index.text_point(1, 0))
+        self.assertEqual(TEXT.index("IO"), self.index.text_point(2, 8))
+
+    def test_keeps_points_within_the_text(self):
+        # past the end of a line, and past the last line
+        self.assertEqual(TEXT.index("\n"), self.index.text_point(0, 100))
+        self.assertEqual(len(TEXT), self.index.text_point(10, 0))
+
+    def test_maps_points_to_rows_and_columns(self):
+        self.assertEqual((0, 0), self.index.rowcol(0))
+        self.assertEqual((1, 0), self.index.rowcol(18))
+        self.assertEqual((3, 7), self.index.rowcol(TEXT.index("putStrLn")))
+        for point in range(len(TEXT)):
+            self.assertEqual(point, self.index.text_point(*self.index.rowcol(point)))
+
+    def test_maps_spans_to_regions(self):
+        spans = [SourceSpan('src/Main.hs', 3, 1, 3, 5), SourceSpan('src/Main.hs', 4, 8, 4, 16)]
+        regions = self.index.regions(spans)
+        self.assertEqual(["main", "putStrLn"], [TEXT[region.begin():region.end()] for region in regions])
+
+    def test_built_once_per_change_count(self):
+        view = text_view(TEXT)
+        index = LineIndex.for_view(view)
+        self.assertIs(index, LineIndex.for_view(view))
+        self.assertEqual(1, view.substr.call_count)
+
+        view.change_count.return_value = 2
+        self.assertIsNot(index, LineIndex.for_view(view))
+
+        LineIndex.forget(view.id())
+        self.assertNotIn(view.id(), LineIndex.views)
@@ -1,13 +1,16 @@
 import unittest
-from unittest.mock import Mock, ANY
-from event_listeners import StackIDESaveListener, StackIDETypeAtCursorHandler, StackIDEAutocompleteHandler
+from unittest.mock import Mock, ANY, patch
+from event_listeners import StackIDESaveListener, StackIDEErrorLoadListener, StackIDETypeAtCursorHandler, StackIDEAutocompleteHandler
 from req import Req
+from stack_ide_manager import StackIDEManager
+from win import Win
 from .stubs import sublime
-from .mocks import default_mock_window, setup_fake_backend, setup_mock_backend
+from .mocks import default_mock_window, mock_view, setup_fake_backend, setup_mock_backend
 from settings import Settings
 import stack_ide
 import utility as util
 from .data import many_completions
+from response import parse_autocompletions
 
 test_settings = Settings("none", [], False)
 type_info = "FilePath -> IO String"
@@ -49,6 +52,15 @@ class ListenerTests(unittest.TestCase):
 
         backend.send_request.assert_not_called()
 
+    def test_highlights_errors_on_load(self):
+        listener = StackIDEErrorLoadListener()
+        (window, view) = default_mock_window()
+        setup_mock_backend(window)
+
+        with patch.object(Win, "highlight_errors") as highlight_errors:
+            listener.on_load(view)
+        highlight_errors.assert_called_with(["src/Main.hs"])
+
 
     def test_type_at_cursor_tests(self):
         listener = StackIDETypeAtCursorHandler()
@@ -60,6 +72,41 @@ class ListenerTests(unittest.TestCase):
         view.set_status.assert_called_with("type_at_cursor", type_info)
         view.add_regions.assert_called_with("type_at_cursor", ANY, "storage.type", "", sublime.DRAW_OUTLINED)
 
+    def test_type_at_cursor_latest_wins(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_mock_backend(window)
+        instance = StackIDEManager.for_window(window)
+
+        listener.on_selection_modified(view)
+        listener.on_selection_modified(view)
+        (stale, latest) = [args[0].get('seq') for (args, kwargs) in backend.send_request.call_args_list[-2:]]
+
+        instance.handle_response(dict(exp_types_response, seq=stale))
+        view.set_status.assert_not_called()
+
+        instance.handle_response(dict(exp_types_response, seq=latest))
+        view.set_status.assert_called_with("type_at_cursor", type_info)
+        self.assertNotIn(stale, instance.conts)
+        self.assertNotIn(latest, instance.conts)
+
+    def test_type_at_cursor_waits_for_quiet_period(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_mock_backend(window)
+        backend.send_request.reset_mock()
+
+        timeouts = []
+        with patch.object(sublime, 'set_timeout', lambda fn, delay: timeouts.append(fn)), \
+             patch.object(StackIDETypeAtCursorHandler, 'quiet_period', 100):
+            listener.on_selection_modified(view)
+            listener.on_selection_modified(view)
+            backend.send_request.assert_not_called()
+            for timeout in timeouts:
+                timeout()
+
+        self.assertEqual(1, backend.send_request.call_count)
+
     def test_request_completions(self):
 
         listener = StackIDEAutocompleteHandler()
@@ -82,10 +129,83 @@ class ListenerTests(unittest.TestCase):
         completions = listener.on_query_completions(view, 'm', []) #locations not used.
 
         self.assertEqual(8, len(completions))
-        self.assertEqual(['!!\t\tData.List', '!!'], completions[0])
+        # ranked: all come from other packages, so the shortest names go first
+        self.assertEqual(['$\t(a -> b) -> a -> b\t', '$'], completions[0])
+        self.assertIn(['!!\t\tData.List', '!!'], completions)
 
         # in live situations on_query_completions returns [] first while we retrieve results
         # here we make sure that the re-trigger calls are still in place
         view.run_command.assert_any_call('hide_auto_complete')
         view.run_command.assert_any_call('auto_complete', ANY)
 
+
+    def test_refines_completions_locally(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        view.settings().get = Mock(return_value=False)
+        backend = setup_fake_backend(window, {'RequestGetAutocompletion': many_completions})
+        backend.return_test_data = Mock(wraps=backend.return_test_data)
+
+        def completion_requests():
+            return [args[0]['contents'][1] for (args, _) in backend.return_test_data.call_args_list
+                    if args[0]['tag'] == 'RequestGetAutocompletion']
+
+        listener.on_query_completions(view, '', [])
+        completions = listener.on_query_completions(view, '*', [])
+        self.assertEqual(['*', '**', '*>'], [name for (_, name) in completions])
+        self.assertEqual([''], completion_requests())
+
+        # recompiling invalidates the cache
+        StackIDEManager.for_window(window).update_files(['src/Main.hs'])
+        listener.on_query_completions(view, '*', [])
+        self.assertEqual(['', '*'], completion_requests())
+
+    def test_completions_are_per_view(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        other_view = mock_view('src/Lib.hs', window)
+        for v in (view, other_view):
+            v.settings().get = Mock(return_value=False)
+        setup_fake_backend(window, {'RequestGetAutocompletion': many_completions})
+
+        listener.on_query_completions(view, '', [])
+        listener.refreshing.add(other_view.id())
+        self.assertEqual([], listener.on_query_completions(other_view, '', []))
+        self.assertEqual(8, len(listener.on_query_completions(view, '', [])))
+
+    def test_serves_indexed_completions_while_waiting(self):
+        listener = StackIDEAutocompleteHandler()
+        (window, view) = default_mock_window()
+        view.settings().get = Mock(return_value=False)
+        backend = setup_mock_backend(window)
+        instance = StackIDEManager.for_window(window)
+        instance.identifiers.replace(util.relative_view_file_name(view), parse_autocompletions(many_completions.get('contents')))
+
+        completions = listener.on_query_completions(view, '*', [])
+        self.assertEqual(['*', '**', '*>'], [name for (_, name) in completions])
+        req = Req.get_autocompletion(filepath=util.relative_view_file_name(view), prefix="*")
+        req['seq'] = ANY
+        backend.send_request.assert_called_with(req)
+
+    def test_type_at_cursor_answered_from_cache(self):
+        listener = StackIDETypeAtCursorHandler()
+        (window, view) = default_mock_window()
+        backend = setup_mock_backend(window)
+        instance = StackIDEManager.for_window(window)
+
+        listener.on_selection_modified(view)
+        seq_id = backend.send_request.call_args[0][0].get('seq')
+        # the type of "module", the token under the cursor
+        token_types = [[type_info, dict(span, spanToColumn=7)]]
+        instance.handle_response(dict(exp_types_response, contents=token_types, seq=seq_id))
+        backend.send_request.reset_mock()
+        view.set_status.reset_mock()
+
+        # still within the span of the reply, whose type the view already shows
+        listener.on_selection_modified(view)
+        backend.send_request.assert_not_called()
+        view.set_status.assert_not_called()
+
+        listener.on_modified(view)
+        listener.on_selection_modified(view)
+        self.assertEqual(1, backend.send_request.call_count)
@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import stack_ide
+from prefetch import Prefetcher, identifier_positions
+from response import SourceSpan
+from .stubs import sublime
+from .mocks import mock_window, mock_view, cur_dir
+from .data import test_settings
+
+TEXT = "main = do putStrLn greeting -- says hi"
+
+
+def prefetch_view(window):
+    view = mock_view('src/Main.hs', window)
+    view.substr = Mock(return_value=TEXT)
+    view.visible_region = Mock(return_value=sublime.Region(0, len(TEXT)))
+    view.change_count = Mock(return_value=1)
+    view.match_selector = Mock(side_effect=lambda position, selector: selector == "source.haskell" or position >= TEXT.index('--'))
+    return view
+
+
+def reply(request, position, length):
+    """
+    A reply to a prefetch request, for an identifier at position with the given length.
+    """
+    span = {"spanFilePath": "src/Main.hs", "spanFromLine": 1, "spanFromColumn": position + 1,
+            "spanToLine": 1, "spanToColumn": position + 1 + length}
+    if request['tag'] == 'RequestGetExpTypes':
+        return {"seq": request['seq'], "tag": "ResponseGetExpTypes", "contents": [["String", span]]}
+    info = {'tag': 'SpanId', 'contents': {
+        'idProp': {'idDefinedIn': {'moduleName': 'Main', 'modulePackage': {'packageName': 'main'}},
+                   'idType': 'String', 'idName': 'greeting',
+                   'idDefSpan': {'tag': 'ProperSpan', 'contents': dict(span, spanFromLine=5, spanToLine=5)}},
+        'idScope': {'tag': 'Local'}}}
+    return {"seq": request['seq'], "tag": "ResponseGetSpanInfo", "contents": [[info, span]]}
+
+
+@patch('stack_ide.stack_ide_loadtargets', return_value=[])
+@patch('prefetch.Prefetcher.max_requests', 10)
+class PrefetcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.window = mock_window([cur_dir + '/projects/helloworld'])
+        self.view = prefetch_view(self.window)
+        self.backend = MagicMock()
+
+    def start_instance(self):
+        """
+        Creates an instance whose initial source errors request never got a
+        reply, which doesn't hold up prefetching, as that is speculative work.
+        """
+        return stack_ide.StackIDE(self.window, test_settings, self.backend)
+
+    def sent(self):
+        return [args[0] for (args, _) in self.backend.send_request.call_args_list
+                if args[0].get('tag') in ('RequestGetExpTypes', 'RequestGetSpanInfo')]
+
+    def test_identifier_positions(self, loadtargets_mock):
+        positions = identifier_positions(self.view, self.view.visible_region(), 10)
+        self.assertEqual([0, 0, 10, 10, 19, 19], [position for (position, kind) in positions])
+        positions = identifier_positions(self.view, self.view.visible_region(), 1)
+        self.assertEqual([(0, "types"), (0, "span_info")], list(positions))
+
+    def test_fetches_one_identifier_at_a_time(self, loadtargets_mock):
+        instance = self.start_instance()
+        instance.prefetcher.start(self.view)
+        self.assertEqual(1, len(self.sent()))
+
+        for (position, length) in [(0, 4), (0, 4), (10, 8), (10, 8), (19, 8), (19, 8)]:
+            request = self.sent()[-1]
+            self.assertEqual(position + 1, request['contents']['spanFromColumn'])
+            instance.handle_response(reply(request, position, length))
+
+        self.assertEqual(['RequestGetExpTypes', 'RequestGetSpanInfo'] * 3, [request['tag'] for request in self.sent()])
+        self.assertEqual({}, instance.prefetcher.jobs)
+        span = {"spanFilePath": "src/Main.hs", "spanFromLine": 1, "spanFromColumn": 13, "spanToLine": 1, "spanToColumn": 13}
+        self.assertEqual("String", instance.types.lookup(span)[0][0])
+        self.assertEqual("greeting", instance.span_infos.lookup(span)[0][0][0].name)
+
+    def test_skips_known_types(self, loadtargets_mock):
+        instance = self.start_instance()
+        # the types of "putStrLn" and "greeting" are known already
+        for (position, length) in [(10, 8), (19, 8)]:
+            token = {"spanFilePath": "src/Main.hs", "spanFromLine": 1, "spanFromColumn": position + 1,
+                     "spanToLine": 1, "spanToColumn": position + 1 + length}
+            instance.types.store(token, [("String", SourceSpan("src/Main.hs", 1, position + 1, 1, position + 1 + length))])
+        instance.prefetcher.start(self.view)
+        for (position, length) in [(0, 4), (0, 4), (10, 8), (19, 8)]:
+            instance.handle_response(reply(self.sent()[-1], position, length))
+        self.assertEqual(['RequestGetExpTypes'] + ['RequestGetSpanInfo'] * 3, [request['tag'] for request in self.sent()])
+        self.assertEqual({}, instance.prefetcher.jobs)
+
+    def test_stops_when_edited(self, loadtargets_mock):
+        instance = self.start_instance()
+        instance.prefetcher.start(self.view)
+        self.view.change_count.return_value = 2
+        instance.handle_response(reply(self.sent()[-1], 0, 4))
+        self.assertEqual(1, len(self.sent()))
+        self.assertIsNone(instance.types.lookup({"spanFilePath": "src/Main.hs", "spanFromLine": 1, "spanFromColumn": 1,
+                                                 "spanToLine": 1, "spanToColumn": 1}))
+
+    def test_starts_over_when_scrolled(self, loadtargets_mock):
+        instance = self.start_instance()
+        instance.prefetcher.start(self.view)
+        self.view.visible_region.return_value = sublime.Region(10, len(TEXT))
+        self.view.substr.return_value = TEXT[10:]
+        instance.handle_response(reply(self.sent()[-1], 0, 4))
+        self.assertEqual(11, self.sent()[-1]['contents']['spanFromColumn'])
+
+    def test_starts_after_clean_compile(self, loadtargets_mock):
+        instance = self.start_instance()
+        instance.handle_source_errors([])
+        self.assertEqual(1, len(self.sent()))
+
+    def test_skips_other_files(self, loadtargets_mock):
+        instance = self.start_instance()
+        self.view.match_selector = Mock(return_value=False) # e.g. a README
+        instance.handle_source_errors([])
+        self.assertEqual([], self.sent())
+
+    def test_disabled(self, loadtargets_mock):
+        instance = self.start_instance()
+        with patch.object(Prefetcher, 'max_requests', 0):
+            instance.handle_source_errors([])
+        self.assertEqual([], self.sent())
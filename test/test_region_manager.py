@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+from region_manager import RegionManager
+from .stubs import sublime
+
+
+class RegionManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = RegionManager()
+        self.view = MagicMock()
+        self.view.id = Mock(return_value=1)
+
+    def test_adds_changed_regions_only(self):
+        self.manager.add_regions(self.view, "errors", [sublime.Region(1, 2)], "invalid", "dot", 0)
+        self.manager.add_regions(self.view, "errors", [sublime.Region(1, 2)], "invalid", "dot", 0)
+        self.view.add_regions.assert_called_once_with("errors", [sublime.Region(1, 2)], "invalid", "dot", 0)
+        self.assertTrue(self.manager.shows(self.view, "errors"))
+
+        self.manager.add_regions(self.view, "errors", [sublime.Region(3, 4)], "invalid", "dot", 0)
+        self.assertEqual(2, self.view.add_regions.call_count)
+
+    def test_erases_regions_that_are_gone(self):
+        # nothing to erase in a view we haven't touched
+        self.manager.add_regions(self.view, "errors", [], "invalid", "dot", 0)
+        self.view.erase_regions.assert_not_called()
+        self.assertTrue(self.manager.shows(self.view, "errors"))
+        self.assertFalse(self.manager.shows(self.view, "warnings"))
+
+        self.manager.add_regions(self.view, "errors", [sublime.Region(1, 2)], "invalid", "dot", 0)
+        self.manager.add_regions(self.view, "errors", [], "invalid", "dot", 0)
+        self.view.erase_regions.assert_called_once_with("errors")
+
+    def test_sets_changed_status_only(self):
+        self.manager.set_status(self.view, "type_at_cursor", "Int")
+        self.manager.set_status(self.view, "type_at_cursor", "Int")
+        self.view.set_status.assert_called_once_with("type_at_cursor", "Int")
+
+    def test_clears_views_showing_the_key(self):
+        other_view = MagicMock()
+        other_view.id = Mock(return_value=2)
+        closed_view = MagicMock()
+        closed_view.id = Mock(return_value=3)
+        closed_view.is_valid = Mock(return_value=False)
+        self.manager.set_status(self.view, "type_at_cursor", "Int")
+        self.manager.add_regions(self.view, "type_at_cursor", [sublime.Region(1, 2)], "storage.type", "", 0)
+        self.manager.add_regions(other_view, "errors", [sublime.Region(1, 2)], "invalid", "dot", 0)
+        self.manager.set_status(closed_view, "type_at_cursor", "Int")
+
+        self.manager.clear("type_at_cursor")
+
+        self.view.set_status.assert_called_with("type_at_cursor", "")
+        self.view.erase_regions.assert_called_once_with("type_at_cursor")
+        other_view.erase_regions.assert_not_called()
+        closed_view.set_status.assert_called_once_with("type_at_cursor", "Int")
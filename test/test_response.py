@@ -1,5 +1,7 @@
+import json
 import unittest
 import response as res
+from . import benchmarks
 from .data import source_errors, status_progress_1, status_progress_2, status_progress_done, status_progress_restart, many_completions, readFile_exp_types
 
 class ParsingTests(unittest.TestCase):
@@ -53,3 +55,19 @@ class ParsingTests(unittest.TestCase):
         self.assertEqual('Compiling Lib', res.parse_update_session(status_progress_1.get('contents')))
         self.assertEqual('Compiling Main', res.parse_update_session(status_progress_2.get('contents')))
         self.assertEqual(' ', res.parse_update_session(status_progress_done.get('contents')))
+
+    def test_parse_source_span_without_span(self):
+        self.assertIsNone(res.parse_source_span(None))
+
+    def test_interns_paths_and_names(self):
+        contents = json.loads(json.dumps(benchmarks.completions_payload(2) + benchmarks.completions_payload(1)))
+        ((first, first_scope), _, (other, other_scope)) = list(res.parse_autocompletions(contents))
+        self.assertIs(first.package, other.package)
+        self.assertIs(first.module, other.module)
+        self.assertIs(first.defSpan.filePath, other.defSpan.filePath)
+        self.assertIs(first_scope.importedFrom.module, other_scope.importedFrom.module)
+
+    def test_slotted_model_uses_less_memory(self):
+        results = benchmarks.compare_response_models(500)
+        self.assertFalse(hasattr(res.SourceSpan('src/Lib.hs', 1, 1, 1, 1), '__dict__'))
+        self.assertLess(results['current']['bytes'], results['legacy']['bytes'])
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import Mock
+from scheduler import RequestScheduler, priority_of, INTERACTIVE, NAVIGATION, BACKGROUND, SPECULATIVE
+from req import Req
+
+
+def with_seq(request, seq_id):
+    return dict(request, seq=seq_id)
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def test_classifies_requests(self):
+        self.assertEqual(INTERACTIVE, priority_of(Req.get_autocompletion('src/Main.hs', 'm')))
+        self.assertEqual(INTERACTIVE, priority_of(Req.get_exp_types({})))
+        self.assertEqual(INTERACTIVE, priority_of(Req.get_exp_info({})))
+        self.assertEqual(BACKGROUND, priority_of(Req.update_session()))
+        self.assertEqual(BACKGROUND, priority_of(Req.get_source_errors()))
+        self.assertEqual(NAVIGATION, priority_of({"tag": "RequestGetLoadedModules", "contents": []}))
+
+    def test_interactive_requests_skip_queued_background_work(self):
+        send = Mock()
+        scheduler = RequestScheduler(send)
+
+        errors_1 = with_seq(Req.get_source_errors(), '1')
+        errors_2 = with_seq(Req.get_source_errors(), '2')
+        types = with_seq(Req.get_exp_types({}), '3')
+
+        scheduler.submit(errors_1)
+        scheduler.submit(errors_2)
+        scheduler.submit(Req.update_session())
+        scheduler.submit(types)
+
+        # background is capped at one request awaiting its reply,
+        # and the update session keeps its place behind errors_2
+        self.assertEqual([errors_1, types], [args[0] for (args, kwargs) in send.call_args_list])
+        self.assertEqual({"interactive": 0, "navigation": 0, "background": 2, "speculative": 0}, scheduler.queue_depths())
+        self.assertEqual({"interactive": 1, "navigation": 0, "background": 1, "speculative": 0}, scheduler.in_flight())
+
+        scheduler.complete('1')
+        self.assertEqual([errors_2, Req.update_session()], [args[0] for (args, kwargs) in send.call_args_list[2:]])
+        self.assertEqual({"interactive": 0, "navigation": 0, "background": 0, "speculative": 0}, scheduler.queue_depths())
+
+    def test_saves_skip_queued_speculative_work(self):
+        send = Mock()
+        scheduler = RequestScheduler(send)
+
+        refreshes = [with_seq(Req.get_autocompletion('src/M{}.hs'.format(i), ''), str(i)) for i in range(3)]
+        for refresh in refreshes:
+            scheduler.submit(refresh, SPECULATIVE)
+        errors = with_seq(Req.get_source_errors(), 'errors')
+        scheduler.submit(Req.update_session())
+        scheduler.submit(errors)
+
+        self.assertEqual([refreshes[0], Req.update_session(), errors], [args[0] for (args, kwargs) in send.call_args_list])
+        self.assertEqual(2, scheduler.queue_depths()["speculative"])
+
+    def test_caps_interactive_requests(self):
+        send = Mock()
+        scheduler = RequestScheduler(send, {INTERACTIVE: 1, NAVIGATION: 1, BACKGROUND: 1})
+
+        scheduler.submit(with_seq(Req.get_exp_types({}), '1'))
+        scheduler.submit(with_seq(Req.get_exp_types({}), '2'))
+        self.assertEqual(1, send.call_count)
+        self.assertEqual(1, scheduler.queue_depths()["interactive"])
+
+        self.assertTrue(scheduler.cancel('2'))
+        self.assertFalse(scheduler.cancel('1'))
+        self.assertEqual(0, scheduler.queue_depths()["interactive"])
+
+    def test_sends_in_order_when_reply_is_synchronous(self):
+        sent = []
+        def send(request):
+            sent.append(request)
+            scheduler.complete(request.get('seq'))
+        scheduler = RequestScheduler(send)
+
+        requests = [with_seq(Req.get_source_errors(), str(seq_id)) for seq_id in range(3)]
+        for request in requests:
+            scheduler.submit(request)
+
+        self.assertEqual(requests, sent)
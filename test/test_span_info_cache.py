@@ -0,0 +1,47 @@
+import unittest
+from span_info_cache import SpanInfoCache
+import response as res
+from .data import someFunc_span_info, putStrLn_span_info
+
+
+def request(line, column, path='app/Main.hs'):
+    return {"spanFilePath": path, "spanFromLine": line, "spanFromColumn": column,
+            "spanToLine": line, "spanToColumn": column}
+
+
+class SpanInfoCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SpanInfoCache()
+        # someFunc is used at app/Main.hs:7:27-35 and defined at src/Lib.hs:9:1
+        self.someFunc = list(res.parse_span_info_response(someFunc_span_info.get('contents')))
+        self.cache.store(request(7, 30), self.someFunc, self.cache.generation('app/Main.hs'))
+
+    def test_answers_within_identifier(self):
+        self.assertIs(self.someFunc, self.cache.lookup(request(7, 27)))
+        self.assertIs(self.someFunc, self.cache.lookup(request(7, 34)))
+        self.assertIsNone(self.cache.lookup(request(7, 35)))
+        self.assertIsNone(self.cache.lookup(request(7, 30, 'src/Lib.hs')))
+
+    def test_maps_definitions_to_uses(self):
+        self.assertEqual([('app/Main.hs', (7, 27), (7, 35))], self.cache.uses_of('src/Lib.hs', 9, 1))
+        self.assertEqual([], self.cache.uses_of('src/Lib.hs', 10, 1))
+
+    def test_recompiling_a_definition_evicts_its_uses(self):
+        putStrLn = list(res.parse_span_info_response(putStrLn_span_info.get('contents')))
+        self.cache.store(request(7, 42), putStrLn, self.cache.generation('app/Main.hs'))
+
+        self.cache.recompiled(['src/Lib.hs'])
+        self.assertIsNone(self.cache.lookup(request(7, 30)))
+        self.assertIsNone(self.cache.lookup(request(7, 42)))
+        self.assertEqual([], self.cache.uses_of('src/Lib.hs', 9, 1))
+
+    def test_recompiling_other_files_keeps_entries(self):
+        self.cache.recompiled(['src/Other.hs'])
+        self.assertIs(self.someFunc, self.cache.lookup(request(7, 30)))
+
+    def test_ignores_replies_from_before_a_recompile(self):
+        generation = self.cache.generation('app/Main.hs')
+        self.cache.recompiled(['app/Main.hs'])
+        self.cache.store(request(7, 30), self.someFunc, generation)
+        self.assertIsNone(self.cache.lookup(request(7, 30)))
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, patch
 from stack_ide_manager import NoStackIDE, StackIDEManager, configure_instance
 import stack_ide
 from .mocks import mock_window, cur_dir
@@ -13,6 +13,9 @@ import watchdog as wd
 
 class WatchdogTests(unittest.TestCase):
 
+    # plugin_loaded applies the settings, don't let them leak into other tests
+    @patch('prefetch.Prefetcher.max_requests', 0)
+    @patch('stack_ide.StackIDE.save_delay', 0)
     def test_managed_by_plugin_events(self):
 
         self.assertIsNone(wd.watchdog)
@@ -100,6 +103,36 @@ class StackIDEManagerTests(unittest.TestCase):
         backend.send_request.assert_called_with(Req.get_shutdown())
 
 
+    def test_shares_instance_between_windows_on_same_project(self):
+        window = mock_window([cur_dir + '/projects/helloworld'])
+        other_window = mock_window([cur_dir + '/projects/helloworld/'])
+        other_window.id = Mock(return_value=5678)
+        sublime.add_window(window)
+
+        backend = MagicMock()
+        stack_ide.stack_ide_loadtargets = Mock(return_value=['app/Main.hs', 'src/Lib.hs'])
+        instance = stack_ide.StackIDE(window, test_settings, backend)
+        StackIDEManager.ide_backend_instances[window.id()] = instance
+
+        # the second window attaches to the running instance
+        sublime.add_window(other_window)
+        StackIDEManager.check_windows()
+        self.assertIs(instance, StackIDEManager.ide_backend_instances[other_window.id()])
+        self.assertEqual(2, len(instance.windows))
+
+        # closing one window keeps the instance running for the other
+        sublime.destroy_windows()
+        sublime.add_window(other_window)
+        StackIDEManager.check_windows()
+        self.assertTrue(instance.is_alive)
+        self.assertEqual([other_window.id()], list(instance.windows.keys()))
+
+        # closing the last window shuts it down
+        sublime.destroy_windows()
+        StackIDEManager.check_windows()
+        self.assertFalse(instance.is_alive)
+        backend.send_request.assert_called_with(Req.get_shutdown())
+
     def test_retains_existing_instances(self):
         StackIDEManager.check_windows()
         self.assertEqual(0, len(StackIDEManager.ide_backend_instances))
@@ -1,12 +1,17 @@
 import unittest
+import os
+import json
+import time
+import threading
 from unittest.mock import Mock, MagicMock, patch
 import stack_ide as stackide
 from .stubs import sublime
 from .fakebackend import FakeBackend
 from .mocks import mock_window, cur_dir
 from settings import Settings
-from .data import status_progress_1
+from .data import status_progress_1, status_progress_2, status_progress_done, many_completions
 from req import Req
+from include_targets import IncludeTargets
 
 test_settings = Settings("none", [], False)
 
@@ -21,12 +26,121 @@ class StackIDETests(unittest.TestCase):
         self.assertTrue(instance.is_alive)
 
         # it got the load targets
-        self.assertEqual(2, len(instance.include_targets))
+        self.assertEqual(2, len(instance.include_targets.targets))
 
         # it should also have called get source errors,
         # but FakeBackend sends no errors back by default.
 
 
+    def test_sends_targets_only_when_changed(self, loadtargets_mock):
+        backend = FakeBackend()
+        backend.return_test_data = Mock(wraps=backend.return_test_data)
+        instance = stackide.StackIDE(
+            mock_window([cur_dir + '/mocks/helloworld/']), test_settings, backend)
+
+        instance.update_files(['src/Lib.hs'])
+        instance.update_files(['src/New.hs'])
+
+        updates = [args[0] for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == 'RequestUpdateSession']
+        self.assertEqual([Req.update_session_includes(['app/Main.hs', 'src/Lib.hs']),
+                          Req.update_session(),
+                          Req.update_session_includes(['app/Main.hs', 'src/Lib.hs', 'src/New.hs'])], updates)
+
+    def test_sends_saved_targets_once(self, loadtargets_mock):
+        loadtargets_mock.return_value = ['src/Main.hs']
+        backend = FakeBackend()
+        backend.return_test_data = Mock(wraps=backend.return_test_data)
+        with patch.object(IncludeTargets, 'saved', return_value=['src/Main.hs', 'src/Deleted.hs']):
+            stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld']), test_settings, backend)
+
+        updates = [args[0] for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == 'RequestUpdateSession']
+        self.assertEqual([Req.update_session_includes(['src/Main.hs'])], updates)
+
+    def test_drops_saved_targets_stack_does_not_list(self, loadtargets_mock):
+        # e.g. Setup.hs got saved, and defines a second main
+        loadtargets_mock.return_value = ['src/Main.hs']
+        backend = FakeBackend()
+        backend.return_test_data = Mock(wraps=backend.return_test_data)
+        with patch.object(IncludeTargets, 'saved', return_value=['src/Main.hs', 'Setup.hs']):
+            instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld']), test_settings, backend)
+
+        def updates():
+            return [args[0] for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == 'RequestUpdateSession']
+        self.assertEqual([Req.update_session_includes(['Setup.hs', 'src/Main.hs']),
+                          Req.update_session_includes(['src/Main.hs'])], updates())
+
+        # saved again in this session, it stays, until the targets are cleared
+        instance.update_files(['Setup.hs'])
+        with patch.object(IncludeTargets, 'saved', return_value=['src/Main.hs', 'Setup.hs']):
+            instance.load_initial_targets()
+        self.assertEqual(set(['Setup.hs', 'src/Main.hs']), instance.include_targets.targets)
+        instance.clear_targets()
+        self.assertEqual(Req.update_session_includes(['src/Main.hs']), updates()[-1])
+
+    @patch('stack_ide.StackIDE.save_delay', 100)
+    def test_merges_saves_within_window(self, loadtargets_mock):
+        backend = FakeBackend()
+        backend.return_test_data = Mock() # errors are replied to by hand
+        instance = stackide.StackIDE(
+            mock_window([cur_dir + '/mocks/helloworld/']), test_settings, backend)
+
+        def sent(tag):
+            return [args[0] for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == tag]
+
+        def reply_errors():
+            seq_id = sent('RequestGetSourceErrors')[-1]['seq']
+            instance.handle_response({'seq': seq_id, 'tag': 'ResponseGetSourceErrors', 'contents': []})
+
+        reply_errors() # to the initial compile
+        timers = []
+        with patch.object(sublime, 'set_timeout', side_effect=lambda fn, delay: fn() if delay == 0 else timers.append(fn)):
+            instance.save_files(['src/Lib.hs'])
+            instance.save_files(['app/Main.hs'])
+            instance.save_files(['src/Lib.hs'])
+            self.assertEqual(1, len(timers))
+            self.assertEqual(1, len(sent('RequestUpdateSession')))
+
+            # the window closes: one update for all of them
+            timers.pop()()
+            self.assertEqual(2, len(sent('RequestUpdateSession')))
+            self.assertEqual(2, len(sent('RequestGetSourceErrors')))
+
+            # saves during that compile wait for its errors
+            instance.save_files(['src/New.hs'])
+            timers.pop()()
+            self.assertEqual(2, len(sent('RequestUpdateSession')))
+            reply_errors()
+            self.assertEqual(Req.update_session_includes(['app/Main.hs', 'src/Lib.hs', 'src/New.hs']),
+                             sent('RequestUpdateSession')[-1])
+            self.assertEqual(3, len(sent('RequestGetSourceErrors')))
+
+    @patch('stack_ide.StackIDE.save_delay', 100)
+    def test_saves_go_out_when_errors_never_come(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/mocks/helloworld/']), test_settings, backend)
+
+        def sent(tag):
+            return [args[0] for (args, _) in backend.send_request.call_args_list if args[0]['tag'] == tag]
+
+        timers = []
+        with patch.object(sublime, 'set_timeout', side_effect=lambda fn, delay: fn() if delay == 0 else timers.append(fn)):
+            instance.update_files(['src/Lib.hs'])
+            instance.save_files(['app/Main.hs'])
+            timers.pop()()
+            self.assertEqual(1, len(sent('RequestGetSourceErrors')))
+
+            # the errors request is dropped by the backend: the save goes out
+            instance.handle_dropped(sent('RequestGetSourceErrors')[-1])
+            self.assertEqual(2, len(sent('RequestGetSourceErrors')))
+
+            # and the errors of that compile time out: the next one goes out too
+            instance.save_files(['src/Lib.hs'])
+            timers.pop()()
+            instance.conts.reap(time.monotonic() + stackide.CorrelationTable.default_timeout + 1)
+            self.assertEqual(2, len(sent('RequestGetSourceErrors')))
+            instance.conts.reap(time.monotonic() + stackide.StackIDE.compile_timeout + 1)
+            self.assertEqual(3, len(sent('RequestGetSourceErrors')))
+
     def test_can_send_source_errors_request(self, loadtargets_mock):
         backend = FakeBackend()
         backend.send_request = Mock()
@@ -59,6 +173,154 @@ class StackIDETests(unittest.TestCase):
         self.assertEqual(sublime.current_status, "Compiling Lib")
 
 
+    def test_ignores_unknown_seq_ids(self, loadtargets_mock):
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, MagicMock())
+        instance.handle_response({"seq": "not-ours", "tag": "ResponseGetSourceErrors", "contents": []})
+        self.assertEqual(1, instance.conts.stats()["orphaned"])
+
+    def test_overdue_requests_free_their_slot(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        handler = Mock()
+
+        # the initial source errors request never gets a reply
+        instance.send_request(Req.get_source_errors(), handler)
+        self.assertEqual(1, instance.scheduler.queue_depths()["background"])
+
+        instance.conts.reap(time.monotonic() + stackide.StackIDE.compile_timeout + 1)
+
+        self.assertEqual(0, instance.scheduler.queue_depths()["background"])
+        self.assertEqual(2, instance.conts.stats()["timed_out"])
+        handler.assert_not_called()
+        # the queued one timed out before it was sent, so it never is
+        sent = [args[0] for (args, _) in backend.send_request.call_args_list]
+        self.assertEqual(1, [request['tag'] for request in sent].count('RequestGetSourceErrors'))
+
+    def test_logs_request_stats_when_they_change(self, loadtargets_mock):
+        backend = FakeBackend()
+        backend.return_test_data = Mock() # nothing is replied to
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        with patch.object(stackide.Log, 'debug') as debug:
+            instance.reap_requests()
+            instance.reap_requests()
+        self.assertEqual(1, debug.call_count)
+        stats = debug.call_args[0][-1]
+        self.assertEqual(1, stats["outstanding"])
+        self.assertEqual(1, stats["in_flight"]["background"])
+        self.assertEqual(0, stats["merged"])
+
+    def test_superseded_requests_are_withdrawn(self, loadtargets_mock):
+        backend = MagicMock()
+        backend.withdraw = Mock(return_value=True)
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        instance.send_request(Req.get_exp_info({}), Mock(), ("prefetch", 1))
+        instance.send_request(Req.get_exp_info({}), Mock(), ("goto_definition", 1))
+        (prefetch, goto) = [args[0]['seq'] for (args, _) in backend.send_request.call_args_list[-2:]]
+
+        instance.send_request(Req.get_exp_info({}), Mock(), ("goto_definition", 1))
+        backend.withdraw.assert_called_once_with(goto)
+        self.assertNotIn(goto, instance.conts)
+        self.assertIn(prefetch, instance.conts)
+        self.assertEqual(2, instance.scheduler.in_flight()["interactive"])
+
+    def test_source_errors_fan_out_to_all_windows(self, loadtargets_mock):
+        window = mock_window([cur_dir + '/projects/helloworld/'])
+        other_window = mock_window([cur_dir + '/projects/helloworld/'])
+        other_window.id = Mock(return_value=5678)
+        instance = stackide.StackIDE(window, test_settings, MagicMock())
+        instance.attach_window(other_window)
+
+        with patch('stack_ide.Win') as win_mock:
+            instance.handle_source_errors([])
+
+        win_mock.assert_any_call(window)
+        win_mock.assert_any_call(other_window)
+        self.assertEqual(2, win_mock.return_value.handle_source_errors.call_count)
+
+    def test_responses_are_batched_per_tick(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        handler = Mock()
+        timeouts = []
+
+        with patch.object(sublime, 'set_timeout', lambda fn, delay: timeouts.append(fn)):
+            for _ in range(3):
+                instance.send_request(Req.get_exp_types({}), handler)
+            # the third goes out once a reply makes room for it
+            for index in range(3):
+                sent = [args[0] for (args, _) in backend.send_request.call_args_list if args[0]['tag'] == 'RequestGetExpTypes']
+                instance.handle_response({"seq": sent[index]['seq'], "contents": []})
+            instance.handle_response(status_progress_1)
+            instance.handle_response(status_progress_2)
+
+            self.assertEqual(1, len(timeouts))
+            timeouts.pop()()
+
+        self.assertEqual(3, handler.call_count)
+        self.assertEqual(sublime.current_status, "Compiling Main")
+        self.assertEqual([], timeouts)
+
+    @patch('stack_ide.StackIDE.inbox_budget', 0)
+    def test_leftover_responses_roll_over(self, loadtargets_mock):
+        backend = MagicMock()
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        handler = Mock()
+        timeouts = []
+
+        with patch.object(sublime, 'set_timeout', lambda fn, delay: timeouts.append(fn)):
+            for _ in range(2):
+                instance.send_request(Req.get_exp_types({}), handler)
+            for (args, _) in backend.send_request.call_args_list:
+                if args[0]['tag'] == 'RequestGetExpTypes':
+                    instance.handle_response({"seq": args[0]['seq'], "contents": []})
+
+            timeouts.pop()()
+            self.assertEqual(1, handler.call_count)
+            timeouts.pop()()
+            self.assertEqual(2, handler.call_count)
+
+        self.assertEqual([], timeouts)
+
+    def test_indexes_identifiers_once_compiled(self, loadtargets_mock):
+        backend = FakeBackend({'RequestGetLoadedModules': {'contents': ['Lib']},
+                               'RequestGetAutocompletion': many_completions})
+        instance = stackide.StackIDE(mock_window([cur_dir + '/projects/helloworld/']), test_settings, backend)
+        backend.handler = instance.handle_response
+        self.assertIsNone(instance.identifiers.lookup('src/Lib.hs', ''))
+
+        instance.handle_response(status_progress_done)
+        self.assertEqual(8, len(instance.identifiers.lookup('src/Lib.hs', '')))
+        # Main wasn't reported as loaded, so it stays stale
+        self.assertEqual({'app/Main.hs'}, instance.identifiers.stale)
+
+    def test_saves_go_before_identifier_refreshes(self, loadtargets_mock):
+        loadtargets_mock.return_value = ['src/M{}.hs'.format(i) for i in range(50)]
+        backend = FakeBackend()
+        backend.return_test_data = Mock() # replied to by hand
+        instance = stackide.StackIDE(mock_window([cur_dir + '/mocks/helloworld/']), test_settings, backend)
+
+        def sent(tag):
+            return [args[0] for (args, _) in backend.return_test_data.call_args_list if args[0]['tag'] == tag]
+
+        errors = sent('RequestGetSourceErrors')[-1]
+        instance.handle_response({'seq': errors['seq'], 'tag': 'ResponseGetSourceErrors', 'contents': []})
+        instance.handle_response(status_progress_done)
+        loaded = sent('RequestGetLoadedModules')[-1]
+        instance.handle_response({'seq': loaded['seq'], 'contents': ['M{}'.format(i) for i in range(50)]})
+
+        # one refresh at a time
+        self.assertEqual(1, len(sent('RequestGetAutocompletion')))
+        self.assertEqual(0, instance.scheduler.queue_depths()["speculative"])
+
+        instance.save_files(['src/M1.hs'])
+        self.assertEqual(2, len(sent('RequestUpdateSession')))
+        self.assertEqual(2, len(sent('RequestGetSourceErrors')))
+
+        # the next refresh goes out once the previous one is answered
+        refresh = sent('RequestGetAutocompletion')[-1]
+        instance.handle_response({'seq': refresh['seq'], 'contents': []})
+        self.assertEqual(2, len(sent('RequestGetAutocompletion')))
+
     def test_can_shutdown(self, loadtargets_mock):
         backend = FakeBackend()
         backend.send_request = Mock()
@@ -73,3 +335,139 @@ class StackIDETests(unittest.TestCase):
         backend.send_request.assert_called_with(
             Req.get_shutdown())
 
+
+class FakeStdin():
+    """
+    Records writes to stack-ide's stdin. The first write blocks until
+    released, so requests can pile up behind it.
+    """
+
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.release.wait(5)
+        self.writes.append(data)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def fake_process():
+    (stdout_read, stdout_write) = os.pipe()
+    (stderr_read, stderr_write) = os.pipe()
+    process = Mock()
+    process.poll = Mock(return_value=None)
+    process.stdin = FakeStdin()
+    process.stdout = os.fdopen(stdout_read, 'rb')
+    process.stderr = os.fdopen(stderr_read, 'rb')
+    process.stdout_write = os.fdopen(stdout_write, 'wb')
+    process.stderr_write = os.fdopen(stderr_write, 'wb')
+    return process
+
+
+class JsonProcessBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.process = fake_process()
+        self.dropped = []
+        self.backend = stackide.JsonProcessBackend(self.process, Mock(), self.dropped.append)
+
+    def tearDown(self):
+        self.process.stdin.release.set()
+        self.process.poll.return_value = 0
+        self.process.stdout_write.close()
+        self.process.stderr_write.close()
+        self.assertTrue(self.backend.reader_done.wait(5))
+        self.assertTrue(self.backend.errors_done.wait(5))
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+    def sent_lines(self):
+        return [json.loads(line) for data in self.process.stdin.writes for line in data.decode('UTF-8').splitlines()]
+
+    def test_writes_requests(self):
+        self.process.stdin.release.set()
+        self.backend.send_request(Req.get_source_errors())
+        self.assertTrue(self.backend.drain(5))
+        self.assertEqual([Req.get_source_errors()], self.sent_lines())
+        self.assertEqual(1, self.process.stdin.flushes)
+
+    def test_batches_and_merges_queued_requests(self):
+        self.backend.send_request(Req.update_session())
+        # wait for the writer to block on the first write
+        while not self.backend._writing:
+            time.sleep(0.001)
+
+        stale = dict(Req.get_exp_types({'spanFromLine': 1}), seq='1')
+        other = dict(Req.get_exp_types({'spanFromLine': 1}), seq='2') # e.g. a prefetch
+        fresh = dict(Req.get_exp_types({'spanFromLine': 2}), seq='3')
+        self.backend.send_request(stale)
+        self.backend.send_request(other)
+        self.backend.send_request(Req.get_source_errors())
+        self.assertTrue(self.backend.withdraw('1'))
+        self.backend.send_request(fresh)
+        self.process.stdin.release.set()
+        self.assertTrue(self.backend.drain(5))
+
+        self.assertEqual([Req.update_session(), other, Req.get_source_errors(), fresh], self.sent_lines())
+        self.assertEqual(2, len(self.process.stdin.writes))
+        self.assertEqual(2, self.process.stdin.flushes)
+        self.assertEqual(1, self.backend.merged_requests)
+        self.assertFalse(self.backend.withdraw('3'))
+        self.assertEqual([], self.dropped)
+
+    def test_drops_stale_interactive_requests_when_full(self):
+        self.backend.max_queued_requests = 2
+        self.backend.send_request(Req.update_session())
+        while not self.backend._writing:
+            time.sleep(0.001)
+
+        completion = Req.get_autocompletion('src/Main.hs', 'ma')
+        self.backend.send_request(completion)
+        self.backend.send_request(Req.get_source_errors())
+        self.backend.send_request(Req.update_session())
+        self.process.stdin.release.set()
+        self.assertTrue(self.backend.drain(5))
+
+        self.assertEqual(1, self.backend.dropped_requests)
+        self.assertEqual([completion], self.dropped)
+        self.assertEqual([Req.update_session(), Req.get_source_errors(), Req.update_session()], self.sent_lines())
+
+    def test_logs_stderr_lines(self):
+        with patch('stack_ide.Log') as log_mock:
+            self.process.stderr_write.write(b'first\nsec')
+            self.process.stderr_write.flush()
+            self.process.stderr_write.write(b'ond\n')
+            self.process.stderr_write.close()
+            self.assertTrue(self.backend.errors_done.wait(5))
+        errors = [call[0][1].strip() for call in log_mock.warning.call_args_list]
+        self.assertEqual(['first', 'second'], errors)
+
+    def test_handler_errors_do_not_stop_reader(self):
+        self.backend.handler.side_effect = [Exception('boom'), None]
+        self.process.stdout_write.write(b'{"tag": "ResponseLog", "contents": "1"}\n{"tag": "ResponseLog", "contents": "2"}\n')
+        self.process.stdout_write.close()
+        self.assertTrue(self.backend.reader_done.wait(5))
+        self.assertEqual(2, self.backend.handler.call_count)
+
+
+class JsonStreamDecoderTests(unittest.TestCase):
+
+    def test_decodes_messages_split_across_chunks(self):
+        decoder = stackide.JsonStreamDecoder()
+        encoded = '{"tag": "ResponseLog", "contents": "‘Integer’"}\n{"tag": "ResponseWelcome", "contents": [0, 1, 1]}\n'.encode('UTF-8')
+
+        self.assertEqual([], decoder.feed(encoded[:38]))
+        self.assertEqual([{"tag": "ResponseLog", "contents": "‘Integer’"}], decoder.feed(encoded[38:60]))
+        self.assertEqual([{"tag": "ResponseWelcome", "contents": [0, 1, 1]}], decoder.feed(encoded[60:]))
+        self.assertEqual(len(encoded), decoder.decoded_bytes)
+        self.assertGreater(decoder.throughput(), 0)
+
+    def test_skips_malformed_frames(self):
+        decoder = stackide.JsonStreamDecoder()
+        messages = decoder.feed(b'Downloading index...\n{"tag": "ResponseLog"\n{"tag": "ResponseLog", "contents": "ok"}\n')
+        self.assertEqual([{"tag": "ResponseLog", "contents": "ok"}], messages)
+        self.assertEqual(2, decoder.malformed_frames)
@@ -0,0 +1,68 @@
+import unittest
+from type_cache import TypeCache, SpanIndex
+from response import SourceSpan
+
+
+def request(from_line, from_column, to_line=None, to_column=None, path='src/Lib.hs'):
+    return {"spanFilePath": path, "spanFromLine": from_line, "spanFromColumn": from_column,
+            "spanToLine": to_line or from_line, "spanToColumn": to_column or from_column}
+
+
+def types(*spans):
+    return [("Type{}".format(index), SourceSpan('src/Lib.hs', *span)) for (index, span) in enumerate(spans)]
+
+
+class TypeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TypeCache()
+        # "greet" at 3:5-3:10 inside "greet name" at 3:5-3:15
+        self.greet = types((3, 5, 3, 10), (3, 5, 3, 15))
+        self.cache.store(request(3, 5, 3, 10), self.greet)
+
+    def test_answers_within_the_token(self):
+        self.assertIs(self.greet, self.cache.lookup(request(3, 5)))
+        self.assertIs(self.greet, self.cache.lookup(request(3, 9)))
+        self.assertIs(self.greet, self.cache.lookup(request(3, 6, 3, 10)))
+        self.assertEqual(3, self.cache.hits)
+
+    def test_misses_outside_the_token(self):
+        # within "greet name", but not within "greet"
+        self.assertIsNone(self.cache.lookup(request(3, 10)))
+        self.assertIsNone(self.cache.lookup(request(3, 12)))
+        self.assertIsNone(self.cache.lookup(request(3, 7, path='src/Main.hs')))
+
+    def test_ignores_replies_for_more_than_the_token(self):
+        # "f" at 1:1-1:2, asked about from the "f x" application at 1:1-1:4
+        self.cache.store(request(1, 1, 1, 2), types((1, 1, 1, 4)))
+        self.assertIsNone(self.cache.lookup(request(1, 1)))
+        self.assertIsNone(self.cache.lookup(request(1, 3)))
+        self.cache.store(None, types((1, 3, 1, 4)))
+        self.cache.store(request(7, 1, 7, 2), [])
+        self.assertIsNone(self.cache.lookup(request(1, 3)))
+
+    def test_keeps_tokens_apart(self):
+        self.cache.store(request(1, 1, 1, 2), types((1, 1, 1, 2), (1, 1, 1, 4)))
+        self.cache.store(request(1, 3, 1, 4), types((1, 3, 1, 4), (1, 1, 1, 4)))
+        self.assertEqual(1, self.cache.lookup(request(1, 1))[0][1].fromColumn)
+        self.assertEqual(3, self.cache.lookup(request(1, 3))[0][1].fromColumn)
+        self.assertIsNone(self.cache.lookup(request(1, 2)))
+
+    def test_invalidates_files(self):
+        self.cache.invalidate('src/Lib.hs')
+        self.assertIsNone(self.cache.lookup(request(3, 7)))
+
+
+class SpanIndexTests(unittest.TestCase):
+
+    def test_finds_the_smallest_span(self):
+        index = SpanIndex()
+        index.add((1, 1), (10, 1), "long")
+        index.add((3, 5), (3, 15), "application")
+        index.add((3, 5), (3, 10), "function")
+        index.add((3, 11), (3, 15), "argument")
+        self.assertEqual("function", index.lookup((3, 6), (3, 6)))
+        self.assertEqual("argument", index.lookup((3, 12), (3, 12)))
+        self.assertEqual("application", index.lookup((3, 6), (3, 12)))
+        self.assertEqual("long", index.lookup((5, 1), (5, 1)))
+        self.assertIsNone(index.lookup((10, 1), (10, 1)))
@@ -25,6 +25,18 @@ class UtilTests(unittest.TestCase):
         self.assertEqual(1, span['spanToColumn'])
         self.assertEqual('src/Main.hs', span['spanFilePath'])
 
+    def test_token_span_at(self):
+        window = mock_window([cur_dir + '/projects/helloworld'])
+        view = mock_view('src/Main.hs', window, "main = putStrLn Data.Text.empty >>= f\n  where f x = x")
+        def columns(point):
+            span = utility.token_span_at(view, point)
+            return span and (span['spanFromLine'], span['spanFromColumn'], span['spanToColumn'])
+        self.assertEqual((1, 1, 5), columns(2))
+        self.assertIsNone(columns(4)) # the space after "main"
+        self.assertEqual((1, 17, 32), columns(20))
+        self.assertEqual((1, 33, 36), columns(34))
+        self.assertEqual((2, 11, 12), columns(48))
+
     def test_complaints_not_repeated(self):
         utility.complain('complaint', 'waaaah')
         self.assertEqual(sublime.current_error, 'waaaah')
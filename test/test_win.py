@@ -1,9 +1,10 @@
 import unittest
-from unittest.mock import MagicMock, Mock, ANY
+from unittest.mock import MagicMock, Mock, ANY, patch
 from win import Win
 from .stubs import sublime
-from .mocks import cur_dir, default_mock_window
+from .mocks import cur_dir, default_mock_window, mock_view
 from utility import relative_view_file_name
+from response import SourceSpan
 
 def create_source_error(filePath, kind, message):
     return {
@@ -24,13 +25,39 @@ def create_source_error(filePath, kind, message):
 
 class WinTests(unittest.TestCase):
 
+    def setUp(self):
+        Win.error_panels.clear()
+        Win.error_stores.clear()
+        Win.region_managers.clear()
+
     def test_highlight_type_clear(self):
         (window, view) = default_mock_window()
 
+        other_view = MagicMock()
+        window.views = Mock(return_value=[view, other_view])
+
+        Win(window).show_types([("Int", SourceSpan("src/Main.hs", 1, 1, 1, 5))])
+        view.set_status.assert_called_with("type_at_cursor", "Int")
+        view.add_regions.assert_called_with("type_at_cursor", [ANY], "storage.type", "", sublime.DRAW_OUTLINED)
+
         Win(window).highlight_type([])
 
         view.set_status.assert_called_with("type_at_cursor", "")
-        view.add_regions.assert_called_with("type_at_cursor", [], "storage.type", "", sublime.DRAW_OUTLINED)
+        view.erase_regions.assert_called_with("type_at_cursor")
+
+        # views without a type are left alone, as are views already cleared
+        Win(window).highlight_type([])
+        other_view.set_status.assert_not_called()
+        other_view.erase_regions.assert_not_called()
+        self.assertEqual(1, view.erase_regions.call_count)
+
+    def test_only_changed_type_is_shown(self):
+        (window, view) = default_mock_window()
+
+        Win(window).show_types([("Int", SourceSpan("src/Main.hs", 1, 1, 1, 5))])
+        Win(window).show_types([("Int", SourceSpan("src/Main.hs", 1, 1, 1, 5))])
+        view.set_status.assert_called_once_with("type_at_cursor", "Int")
+        self.assertEqual(1, view.add_regions.call_count)
 
     def test_highlight_no_errors(self):
 
@@ -42,22 +69,57 @@ class WinTests(unittest.TestCase):
         errors = []
         Win(window).handle_source_errors(errors)
 
-        # panel recreated
-        window.create_output_panel.assert_called_with("hide_errors")
-        panel.settings().set.assert_called_with("result_file_regex", "^(..[^:]*):([0-9]+):?([0-9]+)?:? (.*)$")
-        window.run_command.assert_any_call("hide_panel",  {"panel": "output.hide_errors"})
-        panel.run_command.assert_called_with("clear_error_panel")
-        panel.set_read_only.assert_any_call(False)
+        # nothing changed: no panel or regions needed
+        window.create_output_panel.assert_not_called()
+        view.add_regions.assert_not_called()
+
+        # panel hidden
+        window.run_command.assert_called_with("hide_panel", {"panel": "output.hide_errors"})
 
-        # regions created in view
-        view.add_regions.assert_any_call("errors", [], "invalid", "dot", sublime.DRAW_OUTLINED)
-        view.add_regions.assert_any_call("warnings", [], "comment", "dot", sublime.DRAW_OUTLINED)
+    def test_clears_fixed_errors(self):
 
-        # panel hidden and locked
+        (window, view) = default_mock_window()
+
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        error = create_source_error(relative_view_file_name(view), "KindError", "<error message here>")
+        Win(window).handle_source_errors([error])
+        Win(window).handle_source_errors([])
+
+        # panel emptied and hidden, regions cleared
+        panel.run_command.assert_called_with("replace_error_panel", {"text": ""})
         window.run_command.assert_called_with("hide_panel", {"panel": "output.hide_errors"})
-        panel.set_read_only.assert_any_call(True)
+        view.erase_regions.assert_called_once_with("errors")
+        self.assertEqual(0, Win(window).error_store().count("KindError"))
 
+    def test_repaints_only_changed_files(self):
 
+        (window, view) = default_mock_window()
+        other_view = mock_view('src/Lib.hs', window)
+        window.find_open_file = Mock(side_effect=lambda path: other_view if path.endswith("Lib.hs") else view)
+        window.create_output_panel = Mock(return_value=MagicMock())
+
+        main_error = create_source_error("src/Main.hs", "KindError", "<error message here>")
+        lib_warning = create_source_error("src/Lib.hs", "KindWarning", "<warning message here>")
+        Win(window).handle_source_errors([main_error, lib_warning])
+        view.add_regions.assert_called_once_with("errors", [ANY], "invalid", "dot", sublime.DRAW_OUTLINED)
+        other_view.add_regions.assert_called_once_with("warnings", [ANY], "comment", "dot", sublime.DRAW_OUTLINED)
+
+        # the same report repaints nothing
+        Win(window).handle_source_errors([main_error, lib_warning])
+        self.assertEqual(1, view.add_regions.call_count)
+        self.assertEqual(1, other_view.add_regions.call_count)
+
+        # fixing Lib.hs only repaints its view
+        Win(window).handle_source_errors([main_error])
+        self.assertEqual(1, view.add_regions.call_count)
+        view.erase_regions.assert_not_called()
+        other_view.erase_regions.assert_called_once_with("warnings")
+
+        store = Win(window).error_store()
+        self.assertEqual(1, store.count("KindError", "src/Main.hs"))
+        self.assertEqual(0, store.count("KindWarning"))
 
     def test_highlight_errors_and_warnings(self):
 
@@ -73,16 +135,15 @@ class WinTests(unittest.TestCase):
 
         Win(window).handle_source_errors(errors)
 
-        # panel recreated
+        # panel created
         window.create_output_panel.assert_called_with("hide_errors")
         panel.settings().set.assert_called_with("result_file_regex", "^(..[^:]*):([0-9]+):?([0-9]+)?:? (.*)$")
-        window.run_command.assert_any_call("hide_panel",  {"panel": "output.hide_errors"})
-        # panel.run_command.assert_any_call("clear_error_panel")
         panel.set_read_only.assert_any_call(False)
 
-        # panel should have received two messages
-        panel.run_command.assert_any_call("update_error_panel", {"message": "src/Main.hs:1:1: KindError:\n<error message here>"})
-        panel.run_command.assert_any_call("update_error_panel", {"message": "src/Main.hs:1:1: KindWarning:\n<warning message here>"})
+        # panel should have received both messages at once
+        panel.run_command.assert_called_once_with("replace_error_panel", {"text":
+            "src/Main.hs:1:1: KindError:\n<error message here>\n\n"
+            "src/Main.hs:1:1: KindWarning:\n<warning message here>\n\n"})
 
         # regions added
         view.add_regions.assert_called_with("warnings", [ANY], "comment", "dot", sublime.DRAW_OUTLINED)
@@ -108,20 +169,88 @@ class WinTests(unittest.TestCase):
         # should have opened the file for us.
         window.open_file.assert_called_with(cur_dir + "/projects/helloworld/src/Lib.hs")
 
-        # panel recreated
+        # panel created
         window.create_output_panel.assert_called_with("hide_errors")
         panel.settings().set.assert_called_with("result_file_regex", "^(..[^:]*):([0-9]+):?([0-9]+)?:? (.*)$")
-        window.run_command.assert_any_call("hide_panel",  {"panel": "output.hide_errors"})
-        # panel.run_command.assert_any_call("clear_error_panel")
         panel.set_read_only.assert_any_call(False)
 
-        # panel should have received two messages
-        panel.run_command.assert_any_call("update_error_panel", {"message": "src/Lib.hs:1:1: KindError:\n<error message here>"})
+        # panel should have received the message
+        panel.run_command.assert_called_once_with("replace_error_panel", {"text": "src/Lib.hs:1:1: KindError:\n<error message here>\n\n"})
 
         # regions added
-        view.add_regions.assert_called_with("warnings", [], "comment", "dot", sublime.DRAW_OUTLINED)
-        view.add_regions.assert_any_call('errors', [ANY], 'invalid', 'dot', 2)
+        view.add_regions.assert_called_once_with('errors', [ANY], 'invalid', 'dot', 2)
 
         # panel shown and locked
         window.run_command.assert_called_with("show_panel", {"panel": "output.hide_errors"})
         panel.set_read_only.assert_any_call(True)
+
+    def test_opens_limited_tabs_for_errors(self):
+
+        (window, view) = default_mock_window()
+        window.find_open_file = Mock(return_value=None)
+        window.create_output_panel = Mock(return_value=MagicMock())
+
+        errors = [create_source_error("src/Module{}.hs".format(i), "KindError", "<error message here>") for i in range(3)]
+        with patch.object(Win, "max_error_tabs", 2):
+            Win(window).handle_source_errors(errors)
+
+        self.assertEqual(2, window.open_file.call_count)
+        window.open_file.assert_called_with(cur_dir + "/projects/helloworld/src/Module1.hs")
+        # the other file's errors are kept for when it is opened
+        self.assertEqual(1, Win(window).error_store().count("KindError", "src/Module2.hs"))
+
+    def test_highlights_errors_once_loaded(self):
+
+        (window, view) = default_mock_window()
+        window.create_output_panel = Mock(return_value=MagicMock())
+        view.is_loading.return_value = True
+
+        error = create_source_error(relative_view_file_name(view), "KindError", "<error message here>")
+        Win(window).handle_source_errors([error])
+        view.add_regions.assert_not_called()
+
+        view.is_loading.return_value = False
+        Win(window).highlight_errors([relative_view_file_name(view)])
+        view.add_regions.assert_called_once_with("errors", [ANY], "invalid", "dot", sublime.DRAW_OUTLINED)
+
+    def test_reuses_error_panel(self):
+
+        (window, view) = default_mock_window()
+
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        error = create_source_error(relative_view_file_name(view), "KindError", "<error message here>")
+        Win(window).handle_source_errors([error])
+        Win(window).handle_source_errors([error])
+
+        # created once, and not written to again for the same errors
+        window.create_output_panel.assert_called_once_with("hide_errors")
+        self.assertEqual(1, panel.run_command.call_count)
+
+        Win(window).handle_source_errors([])
+        window.create_output_panel.assert_called_once_with("hide_errors")
+        panel.run_command.assert_called_with("replace_error_panel", {"text": ""})
+
+        # a panel that was closed is created anew
+        panel.is_valid = Mock(return_value=False)
+        Win(window).handle_source_errors([error])
+        self.assertEqual(2, window.create_output_panel.call_count)
+
+        Win.forget(window.id())
+        self.assertNotIn(window.id(), Win.error_panels)
+
+    def test_caps_error_panel(self):
+
+        (window, view) = default_mock_window()
+
+        panel = MagicMock()
+        window.create_output_panel = Mock(return_value=panel)
+
+        errors = [create_source_error("src/Main.hs", "KindError", "error " + str(i)) for i in range(5)]
+        with patch.object(Win, "max_panel_errors", 2):
+            Win(window).handle_source_errors(errors)
+
+        text = panel.run_command.call_args[0][1]["text"]
+        self.assertEqual(2, text.count("KindError"))
+        self.assertTrue(text.endswith("3 more…\n"))
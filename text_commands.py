@@ -8,22 +8,23 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from utility import span_from_view_selection, first_folder, filter_enclosing
 from req import Req
-from stack_ide_manager import send_request
+from stack_ide_manager import StackIDEManager, send_request
 from response import parse_span_info_response, parse_exp_types
 
-class ClearErrorPanelCommand(sublime_plugin.TextCommand):
+class ReplaceErrorPanelCommand(sublime_plugin.TextCommand):
     """
-    A clear_error_panel command to clear the error panel.
+    A replace_error_panel command to set the text of the error panel,
+    replacing only what follows the part that stayed the same.
     """
-    def run(self, edit):
-        self.view.erase(edit, sublime.Region(0, self.view.size()))
-
-class UpdateErrorPanelCommand(sublime_plugin.TextCommand):
-    """
-    An update_error_panel command to append text to the error panel.
-    """
-    def run(self, edit, message):
-        self.view.insert(edit, self.view.size(), message + "\n\n")
+    def run(self, edit, text):
+        size = self.view.size()
+        old_text = self.view.substr(sublime.Region(0, size))
+        unchanged = 0
+        for (old, new) in zip(old_text, text):
+            if old != new:
+                break
+            unchanged += 1
+        self.view.replace(edit, sublime.Region(unchanged, size), text[unchanged:])
 
 class ShowHsTypeAtCursorCommand(sublime_plugin.TextCommand):
     """
@@ -42,26 +43,48 @@ class ShowHsTypeAtCursorCommand(sublime_plugin.TextCommand):
                 self.view.show_popup(_type)
 
 
+def request_span_info(view, on_infos):
+    """
+    Gets the span info of the expression under the cursor from the window's
+    SpanInfoCache, or from stack-ide if it isn't cached, and passes it to on_infos.
+    """
+    window = view.window()
+    if not StackIDEManager.is_running(window):
+        return
+    instance = StackIDEManager.for_window(window)
+    span = span_from_view_selection(view)
+    infos = instance.span_infos.lookup(span)
+    if infos is not None:
+        on_infos(infos)
+        return
+
+    generation = instance.span_infos.generation(span["spanFilePath"])
+    def handle_response(response):
+        infos = list(parse_span_info_response(response))
+        instance.span_infos.store(span, infos, generation)
+        on_infos(infos)
+    instance.send_request(Req.get_exp_info(span), handle_response)
+
+
 class ShowHsInfoAtCursorCommand(sublime_plugin.TextCommand):
     """
     A show_hs_info_at_cursor command that requests the info of the
     expression under the cursor and, if available, shows it as a pop-up.
     """
     def run(self,edit):
-        request = Req.get_exp_info(span_from_view_selection(self.view))
-        send_request(self.view.window(), request, self._handle_response)
+        request_span_info(self.view, self._handle_infos)
 
-    def _handle_response(self,response):
+    def _handle_infos(self, infos):
 
-        if len(response) < 1:
+        if len(infos) < 1:
            return
 
-        infos = parse_span_info_response(response)
-        (props, scope), span = next(infos)
+        (props, scope), span = infos[0]
 
+        source = ""
         if not props.defSpan is None:
             source = "(Defined in {}:{}:{})".format(props.defSpan.filePath, props.defSpan.fromLine, props.defSpan.fromColumn)
-        elif scope.importedFrom:
+        elif scope and scope.importedFrom:
             source = "(Imported from {})".format(scope.importedFrom.module)
 
         self.view.show_popup("{} :: {}  {}".format(props.name,
@@ -75,25 +98,55 @@ class GotoDefinitionAtCursorCommand(sublime_plugin.TextCommand):
     expression under the cursor and, if available, navigates to its location
     """
     def run(self,edit):
-        request = Req.get_exp_info(span_from_view_selection(self.view))
-        send_request(self.view.window(),request, self._handle_response)
+        request_span_info(self.view, self._handle_infos)
 
-    def _handle_response(self,response):
+    def _handle_infos(self, infos):
 
-        if len(response) < 1:
+        if len(infos) < 1:
             return
 
-        infos = parse_span_info_response(response)
-        (props, scope), span = next(infos)
+        (props, scope), span = infos[0]
         window = self.view.window()
         if props.defSpan:
             full_path = os.path.join(first_folder(window), props.defSpan.filePath)
             window.open_file(
             '{}:{}:{}'.format(full_path, props.defSpan.fromLine or 0, props.defSpan.fromColumn or 0), sublime.ENCODED_POSITION)
-        elif scope.importedFrom:
+        elif scope and scope.importedFrom:
             sublime.status_message("Cannot navigate to {}, it is imported from {}".format(props.name, scope.importedFrom.module))
         else:
-            sublime.status_message("{} not found!", props.name)
+            sublime.status_message("{} not found!".format(props.name))
+
+class ShowHsUsesAtCursorCommand(sublime_plugin.TextCommand):
+    """
+    A show_hs_uses_at_cursor command that lists the uses of the identifier
+    under the cursor known to the window's SpanInfoCache (those whose span
+    info was asked for or prefetched), and navigates to the one picked.
+    """
+    def run(self,edit):
+        request_span_info(self.view, self._handle_infos)
+
+    def _handle_infos(self, infos):
+
+        if len(infos) < 1:
+            return
+
+        (props, scope), span = infos[0]
+        window = self.view.window()
+        definition = props.defSpan
+        if definition is None:
+            sublime.status_message("{} is not defined in this project".format(props.name))
+            return
+        instance = StackIDEManager.for_window(window)
+        uses = instance.span_infos.uses_of(definition.filePath, definition.fromLine, definition.fromColumn)
+        locations = ["{}:{}:{}".format(path, start[0], start[1]) for (path, start, end) in uses]
+        if not locations:
+            sublime.status_message("No known uses of {}".format(props.name))
+            return
+
+        def on_done(index):
+            if index >= 0:
+                window.open_file(os.path.join(first_folder(window), locations[index]), sublime.ENCODED_POSITION)
+        window.show_quick_panel(locations, on_done)
 
 class CopyHsTypeAtCursorCommand(sublime_plugin.TextCommand):
     """
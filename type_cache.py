@@ -0,0 +1,115 @@
+import bisect
+
+
+class TypeCache:
+    """
+    Remembers exp-types replies, so that moving the cursor within an
+    expression we already know the types for doesn't ask stack-ide again.
+
+    A reply lists the types of every expression enclosing the requested
+    span, innermost first. When that innermost expression is just the token
+    under the cursor, anywhere within the token gets the same list, so such
+    replies are indexed by the token's span, per file. Other replies (say,
+    for a cursor between `f` and `x` in `f x`) are not kept, as the list
+    would be wrong for the tokens inside. Entries for a file are dropped
+    when its view is modified, and all of them when the session recompiles.
+    """
+
+    def __init__(self):
+        self._files = {} # Map from file path to the SpanIndex of its replies
+        self.hits = 0
+
+    def lookup(self, span):
+        """
+        Returns the [(type, SourceSpan)] for a request span, or None if stack-ide has to be asked.
+        """
+        file_types = self._files.get(span.get("spanFilePath"))
+        if file_types is None:
+            return None
+        types = file_types.lookup(span_start(span), span_end(span))
+        if types is not None:
+            self.hits += 1
+        return types
+
+    def store(self, token, types):
+        """
+        Remembers the types parsed from the reply to a request made at a
+        token (see utility.token_span_at), if they are the token's.
+        """
+        if token is None or not types or types[0][1] is None:
+            return
+        innermost = types[0][1]
+        start = (innermost.fromLine, innermost.fromColumn)
+        end = (innermost.toLine, innermost.toColumn)
+        if (start, end) != (span_start(token), span_end(token)):
+            return
+        file_types = self._files.setdefault(token.get("spanFilePath"), SpanIndex())
+        file_types.add(start, end, types)
+
+    def invalidate(self, path):
+        self._files.pop(path, None)
+
+    def clear(self):
+        self._files.clear()
+
+
+class SpanIndex:
+    """
+    An interval index over one file: spans sorted by their start, with the
+    furthest end reached so far, so a lookup can stop walking back as soon
+    as no earlier span reaches the position. Of the spans holding a
+    position, the smallest (latest starting, then earliest ending) wins.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._entries = [] # (start, end, value), parallel to _starts
+        self._max_ends = [] # Furthest end among the entries up to each index
+
+    def add(self, start, end, value):
+        index = bisect.bisect_left(self._starts, start)
+        while index < len(self._starts) and self._starts[index] == start:
+            if self._entries[index][1] == end:
+                self._entries[index] = (start, end, value)
+                return
+            index += 1
+        self._starts.insert(index, start)
+        self._entries.insert(index, (start, end, value))
+        self._max_ends.insert(index, end)
+        previous = self._max_ends[index - 1] if index > 0 else end
+        for i in range(index, len(self._entries)):
+            previous = max(previous, self._entries[i][1])
+            self._max_ends[i] = previous
+
+    def lookup(self, start, end):
+        """
+        The value of the smallest span that holds start to end, or None.
+        """
+        index = bisect.bisect_right(self._starts, start) - 1
+        best = None
+        while index >= 0 and self._max_ends[index] >= end:
+            (entry_start, entry_end, value) = self._entries[index]
+            if best is not None and entry_start < best[0]:
+                break
+            if contains(entry_start, entry_end, start, end) and (best is None or entry_end < best[1]):
+                best = (entry_start, entry_end, value)
+            index -= 1
+        return best[2] if best is not None else None
+
+
+def span_start(span):
+    return (span.get("spanFromLine"), span.get("spanFromColumn"))
+
+
+def span_end(span):
+    return (span.get("spanToLine"), span.get("spanToColumn"))
+
+
+def contains(start, end, inner_start, inner_end):
+    """
+    Whether a span holds an inner span. A cursor at the very end of an
+    expression is in the next one, so for cursors the end is exclusive.
+    """
+    if inner_start == inner_end:
+        return start <= inner_start < end
+    return start <= inner_start and inner_end <= end
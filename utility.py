@@ -1,5 +1,6 @@
 import glob
 import os
+import re
 try:
     import sublime
 except ImportError:
@@ -9,6 +10,13 @@ import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 from log import Log
+from line_index import LineIndex
+
+# Where we remember things across restarts, like recently used projects
+SESSION_FILE = "SublimeStackIDE.session.sublime-settings"
+
+# A (possibly qualified) name or literal, or a run of operator symbols
+TOKEN = re.compile(r"(?:[A-Z][\w']*\.)*[\w']+|[!#$%&*+./<=>?@\\^|~:-]+")
 
 complaints_shown = set()
 def complain(id, text):
@@ -70,7 +78,8 @@ def within(smaller, larger):
     return smaller.begin() >= larger.begin() and smaller.end() <= larger.end()
 
 def filter_enclosing(view, region, span_pairs):
-    return (item for item, span in span_pairs if within(region, view_region_from_span(view, span)))
+    index = LineIndex.for_view(view)
+    return (item for item, span in span_pairs if within(region, index.region(span)))
 
 def is_haskell_view(view):
     return view.match_selector(view.sel()[0].begin(), "source.haskell")
@@ -84,17 +93,42 @@ def view_region_from_span(view, span):
     :rtype sublime.Region: The created Region
 
     """
-    return sublime.Region(
-        view.text_point(span.fromLine - 1, span.fromColumn - 1),
-        view.text_point(span.toLine - 1, span.toColumn - 1))
+    return LineIndex.for_view(view).region(span)
+
+def view_regions_from_spans(view, spans):
+    """
+    Maps many SourceSpans to Regions for a given view at once.
+    """
+    return LineIndex.for_view(view).regions(spans)
 
 def span_from_view_region(view, region):
-    (from_line, from_col) = view.rowcol(region.begin())
-    (to_line,   to_col)   = view.rowcol(region.end())
+    index = LineIndex.for_view(view)
+    (from_line, from_col) = index.rowcol(region.begin())
+    (to_line,   to_col)   = index.rowcol(region.end())
     return {
         "spanFilePath": relative_view_file_name(view),
         "spanFromLine": from_line + 1,
-        "spanFromColumn": to_col + 1,
+        "spanFromColumn": from_col + 1,
         "spanToLine": to_line + 1,
         "spanToColumn": to_col + 1
         }
+
+def token_span_at(view, point):
+    """
+    The span of the token under a cursor at point, or None if it isn't on one
+    (like a cursor at the very end of a token, it is in whatever follows).
+    """
+    index = LineIndex.for_view(view)
+    (row, col) = index.rowcol(point)
+    line_start = index.starts[row]
+    line_end = index.starts[row + 1] - 1 if row + 1 < len(index.starts) else index.size
+    for match in TOKEN.finditer(view.substr(sublime.Region(line_start, line_end))):
+        if match.start() <= col < match.end():
+            return {
+                "spanFilePath": relative_view_file_name(view),
+                "spanFromLine": row + 1,
+                "spanFromColumn": match.start() + 1,
+                "spanToLine": row + 1,
+                "spanToColumn": match.end() + 1
+                }
+    return None
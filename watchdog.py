@@ -9,6 +9,10 @@ from settings import Settings
 from log import Log
 from win import Win
 from stack_ide_manager import StackIDEManager
+from event_listeners import StackIDETypeAtCursorHandler
+from completion_ranking import CompletionRanker
+from prefetch import Prefetcher
+from stack_ide import StackIDE
 
 
 #############################
@@ -27,12 +31,19 @@ def plugin_loaded():
     Log._set_verbosity(settings.verbosity)
     StackIDEManager.configure(settings)
     Win.show_popup = settings.show_popup
+    Win.max_panel_errors = settings.error_panel_limit
+    Win.max_error_tabs = settings.error_tab_limit
+    StackIDETypeAtCursorHandler.quiet_period = settings.type_at_cursor_delay
+    configure_ranking(settings)
+    Prefetcher.max_requests = settings.prefetch_types
+    StackIDE.save_delay = settings.save_coalesce_delay
     watchdog = StackIDEWatchdog()
+    StackIDEManager.prestart_spares()
 
 def plugin_unloaded():
     global watchdog
     watchdog.kill()
-    StackIDEManager.reset()
+    StackIDEManager.reset(detach=True)
     watchdog = None
 
 
@@ -40,24 +51,55 @@ def load_settings():
     settings_obj = sublime.load_settings("SublimeStackIDE.sublime-settings")
     settings_obj.add_on_change("_on_new_settings", on_settings_changed)
     add_to_path = settings_obj.get('add_to_PATH', [])
+    completion_weights = settings_obj.get('completion_weights', {})
     return Settings(
         settings_obj.get('verbosity', 'normal'),
         add_to_path if isinstance(add_to_path, list) else [],
-        settings_obj.get('show_popup', False)
+        settings_obj.get('show_popup', False),
+        settings_obj.get('type_at_cursor_delay', 0),
+        settings_obj.get('daemon_socket', ""),
+        settings_obj.get('warm_pool_size', 0),
+        settings_obj.get('warm_pool_memory_mb', 2048),
+        settings_obj.get('completion_limit', 100),
+        completion_weights if isinstance(completion_weights, dict) else {},
+        settings_obj.get('prefetch_types', 40),
+        settings_obj.get('error_panel_limit', 200),
+        settings_obj.get('error_tab_limit', 10),
+        settings_obj.get('save_coalesce_delay', 100)
     )
 
+def configure_ranking(settings):
+    CompletionRanker.limit = settings.completion_limit
+    CompletionRanker.weights = dict(CompletionRanker.default_weights, **settings.completion_weights)
+
 def on_settings_changed():
     global settings
     updated_settings = load_settings()
 
     if updated_settings.verbosity != settings.verbosity:
         Log._set_verbosity(updated_settings.verbosity)
-    elif updated_settings.add_to_PATH != settings.add_to_PATH:
+    if updated_settings.show_popup != settings.show_popup:
+        Win.show_popup = updated_settings.show_popup
+    if updated_settings.error_panel_limit != settings.error_panel_limit:
+        Win.max_panel_errors = updated_settings.error_panel_limit
+    if updated_settings.error_tab_limit != settings.error_tab_limit:
+        Win.max_error_tabs = updated_settings.error_tab_limit
+    if updated_settings.type_at_cursor_delay != settings.type_at_cursor_delay:
+        StackIDETypeAtCursorHandler.quiet_period = updated_settings.type_at_cursor_delay
+    if (updated_settings.completion_limit != settings.completion_limit or
+        updated_settings.completion_weights != settings.completion_weights):
+        configure_ranking(updated_settings)
+    if updated_settings.prefetch_types != settings.prefetch_types:
+        Prefetcher.max_requests = updated_settings.prefetch_types
+    if updated_settings.save_coalesce_delay != settings.save_coalesce_delay:
+        StackIDE.save_delay = updated_settings.save_coalesce_delay
+    if updated_settings.add_to_PATH != settings.add_to_PATH or updated_settings.daemon_socket != settings.daemon_socket:
         Log.normal("Settings changed, reloading backends")
         StackIDEManager.configure(updated_settings)
         StackIDEManager.reset()
-    elif updated_settings.show_popup != settings.show_popup:
-        Win.show_popup = updated_settings.show_popup
+    elif (updated_settings.warm_pool_size != settings.warm_pool_size or
+          updated_settings.warm_pool_memory_mb != settings.warm_pool_memory_mb):
+        StackIDEManager.configure(updated_settings)
 
     settings = updated_settings
 
@@ -66,16 +108,25 @@ class StackIDEWatchdog():
     Since I can't find any way to detect if a window closes,
     we use a watchdog timer to clean up stack-ide instances
     once we see that the window is no longer in existence.
+    It also reaps requests whose replies never arrived.
     """
+    interval = 1.0
+
     def __init__(self):
         super(StackIDEWatchdog, self).__init__()
         Log.normal("Starting stack-ide-sublime watchdog")
+        self._stopped = threading.Event()
         self.check_for_processes()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check_for_processes()
 
     def check_for_processes(self):
         StackIDEManager.check_windows()
-        self.timer = threading.Timer(1.0, self.check_for_processes)
-        self.timer.start()
+        StackIDEManager.reap_requests()
 
     def kill(self):
-        self.timer.cancel()
+        self._stopped.set()
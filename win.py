@@ -1,12 +1,13 @@
-from itertools import groupby
 import os
 
 try:
     import sublime
 except ImportError:
     from test.stubs import sublime
-from utility import first_folder, view_region_from_span
+from utility import first_folder, view_region_from_span, view_regions_from_spans
 from response import parse_source_errors, parse_exp_types
+from error_store import ErrorStore
+from region_manager import RegionManager
 
 class Win:
     """
@@ -14,10 +15,36 @@ class Win:
     """
 
     show_popup = False
+    max_panel_errors = 200
+    max_error_tabs = 10
+    error_panels = {} # Map from window id to [its error panel, the panel's text]
+    error_stores = {} # Map from window id to its ErrorStore
+    region_managers = {} # Map from window id to its RegionManager
 
     def __init__(self,window):
         self.window = window
 
+    @classmethod
+    def forget(cls, window_id):
+        """
+        Drops what we keep for a window that was closed.
+        """
+        cls.error_panels.pop(window_id, None)
+        cls.error_stores.pop(window_id, None)
+        cls.region_managers.pop(window_id, None)
+
+    def error_store(self):
+        store = Win.error_stores.get(self.window.id())
+        if store is None:
+            store = Win.error_stores[self.window.id()] = ErrorStore()
+        return store
+
+    def regions(self):
+        manager = Win.region_managers.get(self.window.id())
+        if manager is None:
+            manager = Win.region_managers[self.window.id()] = RegionManager()
+        return manager
+
     def update_completions(self, completions):
         """
         Dispatches to the dummy UpdateCompletionsCommand, which is intercepted
@@ -40,7 +67,12 @@ class Win:
         most specific one for now, but it gives us the types all the way out to the topmost
         expression.
         """
-        types = list(parse_exp_types(exp_types))
+        self.show_types(list(parse_exp_types(exp_types)))
+
+    def show_types(self, types):
+        """
+        Shows the innermost of the parsed [(type, SourceSpan)], or clears the display if there are none.
+        """
         if types:
             # Display the first type in a region and in the status bar
             view = self.window.active_view()
@@ -48,93 +80,107 @@ class Win:
             if span:
                 if Win.show_popup:
                     view.show_popup(type)
-                view.set_status("type_at_cursor", type)
-                view.add_regions("type_at_cursor", [view_region_from_span(view, span)], "storage.type", "", sublime.DRAW_OUTLINED)
+                self.regions().set_status(view, "type_at_cursor", type)
+                self.regions().add_regions(view, "type_at_cursor", [view_region_from_span(view, span)], "storage.type", "", sublime.DRAW_OUTLINED)
         else:
-            # Clear type-at-cursor display
-            for view in self.window.views():
-                view.set_status("type_at_cursor", "")
-                view.add_regions("type_at_cursor", [], "storage.type", "", sublime.DRAW_OUTLINED)
+            # Clear type-at-cursor display, in the views that have one
+            self.regions().clear("type_at_cursor")
 
 
     def handle_source_errors(self, source_errors):
         """
-        Makes sure views containing errors are open and shows error messages + highlighting
+        Makes sure views containing errors are open and shows error messages + highlighting.
+        Only the panel and views whose errors changed since the last report are updated.
         """
 
         errors = list(parse_source_errors(source_errors))
+        store = self.error_store()
+        changed = store.update(errors)
 
         # TODO: we should pass the errorKind too if the error has no span
-        error_panel = self.reset_error_panel()
-        for error in errors:
-            error_panel.run_command("update_error_panel", {"message": repr(error)})
+        if changed:
+            self.update_error_panel(errors)
 
         if errors:
             self.window.run_command("show_panel", {"panel":"output.hide_errors"})
         else:
             self.window.run_command("hide_panel", {"panel":"output.hide_errors"})
 
-        error_panel.set_read_only(True)
-
-        file_errors = list(filter(lambda error: error.span, errors))
-        # First, make sure we have views open for each error
-        need_load_wait = False
-        paths = set(error.span.filePath for error in file_errors)
-        for path in paths:
+        # Repaint the files whose errors changed, and those whose view we haven't painted yet.
+        # Up to max_error_tabs files that aren't open get opened; the views of
+        # those still loading are painted once loaded, by StackIDEErrorLoadListener.
+        opened = 0
+        paths = set(path for path in changed if path is not None)
+        for path in store.paths():
             view = self.find_view_for_path(path)
             if not view:
-                need_load_wait = True
-                self.open_view_for_path(path)
+                if opened < Win.max_error_tabs:
+                    opened += 1
+                    self.open_view_for_path(path)
+                    paths.add(path)
+            elif not self.regions().shows(view, "errors"):
+                paths.add(path)
 
-        # If any error-holding files need to be opened, wait briefly to
-        # make sure the file is loaded before trying to annotate it
-        if need_load_wait:
-            sublime.set_timeout(lambda: self.highlight_errors(file_errors), 100)
-        else:
-            self.highlight_errors(file_errors)
+        self.highlight_errors(paths)
 
 
-    def reset_error_panel(self):
+    def error_panel(self):
         """
-        Creates and configures the error panel for the current window
+        Returns the error panel of the current window, with the text it shows.
+        The panel is created and configured the first time, then reused.
         """
-        panel = self.window.create_output_panel("hide_errors")
-        panel.set_read_only(False)
+        entry = Win.error_panels.get(self.window.id())
+        if entry is None or not entry[0].is_valid():
+            panel = self.window.create_output_panel("hide_errors")
 
-        # This turns on double-clickable error/warning messages in the error panel
-        # using a regex that looks for the form file_name:line:column
-        panel.settings().set("result_file_regex", "^(..[^:]*):([0-9]+):?([0-9]+)?:? (.*)$")
+            # This turns on double-clickable error/warning messages in the error panel
+            # using a regex that looks for the form file_name:line:column
+            panel.settings().set("result_file_regex", "^(..[^:]*):([0-9]+):?([0-9]+)?:? (.*)$")
+            panel.set_read_only(True)
 
-        # Seems to force the panel to refresh after we clear it:
-        self.window.run_command("hide_panel", {"panel": "output.hide_errors"})
+            entry = Win.error_panels[self.window.id()] = [panel, ""]
+        return entry
 
-        # Clear the panel. TODO: should be unnecessary? https://www.sublimetext.com/forum/viewtopic.php?f=6&t=2044
-        panel.run_command("clear_error_panel")
-
-        # TODO store the panel somewhere so we can reuse it.
-        return panel
+    def update_error_panel(self, errors):
+        """
+        Shows the errors in the error panel, in a single edit, and only if they changed.
+        At most max_panel_errors are listed, followed by how many more there are.
+        """
+        entry = self.error_panel()
+        text = format_error_panel(errors, Win.max_panel_errors)
+        if text != entry[1]:
+            panel = entry[0]
+            panel.set_read_only(False)
+            panel.run_command("replace_error_panel", {"text": text})
+            panel.set_read_only(True)
+            entry[1] = text
 
 
-    def highlight_errors(self, errors):
+    def highlight_errors(self, paths):
         """
-        Highlights the relevant regions for each error in open views
+        Highlights the regions of the errors the store has for each of the files, in their open views
+        (that are done loading)
         """
-
-        # We gather each error by the file view it should annotate
-        # so we can add regions in bulk to each view.
-        error_regions_by_view_id = {}
-        warning_regions_by_view_id = {}
-        for path, errors_by_path in groupby(errors, lambda error: error.span.filePath):
+        store = self.error_store()
+        for path in paths:
             view = self.find_view_for_path(path)
-            for kind, errors_by_kind in groupby(errors_by_path, lambda error: error.kind):
-                if kind == 'KindWarning':
-                    warning_regions_by_view_id[view.id()] = list(view_region_from_span(view, error.span) for error in errors_by_kind)
-                else:
-                    error_regions_by_view_id[view.id()] = list(view_region_from_span(view, error.span) for error in errors_by_kind)
-
-        # Add error/warning regions to their respective views
-        for view in self.window.views():
-            view.add_regions("errors", error_regions_by_view_id.get(view.id(), []), "invalid", "dot", sublime.DRAW_OUTLINED)
-            view.add_regions("warnings", warning_regions_by_view_id.get(view.id(), []), "comment", "dot", sublime.DRAW_OUTLINED)
-
-
+            if not view or view.is_loading():
+                continue
+            # The store keeps a file's errors together, so they are bucketed by kind in one pass
+            # and their regions added in bulk; the view is only touched if they differ from what it shows.
+            error_spans = []
+            warning_spans = []
+            for error in store.for_file(path):
+                spans = warning_spans if error.kind == 'KindWarning' else error_spans
+                spans.append(error.span)
+            self.regions().add_regions(view, "errors", view_regions_from_spans(view, error_spans), "invalid", "dot", sublime.DRAW_OUTLINED)
+            self.regions().add_regions(view, "warnings", view_regions_from_spans(view, warning_spans), "comment", "dot", sublime.DRAW_OUTLINED)
+
+
+
+
+def format_error_panel(errors, limit):
+    text = "".join(repr(error) + "\n\n" for error in errors[:limit])
+    if len(errors) > limit:
+        text += "{} more…\n".format(len(errors) - limit)
+    return text
@@ -26,3 +26,14 @@ class SendStackIdeRequestCommand(sublime_plugin.WindowCommand):
         if instance:
             instance.send_request(request)
 
+
+class StackIdeClearTargetsCommand(sublime_plugin.WindowCommand):
+    """
+    A stack_ide_clear_targets command that forgets the modules added to the
+    session by saves (and remembered across restarts), e.g. when two of them
+    define main, and recompiles only the targets stack lists.
+    """
+
+    def run(self):
+        if StackIDEManager.is_running(self.window):
+            StackIDEManager.for_window(self.window).clear_targets()